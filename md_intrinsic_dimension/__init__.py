@@ -1,11 +1,25 @@
 from importlib.metadata import version, PackageNotFoundError
 
 from .md_intrinsic_dimension import intrinsic_dimension
-from .section_id import section_id
-from .secondary_structure_id import secondary_structure_id
+from .section_id import section_id, adaptive_section_id, iter_section_id
+from .secondary_structure_id import secondary_structure_id, iter_secondary_structure_id
+from .scan import read_scan
+from .distance_matrix import pairwise_rmsd
+from .reduction import reduce_projection
+from .mdcath import read_mdcath, iter_mdcath
+from .session import IDSession
+from .contacts import contact_map, contact_distances
+from .feature_subsets import feature_subset_shift
+from .trajectory_cache import cache_trajectory
+from .block_pairs import block_pair_id
+from .window_store import WindowStore
+from .id_map import id_map
+from .batch import batch_id
+from .sharding import run_shard, merge_shards
+from .multiscale import multiscale_id
 
 # TONI is this list correct?
-__all__ = ['md_intrinsic_dimension','section_id', 'secondary_structure_id']
+__all__ = ['md_intrinsic_dimension','section_id', 'adaptive_section_id', 'secondary_structure_id', 'iter_section_id', 'iter_secondary_structure_id', 'read_scan', 'pairwise_rmsd', 'reduce_projection', 'read_mdcath', 'iter_mdcath', 'IDSession', 'contact_map', 'contact_distances', 'feature_subset_shift', 'cache_trajectory', 'block_pair_id', 'WindowStore', 'id_map', 'batch_id', 'run_shard', 'merge_shards', 'multiscale_id']
 
 
 try:
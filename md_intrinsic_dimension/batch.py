@@ -0,0 +1,145 @@
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from moleculekit.molecule import Molecule
+from .compute_projections import projection_atoms
+from .kernels import start_threads
+from .load_trajectory import load_molecule
+from .md_intrinsic_dimension import _project, _estimate_id
+from .md_intrinsic_dimension import logger as core_logger
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+handler = logging.StreamHandler()
+formatter = logging.Formatter('%(name)s - %(levelname)s - %(message)s')
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+logger.propagate = False
+
+
+def _source(item, topology):
+    # (label, topology, trajectory, mol) of one batch item
+    if isinstance(item, Molecule):
+        return item.viewname, None, None, item
+    if isinstance(item, (list, tuple)):
+        return str(item[1]), item[0], item[1], None
+    return str(item), topology, item, None
+
+
+def batch_id(trajectories, topology=None, projection_method='Distances', id_method='local', projection_kwargs=None, id_kwargs=None, frames=None, prefetch=2, n_loaders=1, verbose=True):
+    '''
+    Computes intrinsic dimension (ID) of many trajectories, loading and projecting the next ones in
+    background threads while the current one is estimated, so that disk and CPU work at the same time.
+
+    At most `prefetch` trajectories are loaded ahead of the one being estimated, so memory is capped
+    to ``prefetch + 1`` projections whatever the number of trajectories. Results are in input order.
+
+    Parameters
+    ----------
+    trajectories : list
+        Trajectories to analyse, each either a path sharing `topology`, a (topology, trajectory) pair or a `Molecule`.
+    topology : str, optional
+        Path to the topology file of the trajectories given as paths.
+    projection_method, id_method, projection_kwargs, id_kwargs, frames
+        As in `intrinsic_dimension` (`projection_method` cannot be an array).
+    prefetch : int, default=2
+        Maximum number of trajectories loaded ahead (size of the queue).
+    n_loaders : int, default=1
+        Number of background threads loading and projecting trajectories.
+    verbose : bool, default=True
+        If True, logs are shown. If False, logs are suppressed.
+
+    Returns
+    -------
+    results : DataFrame
+        One row per trajectory, with columns "trajectory", "frames", "entire simulation", "last simulation",
+        "instantaneous" (empty for "global"), "load time" and "estimate time" (seconds).
+        ``results.attrs["stats"]`` holds the totals "load time", "estimate time", "wait time" (estimation waiting
+        for a load), "wall time", and "overlap", the fraction of load time hidden behind estimation.
+
+    Raises
+    ------
+    ValueError
+        If prefetch or n_loaders < 1.
+    TypeError
+        If `id_method` is invalid.
+    '''
+    if verbose:
+        logger.setLevel(logging.INFO)
+        core_logger.setLevel(logging.INFO)
+    else:
+        logger.setLevel(logging.CRITICAL + 1)
+        core_logger.setLevel(logging.CRITICAL + 1)
+    if prefetch < 1 or n_loaders < 1:
+        raise ValueError(f'prefetch and n_loaders must be >= 1, got {prefetch} and {n_loaders} instead.')
+    if id_method not in ('local', 'global'):
+        raise TypeError(f'id_method must be "local" or "global", got {id_method} instead.')
+    id_kwargs = dict(id_kwargs or {})
+    estimator = id_kwargs.pop('estimator', 'TwoNN')
+    last = id_kwargs.pop('last', 100)
+    sources = [_source(item, topology) for item in trajectories]
+    atoms = projection_atoms(projection_method, projection_kwargs)
+
+    def load(source):
+        _, top, traj, mol = source
+        start = time.perf_counter()
+        mol = load_molecule(top, traj, mol, frames, atoms if mol is None or frames is not None else None)
+        projection = _project(mol, projection_method, projection_kwargs)
+        return projection, time.perf_counter() - start
+
+    results = []
+    waited = 0.0
+    wall = time.perf_counter()
+    pending = deque()
+    queued = iter(sources)
+    start_threads()
+    pool = ThreadPoolExecutor(n_loaders)
+
+    def submit():
+        source = next(queued, None)
+        if source is not None:
+            pending.append((source[0], pool.submit(load, source)))
+
+    try:
+        for _ in range(prefetch):
+            submit()
+        while pending:
+            label, future = pending.popleft()
+            start = time.perf_counter()
+            projection, load_time = future.result()
+            waited += time.perf_counter() - start
+            submit() #the freed slot is used by the next trajectory
+
+            start = time.perf_counter()
+            out = _estimate_id(projection, id_method, estimator, last, id_kwargs)
+            estimate_time = time.perf_counter() - start
+            all_sim, last_sim, instantaneous = out if id_method == 'local' else (*out, [])
+            results.append({
+                'trajectory': label,
+                'frames': len(projection),
+                'entire simulation': all_sim,
+                'last simulation': last_sim,
+                'instantaneous': instantaneous,
+                'load time': load_time,
+                'estimate time': estimate_time,
+            })
+            del projection, out
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    results = pd.DataFrame(results)
+    load_total = float(results['load time'].sum()) if len(results) else 0.0
+    stats = {
+        'load time': load_total,
+        'estimate time': float(results['estimate time'].sum()) if len(results) else 0.0,
+        'wait time': waited,
+        'wall time': time.perf_counter() - wall,
+        'overlap': float(np.clip(1 - waited / load_total, 0, 1)) if load_total > 0 else 0.0,
+    }
+    results.attrs['stats'] = stats
+    logger.info(f'{len(results)} trajectories in {stats["wall time"]:.1f} s: {stats["overlap"]:.0%} of '
+                f'{stats["load time"]:.1f} s of loading overlapped with {stats["estimate time"]:.1f} s of estimation.')
+    return results
@@ -0,0 +1,140 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from .compute_id import compute_local, compute_global
+from .compute_projections import projection_atoms
+from .kernels import pair_distances, start_threads
+from .load_trajectory import load_molecule
+
+
+def distance_tensor(mol, atoms, filename=None, row_block=64):
+    '''
+    Computes the distances between all selected atoms in each frame.
+
+    Parameters
+    ----------
+    mol : moleculekit.molecule.Molecule
+        MoleculeKit object containing atomic structure and trajectory.
+    atoms : np.ndarray
+        Indexes of the selected atoms.
+    filename : str, optional
+        If given, the tensor is written to this `.npy` file and returned as a `np.memmap`.
+    row_block : int, default=64
+        Number of atoms whose distances are computed at once.
+
+    Returns
+    -------
+    tensor : np.ndarray
+        Array of shape (frames, atoms, atoms), float32, symmetric with zero diagonal.
+    '''
+    n = len(atoms)
+    shape = (mol.numFrames, n, n)
+    if filename is not None:
+        tensor = np.lib.format.open_memmap(filename, mode='w+', dtype=np.float32, shape=shape)
+    else:
+        tensor = np.empty(shape, dtype=np.float32)
+    for start in range(0, n, row_block):
+        rows = np.arange(start, min(start + row_block, n))
+        pairs = np.column_stack((np.repeat(atoms[rows], n), np.tile(atoms, len(rows))))
+        tensor[:, rows, :] = pair_distances(mol.coords, pairs).reshape(-1, len(rows), n)
+    if filename is not None:
+        tensor.flush()
+    return tensor
+
+
+def _blocks(n_atoms, block_size):
+    # [start, stop) of consecutive blocks of atoms. Blocks need 3 atoms for 2 distances within them,
+    # so a shorter last block is merged into the previous one
+    starts = list(range(0, n_atoms, block_size))
+    if len(starts) > 1 and n_atoms - starts[-1] < 3:
+        starts.pop()
+    return list(zip(starts, starts[1:] + [n_atoms]))
+
+
+def block_pair_id(topology=None, trajectory=None, mol=None, block_size=10, sele='name CA', id_method='global', id_kwargs=None, frames=None, n_jobs=1, filename=None):
+    '''
+    Computes intrinsic dimension (ID) between all pairs of residue blocks, e.g. to study the coupling between domains.
+
+    The projection of blocks A and B is made of the distances between the atoms of A and those of B (and,
+    for A = B, of the distances within the block, as a `section_id` window with "Distances"). The distances
+    between all selected atoms are computed once, each pair of blocks takes its columns as a view of that
+    tensor, and pairs are estimated on a thread pool.
+
+    Parameters
+    ----------
+    topology : str, optional
+        Path to the topology file (e.g., .pdb, .psf). Required if `mol` is not provided.
+    trajectory : str, optional
+        Path to the trajectory file (e.g., .dcd, .xtc). Required if `mol` is not provided.
+    mol : Molecule, optional
+        A pre-loaded MoleculeKit `Molecule` object. If provided, `topology` and `trajectory` are ignored.
+    block_size : int, default=10
+        Number of selected atoms (residues, for "name CA") per block. A last block of fewer than 3 atoms is merged into the previous one.
+    sele : str, default='name CA'
+        Atom selection string (VMD format).
+    id_method : str, default='global'
+        "global" ID, or mean of the "local" ID over all frames.
+    id_kwargs : dict, optional
+        Parameters for intrinsic dimension estimation, as in `intrinsic_dimension`.
+    frames : slice, range or array-like of int, optional
+        Frames of the trajectory to analyse.
+    n_jobs : int, default=1
+        Number of block pairs estimated at once.
+    filename : str, optional
+        Path to a `.npy` file holding the distance tensor, which is then memory-mapped instead of kept in RAM.
+
+    Returns
+    -------
+    matrix : DataFrame
+        Symmetric (blocks, blocks) table of the ID over the entire simulation, indexed by the "first-last" resids of each block.
+
+    Raises
+    ------
+    ValueError
+        If block_size < 3 or the selection has fewer than three atoms.
+    TypeError
+        If `id_method` is invalid.
+    '''
+    if block_size < 3:
+        raise ValueError(f'block_size must be >= 3, got {block_size} instead.')
+    if id_method not in ('local', 'global'):
+        raise TypeError(f'id_method must be "local" or "global", got {id_method} instead.')
+    id_kwargs = dict(id_kwargs or {})
+    estimator = id_kwargs.pop('estimator', 'TwoNN')
+    last = id_kwargs.pop('last', 100)
+
+    atoms = projection_atoms('Distances', {'sele': sele}) if mol is None or frames is not None else None #None for context keywords
+    mol = load_molecule(topology, trajectory, mol, frames, atoms)
+    atoms = mol.atomselect(sele, indexes=True)
+    if len(atoms) < 3:
+        raise ValueError(f'Atom selection "{sele}" resulted in {len(atoms)} atoms, at least 3 are required.')
+    tensor = distance_tensor(mol, atoms, filename)
+    blocks = _blocks(len(atoms), block_size)
+    resids = mol.resid[atoms]
+    labels = [f'{resids[start]}-{resids[stop - 1]}' for start, stop in blocks]
+
+    def estimate(pair):
+        (a, a_stop), (b, b_stop) = blocks[pair[0]], blocks[pair[1]]
+        columns = tensor[:, a:a_stop, b:b_stop]
+        if pair[0] == pair[1]: #distances within the block, each pair once
+            i, j = np.triu_indices(a_stop - a, k=1)
+            projection = columns[:, i, j]
+        else:
+            projection = columns.reshape(len(columns), -1)
+        if id_method == 'local':
+            return compute_local(projection, estimator=estimator, last=last, **id_kwargs)[0]
+        return compute_global(projection, estimator=estimator, last=last, **id_kwargs)[0]
+
+    pairs = [(i, j) for i in range(len(blocks)) for j in range(i, len(blocks))]
+    if n_jobs == 1:
+        values = list(map(estimate, pairs))
+    else:
+        start_threads()
+        with ThreadPoolExecutor(os.cpu_count() if n_jobs == -1 else n_jobs) as pool:
+            values = list(pool.map(estimate, pairs))
+
+    matrix = np.full((len(blocks), len(blocks)), np.nan)
+    for (i, j), value in zip(pairs, values):
+        matrix[i, j] = matrix[j, i] = value
+    return pd.DataFrame(matrix, index=labels, columns=labels)
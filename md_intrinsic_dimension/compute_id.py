@@ -1,12 +1,18 @@
 import skdim
+from skdim._commonfuncs import LocalEstimator, get_nn
+from sklearn.utils.validation import check_array
 import numpy as np
 import pandas as pd
 from .compute_projections import *
+from .distance_matrix import knn_from_distance_matrix, distance_submatrix, matrix_frames
+from .kernels import twonn_pointwise, mle_pointwise
+from .neighbours import blocked_knn, BLOCKED_KNN_FEATURES
 import logging
+import warnings
 
 logger = logging.getLogger(__name__)
 
-def compute_local(projection, estimator = 'TwoNN', last = 100, **id_kwargs):
+def compute_local(projection, estimator = 'TwoNN', last = 100, precomputed = False, knn = None, n_jobs = 1, **id_kwargs):
 	'''Computes intrinsic dimension for each frame of the simulation (instantaneous).
 	
 	Parameters
@@ -19,6 +25,16 @@ def compute_local(projection, estimator = 'TwoNN', last = 100, **id_kwargs):
 		'MADA', 'MiND_ML', 'MLE', 'MOM', 'TLE', 'TwoNN' (default 'TwoNN')
 	last : int, optional
 		Defines how many frames to consider for mean_last calculation, starting from the end of the simulation (default 100).
+	precomputed : bool, optional
+		If True, `projection` is a frame-by-frame distance matrix, either square or condensed 
+		(see distance_matrix.py), instead of a feature array. Only the neighbour-based estimators 
+		'TwoNN', 'MLE' and 'MOM' are supported (default False).
+	knn : tuple of np.ndarray, optional
+		Precomputed (distances, indexes) of the sorted nearest neighbours of each frame, as returned by 
+		nearest_neighbors, with at least as many columns as the estimator's neighbourhood. Allows reusing 
+		the neighbour search across estimators (ignored if precomputed is True).
+	n_jobs : int, optional
+		Number of parallel jobs of the neighbour search and of the pointwise fits (default 1).
     Any other additional keys are passed directly to the chosen estimator’s
     constructor, and should match its parameter names. For example: ``{"estimator": "KNN", "k": 15}``.
 
@@ -33,7 +49,13 @@ def compute_local(projection, estimator = 'TwoNN', last = 100, **id_kwargs):
 	'''
 
 	id_estimator = getattr(skdim.id, estimator)(**id_kwargs)#contains only extra parameters
-	lid= id_estimator.fit_transform_pw(projection, smooth=True)[1]
+	kernel = _pointwise_kernel(id_estimator)
+	if precomputed:
+		lid = _local_precomputed(id_estimator, projection)
+	elif kernel is not None:
+		lid = _local_kernel(id_estimator, kernel, projection, knn, n_jobs)
+	else:
+		lid = _local_knn(id_estimator, projection, knn, n_jobs)
 	
 	mean_last = float(np.mean(lid[-last:]))
 	mean_all  = float(np.mean(lid))
@@ -46,7 +68,7 @@ def compute_local(projection, estimator = 'TwoNN', last = 100, **id_kwargs):
 
 
 
-def compute_global(projection, estimator = 'TwoNN', last = 100, **id_kwargs):
+def compute_global(projection, estimator = 'TwoNN', last = 100, precomputed = False, **id_kwargs):
 	'''Computes intrinsic dimension for the entire simulation (global).
 	
 	Parameters
@@ -58,7 +80,12 @@ def compute_global(projection, estimator = 'TwoNN', last = 100, **id_kwargs):
 		Options: 'CorrInt', 'DANCo', 'ESS', 'FisherS', 'KNN', 'lPCA', 
 		'MADA', 'MiND_ML', 'MLE', 'MOM', 'TLE', 'TwoNN' (default 'TwoNN')
 	last : int, optional
-		Defines how many frames to consider for gid100 calculation, starting from the end of the simulation (default 100)
+		Defines how many frames to consider for gid100 calculation, starting from the end of the simulation (default 100).
+		If None, gid100 is not computed and only the entire trajectory is fitted
+	precomputed : bool, optional
+		If True, `projection` is a frame-by-frame distance matrix, either square or condensed 
+		(see distance_matrix.py), instead of a feature array. Only the neighbour-based estimators 
+		'TwoNN', 'MLE' and 'MOM' are supported (default False).
     Any other additional keys are passed directly to the chosen estimator’s
     constructor, and should match its parameter names. For example: ``{"estimator": "KNN", "k": 15}``.
 
@@ -66,23 +93,156 @@ def compute_global(projection, estimator = 'TwoNN', last = 100, **id_kwargs):
 	-------
 	gid : float
 		Global intrinsic dimension computed over entire trajectory
-	gid100 : float
-		Global intrinsic dimension computed over last `last` frames
+	gid100 : float or None
+		Global intrinsic dimension computed over last `last` frames, None if `last` is None
 
 	'''
 
 	id_estimator = getattr(skdim.id, estimator)(**id_kwargs) #contains only extra parameters
 	
-	gid = id_estimator.fit_transform(projection)
-	gid100 = id_estimator.fit_transform(projection[-last:])
+	if precomputed:
+		gid = _global_precomputed(id_estimator, projection)
+		gid100 = None if last is None else _global_precomputed(id_estimator, projection, frames=slice(-last, None))
+	else:
+		gid = id_estimator.fit_transform(projection)
+		gid100 = None if last is None else id_estimator.fit_transform(projection[-last:])
 
 	return gid, gid100
 
 
 
+###############################
+
+
+def nearest_neighbors(projection, k, n_jobs=1):
+	'''Computes the sorted k nearest neighbours of each frame, excluding the frame itself.
+	
+	Parameters
+	----------
+	projection : np.ndarray
+		Array of projections of shape (frames, features).
+	k : int
+		Number of neighbours.
+	n_jobs : int, optional
+		Number of parallel jobs (default 1).
+
+	Returns
+	-------
+	dists : np.ndarray
+		Neighbour distances, shape (frames, k).
+	inds : np.ndarray
+		Neighbour indexes, shape (frames, k).
+
+	Notes
+	-----
+	Projections with many features (e.g. Distances) are searched by blocked_knn, whose memory stays
+	O(frames x k), and the others by scikit-learn as in scikit-dimension.
+	'''
+	if projection.shape[1] >= BLOCKED_KNN_FEATURES:
+		return blocked_knn(projection, k, n_jobs=n_jobs)
+	return get_nn(projection, k=k, n_jobs=n_jobs)
+
+
+
+###############################
+# pointwise estimates (compiled kernels in kernels.py)
+
+
+def _pointwise_kernel(id_estimator):
+	# kernels reproduce skdim's pointwise TwoNN and MLE for their default settings only
+	if type(id_estimator) is skdim.id.TwoNN and not id_estimator.dist:
+		return lambda X, dists, inds: twonn_pointwise(X, inds, discard_fraction=id_estimator.discard_fraction)
+	if (type(id_estimator) is skdim.id.MLE and id_estimator.dnoise is None and id_estimator.neighborhood_based
+			and id_estimator.integral_approximation == 'Haro'):
+		return lambda X, dists, inds: mle_pointwise(dists, unbiased=id_estimator.unbiased)
+	return None
+
+
+def _local_kernel(id_estimator, kernel, projection, knn=None, n_jobs=1):
+	k = _n_neighbors(id_estimator, len(projection))
+	projection = check_array(projection, ensure_min_samples=k + 1, ensure_min_features=2) #same errors as skdim
+	if knn is None:
+		knn = nearest_neighbors(projection, k, n_jobs=n_jobs)
+	dists, inds = knn[0][:, :k], knn[1][:, :k]
+	return _smooth(kernel(projection, dists, inds), inds)
+
+
+def _local_knn(id_estimator, projection, knn=None, n_jobs=1):
+	# skdim's pointwise fit on neighbours searched here, so that they can be shared and wide projections are blocked
+	k = _n_neighbors(id_estimator, len(projection))
+	if knn is None:
+		projection = check_array(projection, ensure_min_samples=k + 1, ensure_min_features=2) #same errors as skdim
+		knn = nearest_neighbors(projection, k, n_jobs=n_jobs)
+	dists, inds = knn[0][:, :k], knn[1][:, :k]
+	if isinstance(id_estimator, LocalEstimator):
+		return id_estimator.fit_transform_pw(projection, precomputed_knn_arrays=(dists, inds), smooth=True, n_jobs=n_jobs)[1]
+	return id_estimator.fit_transform_pw(projection, precomputed_knn=inds, smooth=True, n_jobs=n_jobs)[1]
+
+
+
+###############################
+# precomputed distance matrices
+
+
+PRECOMPUTED_ESTIMATORS = ('TwoNN', 'MLE', 'MOM')
+
+
+def _check_precomputed(id_estimator):
+	name = type(id_estimator).__name__
+	if name not in PRECOMPUTED_ESTIMATORS:
+		raise ValueError(f'Estimator "{name}" does not support precomputed distance matrices. Use one of {PRECOMPUTED_ESTIMATORS}.')
+
+
+def _n_neighbors(id_estimator, n_frames):
+	# same neighbourhood size skdim uses: 100 for global estimators applied pointwise, class default otherwise
+	if not hasattr(id_estimator, '_N_NEIGHBORS'):
+		return 100
+	if id_estimator._N_NEIGHBORS >= n_frames:
+		warnings.warn('n_neighbors >= len(X), setting n_neighbors = len(X)-1')
+		return n_frames - 1
+	return id_estimator._N_NEIGHBORS
+
+
+def _smooth(pw, knn):
+	# as skdim: average of each point with its neighbourhood
+	return (pw + pw[knn].sum(axis=1)) / (knn.shape[1] + 1)
+
+
+def _local_precomputed(id_estimator, distance_matrix):
+	_check_precomputed(id_estimator)
+	n_frames = matrix_frames(distance_matrix)
+	dists, knn = knn_from_distance_matrix(distance_matrix, _n_neighbors(id_estimator, n_frames))
+	if isinstance(id_estimator, skdim.id.TwoNN):
+		id_estimator.set_params(dist=True)
+		pw = np.empty(len(knn))
+		for i, neighbours in enumerate(knn):
+			sub = np.sort(distance_submatrix(distance_matrix, neighbours), axis=1)
+			pw[i] = id_estimator.fit(sub[:, 1:3]).dimension_
+		return _smooth(pw, knn)
+	# skdim validates X even when neighbours are given: the placeholder only carries the number of samples
+	placeholder = np.zeros((len(knn), 2))
+	return id_estimator.fit_transform_pw(placeholder, precomputed_knn_arrays=(dists, knn), smooth=True)[1]
 
 
+def _global_knn(id_estimator, dists, knn):
+	# global ID from the sorted neighbours of every frame, which must hold at least _global_neighbors columns
+	_check_precomputed(id_estimator)
+	if isinstance(id_estimator, skdim.id.TwoNN):
+		id_estimator.set_params(dist=True)
+		return id_estimator.fit(dists[:, :2]).dimension_
+	placeholder = np.zeros((len(knn), 2))
+	return id_estimator.fit_transform(placeholder, precomputed_knn_arrays=(dists, knn))
 
 
+def _global_neighbors(id_estimator, n_frames):
+	# number of neighbours used by _global_knn
+	if isinstance(id_estimator, skdim.id.TwoNN):
+		return 2
+	return _n_neighbors(id_estimator, n_frames)
 
 
+def _global_precomputed(id_estimator, distance_matrix, frames=None):
+	_check_precomputed(id_estimator)
+	n_frames = len(range(*(frames or slice(None)).indices(matrix_frames(distance_matrix))))
+	dists, knn = knn_from_distance_matrix(distance_matrix, _global_neighbors(id_estimator, n_frames), frames=frames)
+	return _global_knn(id_estimator, dists, knn)
@@ -1,6 +1,15 @@
-import moleculekit.projections.metricdistance as distance
-from moleculekit.projections.metricdihedral import MetricDihedral, Dihedral
+from moleculekit.projections.metricdihedral import Dihedral
+import re
 import numpy as np
+from .kernels import pair_distances, dihedral_angles, aligned_coordinates
+from .contacts import contact_map
+from .feature_subsets import sample_pairs
+
+# selection keywords whose atoms depend on other atoms (bonds, residues, neighbours) or on positions: they select
+# different atoms once the molecule is cut down to the selection
+_CONTEXT_KEYWORDS = {'index', 'residue', 'fragment', 'same', 'within', 'exwithin', 'x', 'y', 'z', 'protein', 'nucleic',
+                     'backbone', 'sidechain', 'backbonetype', 'proteinback', 'nucleicback', 'lipid', 'lipids', 'ion',
+                     'ions', 'water', 'waters'}
 
 
 def compute_projections(mol, projection_method, **kwargs):
@@ -16,8 +25,11 @@ def compute_projections(mol, projection_method, **kwargs):
         MoleculeKit object containing atomic structure and trajectory.
     projection_method : str
         Type of projection to compute:
-            - 'Distances' : pairwise distances between selected atoms.
+            - 'Distances' : pairwise distances between selected atoms, each pair once. As MoleculeKit's
+              `MetricDistance(sele, sele, periodic='selections')`, pairs are not wrapped into the periodic box
+              (no minimum image): molecules should be whole in the trajectory.
             - 'Dihedrals' : specified backbone or side-chain dihedral angles.
+            - 'Coordinate' : atom coordinates after superposition onto a reference, as MoleculeKit's `MetricCoordinate`.
     **kwargs : dict
         Extra arguments specific to the projection method:
 
@@ -27,7 +39,14 @@ def compute_projections(mol, projection_method, **kwargs):
             step : int, default=1
                 Specifies after how many sele consider an atom in the computation.
             metric : str, default='distances'
-                Either 'distances' or 'contacts'.
+                Either 'distances' or 'contacts' (distance <= 8 Å). Contacts are returned
+                only for the pairs in contact in at least one frame.
+            max_features : int, optional
+                Maximum number of pairs (distances only, see `sample_pairs`).
+            sampling : str, default='random'
+                How pairs are chosen within `max_features`: 'random', 'bands' or 'farthest'.
+            seed : int, optional
+                Seed of the random pair sampling.
 
         For 'Dihedrals':
             dihedrals : tuple of str, default=('phi', 'psi')
@@ -35,6 +54,20 @@ def compute_projections(mol, projection_method, **kwargs):
             sincos : bool, default=False
                 If True, return sine and cosine of angles instead of degrees.
 
+        For 'Coordinate' (same meaning as in `MetricCoordinate`, without grouping):
+            atomsel : str
+                Atom selection string of the atoms whose coordinates are returned.
+            refmol : Molecule, optional
+                Reference to align to (its current frame). If None and `trajalnsel` is given, frames are aligned to the current frame of `mol`.
+            trajalnsel : str, optional
+                Atoms of `mol` superposed onto the reference (default 'protein and name CA' if `refmol` is given, otherwise no alignment).
+            refalnsel : str, optional
+                Atoms of `refmol` matching `trajalnsel` (default `trajalnsel`).
+            centersel : str, default='protein'
+                Atom selection around which the simulation is wrapped.
+            pbc : bool, default=True
+                If True, wrap the coordinates before alignment.
+
     Returns
     -------
     projection : np.ndarray
@@ -45,6 +78,8 @@ def compute_projections(mol, projection_method, **kwargs):
     ------
     ValueError
         If input molecule is empty or projection method is invalid.
+    RuntimeError
+        If a 'Coordinate' selection is empty or alignment selections differ in size.
     '''
     
     #check if non empty
@@ -62,47 +97,102 @@ def compute_projections(mol, projection_method, **kwargs):
         metric_type = kwargs.get('metric', 'distances') #default is distances
         if metric_type not in ('distances', 'contacts'):
             raise ValueError(f'Invalid metric type: {metric_type}. Use "distances" or "contacts".')
+        if metric_type == 'contacts': #only pairs in contact at least once, see contacts.py
+            packed, pairs = contact_map(mol, sele=sele, step=step, sample=None) #every frame searched: no pair missed
+            return np.unpackbits(packed, axis=1, count=len(pairs)).astype(bool)
+
         all_atoms = mol.atomselect(sele, indexes=True)
         
         atoms = all_atoms[0::step]
-        dim = len(atoms) * (len(atoms) - 1) // 2
-        pairs = np.zeros((dim, 2), dtype=int)
-        k = 0
-        for i in range(len(atoms)):
-            for j in range(i + 1, len(atoms)):
-                pairs[k] = [atoms[i], atoms[j]]
-                k += 1
-        
-        sel1 = [f'index {i}' for i in pairs[:, 0]]
-        sel2 = [f'index {j}' for j in pairs[:, 1]]
-
-        
-        #sel1 = 'protein and name CA'
-        #sel2 = 'protein and name CA'
-        met = distance.MetricDistance(sel1=sel1, sel2=sel2,
-                                    metric=metric_type, periodic='selections') #also contacts
-        projection = met.project(mol)
+        max_features = kwargs.get('max_features', None)
+        if max_features is not None:
+            pairs = sample_pairs(mol, atoms, max_features, sampling=kwargs.get('sampling', 'random'), seed=kwargs.get('seed', None))
+        else:
+            i, j = np.triu_indices(len(atoms), k=1) #each pair once, i < j
+            pairs = np.column_stack((atoms[i], atoms[j]))
+
+        projection = pair_distances(mol.coords, pairs)
         return projection
 
     elif projection_method == 'Dihedrals':
         dihedrals = kwargs.get('dihedrals', ('phi', 'psi'))
         sincos = kwargs.get('sincos', False)
         angles = Dihedral.proteinDihedrals(mol=mol, sel = 'protein', dih=dihedrals)
-        met = MetricDihedral(dih=angles, sincos=sincos, protsel= 'all')
-        projection = met.project(mol)
+        quads = Dihedral.dihedralsToIndexes(mol, angles, mol.atomselect('all'))
+        projection = dihedral_angles(mol.coords, quads, sincos=sincos)
         return projection
-        
-
-
-
-#chi1 ARG ASN ASP CYS GLN GLU HIS ILE LEU LYS MET PHE PRO SER THR TRP TYR VAL
-#chi2 ARG ASN ASP GLN GLU HIS ILE LEU MET PHE PRO TRP TYR
-#chi3 ARG GLN GLU LYS MET
-#chi4 ARG LYS
-#chi5 ARG
-
-
 
+    elif projection_method == 'Coordinate':
+        atomsel = kwargs.get('atomsel', None)
+        if atomsel is None:
+            raise ValueError('Atom selection cannot be None')
+        refmol = kwargs.get('refmol', None)
+        trajalnsel = kwargs.get('trajalnsel', None)
+        if refmol is not None and trajalnsel is None:
+            trajalnsel = 'protein and name CA'
+        if kwargs.get('pbc', True):
+            mol = mol.copy()
+            mol.wrap(kwargs.get('centersel', 'protein'))
+
+        atoms = mol.atomselect(atomsel, indexes=True)
+        if len(atoms) == 0:
+            raise RuntimeError('Atom selection resulted in 0 atoms.')
+        align_atoms = reference = None
+        if trajalnsel is not None:
+            align_atoms = mol.atomselect(trajalnsel, indexes=True)
+            if len(align_atoms) == 0:
+                raise RuntimeError('Alignment selection resulted in 0 atoms.')
+            ref = refmol if refmol is not None else mol
+            ref_atoms = ref.atomselect(kwargs.get('refalnsel', None) or trajalnsel, indexes=True)
+            if len(ref_atoms) != len(align_atoms):
+                raise RuntimeError(f'Cannot align: the selections have {len(align_atoms)} and {len(ref_atoms)} atoms.')
+            reference = ref.coords[ref_atoms, :, ref.frame]
+        return aligned_coordinates(mol.coords, atoms, align_atoms, reference)
+
+
+def projection_atoms(projection_method, projection_kwargs=None):
+    '''
+    Returns an atom selection string holding every atom that a projection reads, so that only these atoms are
+    loaded (see `load_molecule`), or None if the projection may need all atoms.
 
+    "Distances" reads the atoms of `sele`, "Dihedrals" the protein atoms and "Coordinate" without wrapping (``pbc=False``)
+    the atoms of its selections. Wrapped coordinates, other MoleculeKit metrics, `Projection` objects and arrays need all atoms.
+    So do selections using keywords that depend on other atoms or on positions (e.g. "index", "protein", "within",
+    "same residue as"), which would select other atoms once evaluated on the cut-down molecule.
 
+    Parameters
+    ----------
+    projection_method : str, Projection or np.ndarray
+        Projection, as in `intrinsic_dimension`.
+    projection_kwargs : dict, optional
+        Parameters of the projection, as in `intrinsic_dimension`.
 
+    Returns
+    -------
+    atoms : str or None
+    '''
+    projection_kwargs = projection_kwargs or {}
+    if not isinstance(projection_method, str):
+        return None
+    if projection_method == 'Distances':
+        return _local_selection(projection_kwargs.get('sele', 'name CA'))
+    if projection_method == 'Dihedrals':
+        return 'protein' #the dihedral atoms of a protein are all protein atoms, and stay so
+    if projection_method == 'Coordinate' and 'groupsel' not in projection_kwargs and not projection_kwargs.get('pbc', True) \
+            and projection_kwargs.get('atomsel') is not None:
+        selections = [projection_kwargs['atomsel']]
+        trajalnsel = projection_kwargs.get('trajalnsel')
+        if projection_kwargs.get('refmol') is not None:
+            selections.append(trajalnsel or 'protein and name CA')
+        elif trajalnsel is not None: #aligned to a frame of the trajectory itself
+            selections += [trajalnsel, projection_kwargs.get('refalnsel') or trajalnsel]
+        if all(_local_selection(sele) is not None for sele in selections):
+            return ' or '.join(f'({sele})' for sele in selections)
+    return None
+
+
+def _local_selection(sele):
+    # the selection if it selects the same atoms on any molecule holding them, None otherwise
+    if any(word.lower() in _CONTEXT_KEYWORDS for word in re.findall(r'[A-Za-z_]+', sele)):
+        return None
+    return sele
@@ -0,0 +1,138 @@
+import numpy as np
+from scipy.spatial import cKDTree
+from .distance_matrix import condensed_size, _row_offset
+from .kernels import pair_distances
+
+# same default as MoleculeKit's MetricDistance
+CONTACT_THRESHOLD = 8
+
+
+def _candidate_pairs(coords, atoms, frames, radius):
+    # pairs of selected atoms closer than radius in any of the given frames, sorted as np.triu_indices
+    n_atoms = len(atoms)
+    codes = np.empty(0, dtype=np.int64)
+    for f in frames:
+        found = cKDTree(coords[atoms, :, f]).query_pairs(radius, output_type='ndarray')
+        codes = np.union1d(codes, found[:, 0].astype(np.int64) * n_atoms + found[:, 1])
+    return np.column_stack((codes // n_atoms, codes % n_atoms))
+
+
+def contact_map(mol, sele='name CA', step=1, cutoff=CONTACT_THRESHOLD, sample=1000, margin=2.0, chunk_size=1000):
+    '''
+    Computes a bit-packed contact map holding only the atom pairs that are in contact in at least one frame.
+
+    Candidate pairs are found with a neighbour search tree on a sample of frames, using
+    `cutoff + margin` to catch pairs that only come into contact between sampled frames.
+    Only the candidates' distances are then computed over the whole trajectory, in chunks of frames,
+    and pairs never within `cutoff` are dropped. Pairs that are never in contact carry no information
+    on the distance between frames, so ID estimates are unchanged, while for large proteins the number
+    of columns drops from N(N-1)/2 to a few per atom.
+
+    Parameters
+    ----------
+    mol : moleculekit.molecule.Molecule
+        MoleculeKit object containing atomic structure and trajectory.
+    sele : str, default='name CA'
+        Atom selection string (VMD format).
+    step : int, default=1
+        Specifies after how many sele consider an atom in the computation.
+    cutoff : float, default=8
+        Contact distance in Angstrom.
+    sample : int, optional
+        Maximum number of evenly spaced frames searched for candidate pairs (default 1000).
+        If None, all frames are searched and no pair can be missed.
+    margin : float, default=2.0
+        Extra distance, in Angstrom, used when searching sampled frames. Ignored if all frames are searched.
+    chunk_size : int, default=1000
+        Number of frames processed at once.
+
+    Returns
+    -------
+    packed : np.ndarray
+        Contacts packed along the pairs with `np.packbits`, shape (frames, ceil(pairs / 8)), uint8.
+        ``np.unpackbits(packed, axis=1, count=len(pairs))`` recovers the (frames, pairs) contact matrix.
+    pairs : np.ndarray
+        Atom indexes of each column, shape (pairs, 2).
+
+    Raises
+    ------
+    ValueError
+        If the selection contains fewer than two atoms.
+    '''
+    atoms = mol.atomselect(sele, indexes=True)[0::step]
+    if len(atoms) < 2:
+        raise ValueError(f'Atom selection "{sele}" resulted in {len(atoms)} atoms, at least 2 are required.')
+    n_frames = mol.numFrames
+    if sample is None or sample >= n_frames:
+        frames, radius = range(n_frames), cutoff
+    else:
+        frames, radius = np.linspace(0, n_frames - 1, sample).astype(int), cutoff + margin
+    local = _candidate_pairs(mol.coords, atoms, frames, radius)
+    pairs = atoms[local]
+
+    packed = np.empty((n_frames, (len(pairs) + 7) // 8), dtype=np.uint8)
+    ever = np.zeros(len(pairs), dtype=bool)
+    for start in range(0, n_frames, chunk_size):
+        contacts = pair_distances(mol.coords[:, :, start:start + chunk_size], pairs) <= cutoff
+        ever |= contacts.any(axis=0)
+        packed[start:start + chunk_size] = np.packbits(contacts, axis=1)
+
+    if not ever.all():
+        compact = np.empty((n_frames, (ever.sum() + 7) // 8), dtype=np.uint8)
+        for start in range(0, n_frames, chunk_size):
+            contacts = np.unpackbits(packed[start:start + chunk_size], axis=1, count=len(pairs))
+            compact[start:start + chunk_size] = np.packbits(contacts[:, ever], axis=1)
+        packed, pairs = compact, pairs[ever]
+    return packed, pairs
+
+
+def contact_distances(packed, filename=None, block_size=1024, chunk_bytes=512, dtype=np.float32):
+    '''
+    Computes the condensed frame-by-frame Euclidean distance matrix of a bit-packed contact map.
+
+    The squared distance between two binary frames is the number of differing contacts,
+    computed as ``|a| + |b| - 2 a.b`` with blocked matrix products on unpacked chunks of
+    columns, so that the dense contact matrix is never built. The result can be passed as
+    `distance_matrix` to `intrinsic_dimension`.
+
+    Parameters
+    ----------
+    packed : np.ndarray
+        Packed contact map, shape (frames, bytes), as returned by `contact_map`.
+    filename : str, optional
+        If given, the condensed matrix is written to this `.npy` file and returned as a `np.memmap`.
+    block_size : int, default=1024
+        Number of frames per block of rows.
+    chunk_bytes : int, default=512
+        Number of packed columns (8 contacts each) unpacked at once.
+    dtype : numpy dtype, default=np.float32
+        Data type of the stored matrix.
+
+    Returns
+    -------
+    distances : np.ndarray
+        Condensed distance matrix of shape (n_frames * (n_frames - 1) / 2,).
+    '''
+    n_frames = len(packed)
+    counts = np.unpackbits(packed, axis=1).sum(axis=1, dtype=np.float64)
+    if filename is not None:
+        distances = np.lib.format.open_memmap(filename, mode='w+', dtype=dtype, shape=(condensed_size(n_frames),))
+    else:
+        distances = np.empty(condensed_size(n_frames), dtype=dtype)
+
+    for a in range(0, n_frames - 1, block_size):
+        a_stop = min(a + block_size, n_frames)
+        # float32 products of 0/1 values are exact up to 2**24 contacts
+        dots = np.zeros((a_stop - a, n_frames - a), dtype=np.float32)
+        for c in range(0, packed.shape[1], chunk_bytes):
+            rest = np.unpackbits(packed[a:, c:c + chunk_bytes], axis=1).astype(np.float32)
+            dots += rest[:a_stop - a] @ rest.T
+        squares = counts[a:a_stop, None] + counts[None, a:] - 2 * dots
+        values = np.sqrt(np.clip(squares, 0, None))
+        for i in range(a, a_stop):
+            offset = _row_offset(i, n_frames)
+            distances[offset + i + 1: offset + n_frames] = values[i - a, i + 1 - a:]
+
+    if filename is not None:
+        distances.flush()
+    return distances
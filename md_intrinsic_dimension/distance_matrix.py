@@ -0,0 +1,247 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def condensed_size(n_frames):
+    '''Number of entries of the condensed (upper triangular) form of a (n_frames, n_frames) distance matrix.'''
+    return n_frames * (n_frames - 1) // 2
+
+
+def matrix_frames(distance_matrix):
+    '''
+    Returns the number of frames described by a distance matrix.
+
+    Parameters
+    ----------
+    distance_matrix : np.ndarray
+        Either a square matrix of shape (n_frames, n_frames) or its condensed form
+        of shape (n_frames * (n_frames - 1) / 2,), as returned by `scipy.spatial.distance.pdist`.
+
+    Returns
+    -------
+    n_frames : int
+
+    Raises
+    ------
+    ValueError
+        If the array is neither square nor a valid condensed matrix.
+    '''
+    if distance_matrix.ndim == 2:
+        if distance_matrix.shape[0] != distance_matrix.shape[1]:
+            raise ValueError(f'Distance matrix must be square, got shape {distance_matrix.shape} instead.')
+        return distance_matrix.shape[0]
+    if distance_matrix.ndim == 1:
+        n_frames = int(round((1 + np.sqrt(1 + 8 * len(distance_matrix))) / 2))
+        if condensed_size(n_frames) != len(distance_matrix):
+            raise ValueError(f'Condensed distance matrix of length {len(distance_matrix)} does not match any number of frames.')
+        return n_frames
+    raise ValueError(f'Expected a 1D (condensed) or 2D (square) distance matrix, got {distance_matrix.ndim}D array instead.')
+
+
+def _row_offset(i, n_frames):
+    # position of (i, j) in the condensed form is _row_offset(i) + j, for i < j
+    return n_frames * i - i * (i + 1) // 2 - i - 1
+
+
+def distance_rows(distance_matrix, start, stop):
+    '''
+    Returns a dense block of rows of a square or condensed distance matrix.
+
+    Condensed matrices are read with contiguous slices only, so that memory-mapped
+    files are accessed sequentially.
+
+    Parameters
+    ----------
+    distance_matrix : np.ndarray
+        Square or condensed distance matrix (can be a `np.memmap`).
+    start, stop : int
+        Range of rows to return.
+
+    Returns
+    -------
+    rows : np.ndarray
+        Array of shape (stop - start, n_frames).
+    '''
+    if distance_matrix.ndim == 2:
+        return np.asarray(distance_matrix[start:stop])
+
+    n_frames = matrix_frames(distance_matrix)
+    rows = np.zeros((stop - start, n_frames), dtype=distance_matrix.dtype)
+    for j in range(stop):
+        offset = _row_offset(j, n_frames)
+        if j < start:
+            # column j of the block is the contiguous piece (j, start:stop) of row j
+            rows[:, j] = distance_matrix[offset + start: offset + stop]
+        else:
+            segment = distance_matrix[offset + j + 1: offset + n_frames]
+            rows[j - start, j + 1:] = segment
+            rows[j + 1 - start:, j] = segment[:stop - j - 1]
+    return rows
+
+
+def distance_submatrix(distance_matrix, indexes):
+    '''
+    Returns the dense distance matrix among a subset of frames.
+
+    Parameters
+    ----------
+    distance_matrix : np.ndarray
+        Square or condensed distance matrix.
+    indexes : array-like of int
+        Frame indexes.
+
+    Returns
+    -------
+    submatrix : np.ndarray
+        Array of shape (len(indexes), len(indexes)).
+    '''
+    indexes = np.asarray(indexes)
+    if distance_matrix.ndim == 2:
+        return np.asarray(distance_matrix[np.ix_(indexes, indexes)])
+
+    n_frames = matrix_frames(distance_matrix)
+    i = np.minimum.outer(indexes, indexes)
+    j = np.maximum.outer(indexes, indexes)
+    diagonal = i == j
+    position = n_frames * i - i * (i + 1) // 2 + j - i - 1
+    position[diagonal] = 0
+    submatrix = np.asarray(distance_matrix[position.ravel()]).reshape(position.shape)
+    submatrix[diagonal] = 0
+    return submatrix
+
+
+def knn_from_distance_matrix(distance_matrix, k, frames=None, block_size=1024):
+    '''
+    Computes the sorted k nearest neighbours of every frame from a precomputed distance matrix.
+
+    The matrix is processed in blocks of rows, so that only (block_size, n_frames)
+    distances are held in memory at once. As in scikit-learn, each frame is not
+    counted among its own neighbours.
+
+    Parameters
+    ----------
+    distance_matrix : np.ndarray
+        Square or condensed distance matrix (can be a `np.memmap`).
+    k : int
+        Number of neighbours.
+    frames : slice, optional
+        Restrict both queries and neighbours to a contiguous range of frames (e.g. the last ones).
+        Returned indexes are relative to the start of the range.
+    block_size : int, default=1024
+        Number of rows processed at once.
+
+    Returns
+    -------
+    dists : np.ndarray
+        Sorted neighbour distances, shape (n_frames, k).
+    inds : np.ndarray
+        Neighbour indexes, shape (n_frames, k).
+    '''
+    n_frames = matrix_frames(distance_matrix)
+    first, last, _ = (frames or slice(None)).indices(n_frames)
+    n = last - first
+    if k >= n:
+        raise ValueError(f'Found array with {n} sample(s) while a minimum of {k + 1} is required.')
+
+    dists = np.empty((n, k), dtype=np.float64)
+    inds = np.empty((n, k), dtype=np.intp)
+    for start in range(first, last, block_size):
+        stop = min(start + block_size, last)
+        rows = distance_rows(distance_matrix, start, stop)[:, first:last].astype(np.float64)
+        rows[np.arange(stop - start), np.arange(start - first, stop - first)] = np.inf
+        part = np.argpartition(rows, k - 1, axis=1)[:, :k]
+        part_d = np.take_along_axis(rows, part, axis=1)
+        order = np.argsort(part_d, axis=1, kind='stable')
+        dists[start - first:stop - first] = np.take_along_axis(part_d, order, axis=1)
+        inds[start - first:stop - first] = np.take_along_axis(part, order, axis=1)
+    return dists, inds
+
+
+def _superposed_rmsd(block_a, sq_a, block_b, sq_b):
+    # Kabsch: msd = (|A|^2 + |B|^2 - 2 * sum of signed singular values of A^T B) / n_atoms
+    n_atoms = block_a.shape[1]
+    cov = np.empty((len(block_a), len(block_b), 3, 3))
+    for i in range(3):
+        for j in range(3):
+            cov[:, :, i, j] = block_a[:, :, i] @ block_b[:, :, j].T
+    sv = np.linalg.svd(cov, compute_uv=False)
+    sv[..., 2] *= np.sign(np.linalg.det(cov))
+    msd = (sq_a[:, None] + sq_b[None, :] - 2 * sv.sum(axis=-1)) / n_atoms
+    return np.sqrt(np.clip(msd, 0, None))
+
+
+def pairwise_rmsd(mol, sele='protein and name CA', filename=None, block_size=256, n_jobs=None, dtype=np.float32):
+    '''
+    Computes the frame-by-frame RMSD matrix after optimal superposition, in condensed form.
+
+    Frames are processed in (block_size x block_size) tiles on a thread pool; each tile
+    is written directly to the output, which can be a memory-mapped `.npy` file so that
+    the full matrix never needs to fit in memory.
+
+    Parameters
+    ----------
+    mol : moleculekit.molecule.Molecule
+        MoleculeKit object containing atomic structure and trajectory.
+    sele : str, default='protein and name CA'
+        Atom selection string (VMD format) used for both superposition and RMSD.
+    filename : str, optional
+        If given, the condensed matrix is written to this `.npy` file and returned as a `np.memmap`.
+        It can be reloaded with ``np.load(filename, mmap_mode='r')``.
+    block_size : int, default=256
+        Number of frames per tile.
+    n_jobs : int, optional
+        Number of threads (default: number of CPUs).
+    dtype : numpy dtype, default=np.float32
+        Data type of the stored matrix.
+
+    Returns
+    -------
+    rmsd : np.ndarray
+        Condensed RMSD matrix of shape (n_frames * (n_frames - 1) / 2,), in Angstrom.
+
+    Raises
+    ------
+    ValueError
+        If the molecule has fewer than two frames or the selection is empty.
+    '''
+    atoms = mol.atomselect(sele, indexes=True)
+    if len(atoms) == 0:
+        raise ValueError(f'Atom selection "{sele}" resulted in 0 atoms.')
+    if mol.numFrames < 2:
+        raise ValueError('At least two frames are required to compute pairwise RMSD.')
+
+    coords = np.transpose(mol.coords[atoms], (2, 0, 1)).astype(np.float64)
+    coords -= coords.mean(axis=1, keepdims=True)
+    squares = np.einsum('fni,fni->f', coords, coords)
+    n_frames = len(coords)
+
+    if filename is not None:
+        rmsd = np.lib.format.open_memmap(filename, mode='w+', dtype=dtype, shape=(condensed_size(n_frames),))
+    else:
+        rmsd = np.empty(condensed_size(n_frames), dtype=dtype)
+
+    starts = range(0, n_frames, block_size)
+
+    def tile(a, b):
+        a_stop = min(a + block_size, n_frames)
+        b_stop = min(b + block_size, n_frames)
+        values = _superposed_rmsd(coords[a:a_stop], squares[a:a_stop], coords[b:b_stop], squares[b:b_stop])
+        for i in range(a, a_stop):
+            first = max(b, i + 1)
+            if first < b_stop:
+                offset = _row_offset(i, n_frames)
+                rmsd[offset + first: offset + b_stop] = values[i - a, first - b:]
+
+    logger.info(f'Computing pairwise RMSD of {n_frames} frames over {len(atoms)} atoms.')
+    with ThreadPoolExecutor(max_workers=n_jobs or os.cpu_count()) as pool:
+        futures = [pool.submit(tile, a, b) for a in starts for b in starts if b >= a]
+        for future in futures:
+            future.result()
+
+    if filename is not None:
+        rmsd.flush()
+    return rmsd
@@ -0,0 +1,73 @@
+import numpy as np
+
+
+def unique_frames(projection, tolerance=0.0):
+    '''
+    Finds repeated frames of a projection, e.g. from restarts or overlapping trajectory chunks.
+
+    Rows are hashed as raw bytes, after quantization on a grid of side `tolerance` if it is positive, and
+    sorted once, so that duplicates are found in O(n log n) without any distance computation.
+    Of each group of duplicates, the last occurrence is kept, so that the final frames of the trajectory
+    (the "last simulation" section) are all kept.
+
+    Parameters
+    ----------
+    projection : np.ndarray
+        Array of shape (frames, features).
+    tolerance : float, default=0.0
+        If 0, only identical frames are collapsed. Otherwise, every feature is snapped to a grid of side
+        `tolerance` (``floor(x / tolerance)``) and frames falling in the same grid cell are collapsed. Such frames
+        differ by less than `tolerance` in every feature, but close frames on either side of a cell boundary are
+        not collapsed: this is a grid snapping, not a distance threshold.
+
+    Returns
+    -------
+    keep : np.ndarray
+        Sorted indexes of the frames kept.
+    inverse : np.ndarray
+        For each frame, its position in `keep`: ``projection[keep][inverse]`` has the shape of `projection`.
+
+    Raises
+    ------
+    ValueError
+        If `tolerance` is negative.
+    '''
+    if tolerance < 0:
+        raise ValueError(f'tolerance must be >= 0, got {tolerance} instead.')
+    X = np.asarray(projection).reshape(len(projection), -1)
+    if tolerance > 0:
+        X = np.floor(X / tolerance).astype(np.int64)
+    X = np.ascontiguousarray(X + 0) #+0 turns -0.0 into 0.0
+    rows = X.view(np.dtype((np.void, X.dtype.itemsize * X.shape[1]))).ravel()
+
+    n = len(rows)
+    _, first, inverse = np.unique(rows[::-1], return_index=True, return_inverse=True)
+    last_occurrence = n - 1 - first
+    order = np.argsort(last_occurrence)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return last_occurrence[order], rank[inverse.ravel()[::-1]]
+
+
+def expand_local(local_id, inverse, last):
+    '''
+    Maps a local ID computed on unique frames back to all frames.
+
+    Parameters
+    ----------
+    local_id : np.ndarray
+        Local ID of the kept frames.
+    inverse : np.ndarray
+        As returned by `unique_frames`.
+    last : int
+        Number of final frames of the "last simulation" mean.
+
+    Returns
+    -------
+    mean_all : float
+    mean_last : float
+    local_id : np.ndarray
+        Local ID of every frame, shape (frames,).
+    '''
+    local_id = local_id[inverse]
+    return float(np.mean(local_id)), float(np.mean(local_id[-last:])), local_id
@@ -0,0 +1,165 @@
+import numpy as np
+import pandas as pd
+from .compute_id import compute_global
+from .kernels import pair_distances
+
+PAIR_SAMPLINGS = ('random', 'bands', 'farthest')
+
+
+def _pairs_from_codes(codes, n):
+    # (i, j) of the k-th pair in np.triu_indices(n, k=1) order, without building all pairs
+    codes = np.asarray(codes, dtype=np.int64)
+    i = n - 2 - np.floor(np.sqrt(-8 * codes + 4 * n * (n - 1) - 7) / 2 - 0.5).astype(np.int64)
+    j = codes + i + 1 - n * (n - 1) // 2 + (n - i) * (n - i - 1) // 2
+    return i, j
+
+
+def _random_pairs(n, max_features, rng):
+    codes = np.sort(rng.choice(n * (n - 1) // 2, size=max_features, replace=False))
+    return _pairs_from_codes(codes, n)
+
+
+def _band_pairs(n, max_features):
+    # separations spread geometrically from the closest neighbours, as many as fit in the budget
+    separations = np.array([1])
+    for m in range(2, n):
+        chosen = np.unique(np.round(np.geomspace(1, n - 1, m)).astype(int))
+        if np.sum(n - chosen) > max_features:
+            break
+        separations = chosen
+    i = np.concatenate([np.arange(n - s) for s in separations])
+    j = np.concatenate([np.arange(s, n) for s in separations])
+    if len(i) > max_features: #the closest band alone exceeds the budget
+        keep = np.linspace(0, len(i) - 1, max_features).astype(int)
+        i, j = i[keep], j[keep]
+    order = np.lexsort((j, i))
+    return i[order], j[order]
+
+
+def _farthest_pairs(xyz, max_features, rng):
+    # all pairs among the atoms picked by farthest point sampling on one frame
+    m = int((1 + np.sqrt(1 + 8 * max_features)) // 2)
+    chosen = [int(rng.integers(len(xyz)))]
+    dist = np.linalg.norm(xyz - xyz[chosen[0]], axis=1)
+    for _ in range(m - 1):
+        chosen.append(int(np.argmax(dist)))
+        dist = np.minimum(dist, np.linalg.norm(xyz - xyz[chosen[-1]], axis=1))
+    chosen = np.sort(chosen)
+    i, j = np.triu_indices(m, k=1)
+    return chosen[i], chosen[j]
+
+
+def sample_pairs(mol, atoms, max_features, sampling='random', seed=None):
+    '''
+    Selects at most `max_features` pairs of atoms for a Distances projection.
+
+    Parameters
+    ----------
+    mol : moleculekit.molecule.Molecule
+        MoleculeKit object (the first frame is used by "farthest").
+    atoms : np.ndarray
+        Indexes of the selected atoms.
+    max_features : int
+        Maximum number of pairs.
+    sampling : str, default='random'
+        - 'random' : uniformly random pairs.
+        - 'bands' : all pairs at a few sequence separations (positions in `atoms`), spread
+          geometrically from the nearest neighbours.
+        - 'farthest' : all pairs among atoms chosen by farthest point sampling.
+    seed : int, optional
+        Seed of the random generator ("random" pairs and first "farthest" atom).
+
+    Returns
+    -------
+    pairs : np.ndarray
+        Atom indexes, shape (pairs, 2), in the same order as the full projection.
+
+    Raises
+    ------
+    ValueError
+        If `sampling` is invalid or `max_features` < 1.
+    '''
+    if sampling not in PAIR_SAMPLINGS:
+        raise ValueError(f'Invalid pair sampling: {sampling}. Use one of {PAIR_SAMPLINGS}.')
+    if max_features < 1:
+        raise ValueError(f'max_features must be >= 1, got {max_features} instead.')
+    n = len(atoms)
+    if max_features >= n * (n - 1) // 2:
+        i, j = np.triu_indices(n, k=1)
+    elif sampling == 'random':
+        i, j = _random_pairs(n, max_features, np.random.default_rng(seed))
+    elif sampling == 'bands':
+        i, j = _band_pairs(n, max_features)
+    else:
+        i, j = _farthest_pairs(mol.coords[atoms, :, 0], max_features, np.random.default_rng(seed))
+    return np.column_stack((atoms[i], atoms[j]))
+
+
+def _frame_distances(coords, atoms, pairs=None, chunk_size=100000):
+    # square Euclidean distance matrix between frames of a Distances projection, accumulated over
+    # chunks of pairs so that the projection itself is never held in memory
+    n = len(atoms)
+    n_pairs = n * (n - 1) // 2 if pairs is None else len(pairs)
+    squares = np.zeros((coords.shape[2], coords.shape[2]))
+    for start in range(0, n_pairs, chunk_size):
+        if pairs is None:
+            i, j = _pairs_from_codes(np.arange(start, min(start + chunk_size, n_pairs)), n)
+            chunk = np.column_stack((atoms[i], atoms[j]))
+        else:
+            chunk = pairs[start:start + chunk_size]
+        projection = pair_distances(coords, chunk).astype(np.float64)
+        norms = np.einsum('fp,fp->f', projection, projection)
+        squares += norms[:, None] + norms[None, :] - 2 * projection @ projection.T
+    np.fill_diagonal(squares, 0)
+    return np.sqrt(np.clip(squares, 0, None)), n_pairs
+
+
+def feature_subset_shift(mol, max_features, sele='name CA', step=1, samplings=PAIR_SAMPLINGS, seed=None, sample=500, estimator='TwoNN', **id_kwargs):
+    '''
+    Estimates how much limiting the Distances projection to `max_features` pairs moves the global ID.
+
+    The ID of the full projection and of each sampled subset is computed on the same
+    evenly spaced sample of frames, from frame-by-frame distance matrices accumulated over
+    chunks of pairs, so that memory scales with the number of sampled frames only.
+
+    Parameters
+    ----------
+    mol : moleculekit.molecule.Molecule
+        MoleculeKit object containing atomic structure and trajectory.
+    max_features : int
+        Maximum number of pairs.
+    sele : str, default='name CA'
+        Atom selection string (VMD format).
+    step : int, default=1
+        Specifies after how many sele consider an atom in the computation.
+    samplings : tuple of str, default=('random', 'bands', 'farthest')
+        Strategies to compare (see `sample_pairs`).
+    seed : int, optional
+        Seed of the random generator.
+    sample : int, default=500
+        Maximum number of frames used.
+    estimator : str, default='TwoNN'
+        Estimator from scikit-dimension supporting distance matrices ('TwoNN', 'MLE' or 'MOM').
+        Additional keys are passed to its constructor.
+
+    Returns
+    -------
+    results : DataFrame
+        Columns "sampling", "features", "global ID", "shift" (difference from the full projection),
+        with the full projection in the first row.
+    '''
+    frames = np.unique(np.linspace(0, mol.numFrames - 1, min(sample, mol.numFrames)).astype(int))
+    coords = mol.coords[:, :, frames]
+    atoms = mol.atomselect(sele, indexes=True)[0::step]
+
+    def global_id(distances):
+        return compute_global(distances, estimator=estimator, last=len(distances), precomputed=True, **id_kwargs)[0]
+
+    distances, n_pairs = _frame_distances(coords, atoms)
+    full_id = global_id(distances)
+    results = [{'sampling': 'all pairs', 'features': n_pairs, 'global ID': full_id, 'shift': 0.0}]
+    for sampling in samplings:
+        pairs = sample_pairs(mol, atoms, max_features, sampling=sampling, seed=seed)
+        gid = global_id(_frame_distances(coords, atoms, pairs)[0])
+        results.append({'sampling': sampling, 'features': len(pairs), 'global ID': gid, 'shift': gid - full_id})
+    return pd.DataFrame(results)
@@ -0,0 +1,169 @@
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import skdim
+from .compute_id import PRECOMPUTED_ESTIMATORS, _global_knn, _global_neighbors
+from .distance_matrix import knn_from_distance_matrix
+from .kernels import start_threads
+from .load_trajectory import load_molecule
+from .md_intrinsic_dimension import _project
+from .section_id import _residue_windows, _window_atoms
+
+
+# largest number of tiles along a block for which the distances are shared between blocks
+_MAX_TILES = 8
+
+
+def time_blocks(n_frames, block_size, block_stride):
+    '''Returns the [start, stop) frames of each complete sliding block of frames.'''
+    return [(start, start + block_size) for start in range(0, n_frames - block_size + 1, block_stride)]
+
+
+def _tile(X, norms, a, b, size):
+    # Euclidean distances between the frames a:a+size and b:b+size
+    d2 = X[a:a + size] @ X[b:b + size].T
+    d2 *= -2
+    d2 += norms[a:a + size, None]
+    d2 += norms[None, b:b + size]
+    return np.sqrt(np.clip(d2, 0, None))
+
+
+def block_ids(projection, blocks, estimator='TwoNN', **id_kwargs):
+    '''
+    Computes the global intrinsic dimension (ID) of each block of frames of one projection.
+
+    For the neighbour-based estimators TwoNN, MLE and MOM, frames are split into tiles of the stride between blocks,
+    and the distances between two tiles are computed once and shared by all the overlapping blocks that contain both,
+    the tiles at the end of a block being cut to its size. Tiles behind the current block are released, so memory stays
+    of the order of one block's distance matrix. Blocks that are not evenly spaced, or whose tiles would be much smaller
+    than a block, are computed one by one. Other estimators are fitted on each block.
+
+    Parameters
+    ----------
+    projection : np.ndarray
+        Array of shape (frames, features).
+    blocks : list of tuple
+        [start, stop) frames of each block, from `time_blocks`.
+    estimator : str, default='TwoNN'
+        Name of the estimator from scikit-dimension.
+    **id_kwargs
+        Passed to the estimator's constructor.
+
+    Returns
+    -------
+    ids : np.ndarray
+        Global ID of each block, shape (blocks,).
+    '''
+    id_estimator = getattr(skdim.id, estimator)(**id_kwargs)
+    if estimator not in PRECOMPUTED_ESTIMATORS:
+        return np.array([id_estimator.fit(projection[start:stop]).dimension_ for start, stop in blocks], dtype=float)
+
+    X = np.asarray(projection, dtype=np.float64)
+    norms = np.einsum('ij,ij->i', X, X)
+    k = _global_neighbors(id_estimator, blocks[0][1] - blocks[0][0])
+    # tile size: the frames between the starts of two blocks, so that every block starts on a tile
+    size = math.gcd(*[start for start, _ in blocks]) if len(blocks) > 1 else blocks[0][1] - blocks[0][0]
+    shared = size > 0 and size * _MAX_TILES >= min(stop - start for start, stop in blocks)
+    tiles = {}
+    ids = np.empty(len(blocks))
+    for b, (start, stop) in enumerate(blocks):
+        if not shared: #many small tiles would cost more than they save
+            distances = _tile(X, norms, start, start, stop - start)
+        else:
+            chunks = range(start // size, -(-stop // size))
+            for key in [key for key in tiles if key[0] < chunks[0]]:
+                del tiles[key]
+            rows = []
+            for i in chunks:
+                row = []
+                for j in chunks:
+                    key = (min(i, j), max(i, j))
+                    if key not in tiles:
+                        tiles[key] = _tile(X, norms, key[0] * size, key[1] * size, size)
+                    row.append(tiles[key] if i <= j else tiles[key].T)
+                rows.append(row)
+            distances = np.block(rows)[:stop - start, :stop - start]
+        dists, knn = knn_from_distance_matrix(distances, k)
+        ids[b] = _global_knn(id_estimator, dists, knn)
+    return ids
+
+
+def id_map(topology=None, trajectory=None, mol=None, window_size=10, stride=1, block_size=100, block_stride=None, projection_method='Distances', projection_kwargs=None, id_kwargs=None, frames=None, n_jobs=1):
+    '''
+    Computes a map of intrinsic dimension (ID) over residue windows (as in `section_id`) and time windows
+    (global ID over sliding blocks of frames), showing where and when the protein gains or loses flexibility.
+
+    Each residue window is projected once over all frames, and the distances between its frames are
+    shared between overlapping time blocks (see `block_ids`). Residue windows are computed on a thread pool.
+
+    Parameters
+    ----------
+    topology : str, optional
+        Path to the topology file (e.g., .pdb, .psf). Required if `mol` is not provided.
+    trajectory : str, optional
+        Path to the trajectory file (e.g., .dcd, .xtc). Required if `mol` is not provided.
+    mol : Molecule, optional
+        A pre-loaded MoleculeKit `Molecule` object. If provided, `topology` and `trajectory` are ignored.
+    window_size : int, default=10
+        Number of residues in each window.
+    stride : int, default=1
+        Number of residues between one window and the following.
+    block_size : int, default=100
+        Number of frames in each time block. Trailing frames that do not fill a block are ignored.
+    block_stride : int, optional
+        Number of frames between one block and the following (default half the block size).
+    projection_method : str, default='Distances'
+        Projection of each residue window, as in `section_id`.
+    projection_kwargs : dict, optional
+        Parameters of the projection, as in `section_id`.
+    id_kwargs : dict, optional
+        Parameters for global ID estimation, as in `intrinsic_dimension` ("last" is ignored).
+    frames : slice, range or array-like of int, optional
+        Frames of the trajectory to analyse.
+    n_jobs : int, default=1
+        Number of residue windows computed at once, -1 for all CPUs.
+
+    Returns
+    -------
+    ids : np.ndarray
+        Array of shape (residue windows, time blocks).
+    windows : np.ndarray
+        First and last resid of each residue window, shape (residue windows, 2).
+    blocks : np.ndarray
+        First and last (excluded) frame of each time block, shape (time blocks, 2), relative to the selected frames.
+
+    Raises
+    ------
+    ValueError
+        If window_size <= 1, block_size or block_stride < 1, or the trajectory is shorter than one block.
+    '''
+    if window_size <= 1:
+        raise ValueError("`window_size` must be > 1.")
+    block_stride = block_stride or max(block_size // 2, 1)
+    if block_size < 1 or block_stride < 1:
+        raise ValueError(f'block_size and block_stride must be >= 1, got {block_size} and {block_stride} instead.')
+    id_kwargs = dict(id_kwargs or {})
+    estimator = id_kwargs.pop('estimator', 'TwoNN')
+    id_kwargs.pop('last', None)
+
+    mol = load_molecule(topology, trajectory, mol, frames, _window_atoms(projection_method, projection_kwargs))
+    blocks = time_blocks(mol.numFrames, block_size, block_stride)
+    if not blocks:
+        raise ValueError(f'The trajectory has {mol.numFrames} frames, fewer than block_size={block_size}.')
+    windows = _residue_windows(mol, window_size, stride)
+
+    def window_ids(window):
+        start, end = window
+        window_mol = mol.copy()
+        window_mol.filter(f"resid {start} to {end}", _logger=False)
+        projection = _project(window_mol, projection_method, projection_kwargs)
+        return block_ids(projection, blocks, estimator, **id_kwargs)
+
+    if n_jobs == 1:
+        ids = list(map(window_ids, windows))
+    else:
+        start_threads()
+        with ThreadPoolExecutor(os.cpu_count() if n_jobs == -1 else n_jobs) as pool:
+            ids = list(pool.map(window_ids, windows))
+    return np.array(ids).reshape(len(windows), len(blocks)), np.array(windows).reshape(-1, 2), np.array(blocks)
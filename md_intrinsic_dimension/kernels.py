@@ -0,0 +1,331 @@
+import threading
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# compiled kernels are used whenever numba is installed, the NumPy versions otherwise
+NUMBA_AVAILABLE = numba is not None
+
+
+def start_threads():
+    '''
+    Starts numba's parallel thread pool, if numba is installed and this is the main thread.
+
+    With the TBB threading layer, a pool first started from another thread makes the interpreter hang
+    at exit, so functions running kernels on worker threads call this before starting them.
+    '''
+    if NUMBA_AVAILABLE and threading.current_thread() is threading.main_thread():
+        _start_threads_numba(np.zeros(1))
+
+
+def _selected_coords(coords, atoms):
+    # (frames, atoms, 3) copy of the MoleculeKit (atoms, 3, frames) coordinates of the given atoms
+    return np.ascontiguousarray(np.transpose(coords[atoms], (2, 0, 1)))
+
+
+def pair_distances(coords, pairs, chunk_size=256):
+    '''
+    Computes the distance of each atom pair in each frame, without periodic wrapping.
+
+    Parameters
+    ----------
+    coords : np.ndarray
+        MoleculeKit coordinates, shape (atoms, 3, frames).
+    pairs : np.ndarray
+        Atom indexes, shape (pairs, 2).
+    chunk_size : int, default=256
+        Number of frames processed at once by the NumPy version.
+
+    Returns
+    -------
+    distances : np.ndarray
+        Array of shape (frames, pairs), float32.
+    '''
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    atoms, local = np.unique(pairs, return_inverse=True)
+    xyz = _selected_coords(coords, atoms)
+    local = local.reshape(pairs.shape)
+    if NUMBA_AVAILABLE:
+        return _pair_distances_numba(xyz, local)
+    return _pair_distances_numpy(xyz, local, chunk_size)
+
+
+def dihedral_angles(coords, quads, sincos=False):
+    '''
+    Computes dihedral angles in each frame, as MoleculeKit's `MetricDihedral` (no periodic wrapping).
+
+    Parameters
+    ----------
+    coords : np.ndarray
+        MoleculeKit coordinates, shape (atoms, 3, frames).
+    quads : np.ndarray
+        Atom indexes of each dihedral, shape (dihedrals, 4).
+    sincos : bool, default=False
+        If True, return interleaved sine and cosine of each angle instead of degrees.
+
+    Returns
+    -------
+    angles : np.ndarray
+        Array of shape (frames, dihedrals), or (frames, 2 * dihedrals) if `sincos`, float32.
+    '''
+    quads = np.asarray(quads, dtype=np.int64).reshape(-1, 4)
+    atoms, local = np.unique(quads, return_inverse=True)
+    xyz = _selected_coords(coords, atoms)
+    local = local.reshape(quads.shape)
+    if NUMBA_AVAILABLE:
+        radians = _dihedral_angles_numba(xyz, local)
+    else:
+        radians = _dihedral_angles_numpy(xyz, local)
+    metric = np.rad2deg(radians).astype(np.float64)
+    if sincos:
+        sc_metric = np.zeros((metric.shape[0], metric.shape[1] * 2))
+        sc_metric[:, 0::2] = np.sin(metric * np.pi / 180.0)
+        sc_metric[:, 1::2] = np.cos(metric * np.pi / 180.0)
+        metric = sc_metric
+    return metric.astype(np.float32)
+
+
+def aligned_coordinates(coords, atoms, align_atoms=None, reference=None, chunk_size=1024):
+    '''
+    Computes the coordinates of selected atoms after optimal superposition of each frame onto a reference,
+    as MoleculeKit's `MetricCoordinate`, aligning all frames of a chunk at once.
+
+    For each frame the 3x3 covariance of the centred alignment atoms with the reference is built with one
+    einsum, all covariances of a chunk are decomposed by one batched SVD (Kabsch), and the rotations are
+    applied to the selected atoms only.
+
+    Parameters
+    ----------
+    coords : np.ndarray
+        MoleculeKit coordinates, shape (atoms, 3, frames).
+    atoms : np.ndarray
+        Indexes of the atoms whose coordinates are returned.
+    align_atoms : np.ndarray, optional
+        Indexes of the atoms superposed onto `reference` (default no alignment).
+    reference : np.ndarray, optional
+        Reference coordinates of the alignment atoms, shape (align atoms, 3).
+    chunk_size : int, default=1024
+        Number of frames aligned at once.
+
+    Returns
+    -------
+    projection : np.ndarray
+        Array of shape (frames, 3 * atoms), float32, with the x of all atoms, then their y, then their z.
+    '''
+    n_frames = coords.shape[2]
+    projection = np.empty((n_frames, 3 * len(atoms)), dtype=np.float32)
+    if align_atoms is not None:
+        reference = np.asarray(reference, dtype=np.float64)
+        ref_center = reference.mean(axis=0)
+        reference = reference - ref_center
+    for start in range(0, n_frames, chunk_size):
+        stop = min(start + chunk_size, n_frames)
+        xyz = _selected_coords(coords[:, :, start:stop], atoms).astype(np.float64)
+        if align_atoms is not None:
+            P = _selected_coords(coords[:, :, start:stop], align_atoms).astype(np.float64)
+            center = P.mean(axis=1, keepdims=True)
+            V, _, Wt = np.linalg.svd(np.einsum('fai,aj->fij', P - center, reference))
+            V[:, :, 2] *= np.sign(np.linalg.det(V) * np.linalg.det(Wt))[:, None] #no reflections
+            xyz = (xyz - center) @ (V @ Wt) + ref_center
+        projection[start:stop] = np.transpose(xyz, (0, 2, 1)).reshape(stop - start, -1)
+    return projection
+
+
+def twonn_pointwise(X, knn, discard_fraction=0.1, block_size=64):
+    '''
+    TwoNN estimate within the neighbourhood of each point, as skdim's `TwoNN().fit_transform_pw`
+    before smoothing: each neighbourhood is fitted on its own.
+
+    Parameters
+    ----------
+    X : np.ndarray
+        Data, shape (samples, features).
+    knn : np.ndarray
+        Neighbour indexes of each point, shape (samples, k), excluding the point itself.
+    discard_fraction : float, default=0.1
+        Fraction of largest distance ratios discarded in each fit.
+    block_size : int, default=64
+        Number of neighbourhoods processed at once by the NumPy version.
+
+    Returns
+    -------
+    pw : np.ndarray
+        Pointwise ID, shape (samples,).
+    '''
+    k = knn.shape[1]
+    keep = int(k * (1 - discard_fraction))
+    knn = np.ascontiguousarray(knn, dtype=np.int64)
+    if NUMBA_AVAILABLE:
+        return _twonn_pointwise_numba(np.ascontiguousarray(X), knn, keep)
+    return _twonn_pointwise_numpy(X, knn, keep, block_size)
+
+
+def mle_pointwise(dists, unbiased=False):
+    '''
+    Levina-Bickel MLE of each point from its sorted neighbour distances, as skdim's `MLE`
+    with default noise settings, before smoothing.
+
+    Parameters
+    ----------
+    dists : np.ndarray
+        Sorted neighbour distances, shape (samples, k).
+    unbiased : bool, default=False
+        Use k - 2 instead of k - 1 in the numerator.
+
+    Returns
+    -------
+    pw : np.ndarray
+        Pointwise ID, shape (samples,).
+    '''
+    kfac = dists.shape[1] - 2 if unbiased else dists.shape[1] - 1
+    if NUMBA_AVAILABLE:
+        return _mle_pointwise_numba(np.ascontiguousarray(dists, dtype=np.float64), kfac)
+    return _mle_pointwise_numpy(dists, kfac)
+
+
+###############################
+# NumPy versions
+
+
+def _pair_distances_numpy(xyz, pairs, chunk_size):
+    out = np.empty((xyz.shape[0], len(pairs)), dtype=np.float32)
+    for start in range(0, xyz.shape[0], chunk_size):
+        chunk = xyz[start:start + chunk_size]
+        delta = chunk[:, pairs[:, 0]] - chunk[:, pairs[:, 1]]
+        out[start:start + chunk_size] = np.sqrt(np.einsum('fpx,fpx->fp', delta, delta))
+    return out
+
+
+def _dihedral_angles_numpy(xyz, quads):
+    # same operations as moleculekit.dihedral.dihedralAngle, vectorised over dihedrals and frames
+    pos = [xyz[:, quads[:, i]] for i in range(4)]
+    r12 = pos[0] - pos[1]
+    r23 = pos[1] - pos[2]
+    r34 = pos[2] - pos[3]
+    c1 = np.cross(r23, r34)
+    c2 = np.cross(r12, r23)
+    p1 = (r12 * c1).sum(axis=2)
+    p1 *= (r23 * r23).sum(axis=2) ** 0.5
+    p2 = (c1 * c2).sum(axis=2)
+    return -np.arctan2(p1, p2)
+
+
+def _twonn_pointwise_numpy(X, knn, keep, block_size):
+    n, k = knn.shape
+    y = -np.log(1 - np.arange(keep) / k)
+    diagonal = np.arange(k)
+    out = np.empty(n)
+    for start in range(0, n, block_size):
+        points = np.asarray(X[knn[start:start + block_size]], dtype=np.float64)
+        sq = np.einsum('bkf,bkf->bk', points, points)
+        d2 = sq[:, :, None] + sq[:, None, :] - 2 * points @ points.transpose(0, 2, 1)
+        np.maximum(d2, 0, out=d2)
+        d2[:, diagonal, diagonal] = np.inf
+        r = np.partition(d2, 1, axis=2)
+        mu = np.sort(np.sqrt(r[:, :, 1] / r[:, :, 0]), axis=1)[:, :keep]
+        x = np.log(mu)
+        out[start:start + len(points)] = (x @ y) / np.einsum('bk,bk->b', x, x)
+    return out
+
+
+def _mle_pointwise_numpy(dists, kfac):
+    return kfac / np.sum(np.log(dists.max(axis=1, keepdims=True) / dists), axis=1)
+
+
+###############################
+# numba versions
+
+
+if NUMBA_AVAILABLE:
+
+    @numba.njit(parallel=True, cache=True)
+    def _start_threads_numba(x):
+        for i in numba.prange(len(x)):
+            x[i] = 0.0
+
+    @numba.njit(parallel=True, cache=True)
+    def _pair_distances_numba(xyz, pairs):
+        n_frames = xyz.shape[0]
+        out = np.empty((n_frames, pairs.shape[0]), dtype=np.float32)
+        for f in numba.prange(n_frames):
+            for p in range(pairs.shape[0]):
+                a = pairs[p, 0]
+                b = pairs[p, 1]
+                d = 0.0
+                for x in range(3):
+                    t = np.float64(xyz[f, a, x]) - xyz[f, b, x]
+                    d += t * t
+                out[f, p] = np.sqrt(d)
+        return out
+
+    @numba.njit(parallel=True, cache=True)
+    def _dihedral_angles_numba(xyz, quads):
+        n_frames = xyz.shape[0]
+        out = np.empty((n_frames, quads.shape[0]))
+        for f in numba.prange(n_frames):
+            r12 = np.empty(3)
+            r23 = np.empty(3)
+            r34 = np.empty(3)
+            for d in range(quads.shape[0]):
+                for x in range(3):
+                    r12[x] = np.float64(xyz[f, quads[d, 0], x]) - xyz[f, quads[d, 1], x]
+                    r23[x] = np.float64(xyz[f, quads[d, 1], x]) - xyz[f, quads[d, 2], x]
+                    r34[x] = np.float64(xyz[f, quads[d, 2], x]) - xyz[f, quads[d, 3], x]
+                c1 = np.cross(r23, r34)
+                c2 = np.cross(r12, r23)
+                p1 = np.dot(r12, c1) * np.sqrt(np.dot(r23, r23))
+                p2 = np.dot(c1, c2)
+                out[f, d] = -np.arctan2(p1, p2)
+        return out
+
+    @numba.njit(parallel=True, cache=True)
+    def _twonn_pointwise_numba(X, knn, keep):
+        n, k = knn.shape
+        n_features = X.shape[1]
+        out = np.empty(n)
+        for i in numba.prange(n):
+            points = np.empty((k, n_features))
+            for a in range(k):
+                for f in range(n_features):
+                    points[a, f] = X[knn[i, a], f]
+            gram = np.dot(points, points.T)
+            mu = np.empty(k)
+            for a in range(k):
+                r1 = np.inf
+                r2 = np.inf
+                for b in range(k):
+                    if b == a:
+                        continue
+                    d = max(gram[a, a] + gram[b, b] - 2 * gram[a, b], 0.0)
+                    if d < r1:
+                        r2 = r1
+                        r1 = d
+                    elif d < r2:
+                        r2 = d
+                mu[a] = np.sqrt(r2 / r1)
+            mu.sort()
+            sxy = 0.0
+            sxx = 0.0
+            for j in range(keep):
+                x = np.log(mu[j])
+                sxy += x * -np.log(1.0 - j / k)
+                sxx += x * x
+            out[i] = sxy / sxx
+        return out
+
+    @numba.njit(parallel=True, cache=True)
+    def _mle_pointwise_numba(dists, kfac):
+        n, k = dists.shape
+        out = np.empty(n)
+        for i in numba.prange(n):
+            rk = dists[i, 0]
+            for j in range(1, k):
+                rk = max(rk, dists[i, j])
+            s = 0.0
+            for j in range(k):
+                s += np.log(rk / dists[i, j])
+            out[i] = kfac / s
+        return out
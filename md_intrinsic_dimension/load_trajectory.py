@@ -0,0 +1,154 @@
+import os
+import numpy as np
+from moleculekit.molecule import Molecule
+
+# trajectory formats whose MoleculeKit readers decode only the requested frames
+SEEKABLE_FORMATS = ('xtc', 'dcd')
+
+
+def count_frames(trajectory):
+    '''
+    Returns the number of frames of a trajectory file (or cache) without decoding the coordinates,
+    or None if the format does not allow it.
+    '''
+    from .trajectory_cache import is_trajectory_cache, cache_frames
+    if is_trajectory_cache(trajectory):
+        return cache_frames(trajectory)
+    import mdtraj
+    try:
+        with mdtraj.open(trajectory) as f:
+            return len(f)
+    except Exception:
+        return None
+
+
+def frame_indexes(frames, n_frames):
+    '''
+    Converts a frame selection into an array of non-negative frame indexes.
+
+    Parameters
+    ----------
+    frames : slice, range or array-like of int
+        Frame selection, e.g. ``slice(0, None, 10)`` or ``[0, 5, 10]``. Negative values count from the end.
+    n_frames : int
+        Number of frames of the trajectory.
+
+    Returns
+    -------
+    indexes : np.ndarray
+
+    Raises
+    ------
+    ValueError
+        If the selection is empty or out of range.
+    '''
+    if isinstance(frames, slice):
+        indexes = np.arange(*frames.indices(n_frames))
+    else:
+        indexes = np.asarray(frames, dtype=int).ravel()
+        if np.any(indexes >= n_frames) or np.any(indexes < -n_frames):
+            raise ValueError(f'Frame selection out of range for a trajectory of {n_frames} frames.')
+        indexes = np.where(indexes < 0, indexes + n_frames, indexes)
+    if len(indexes) == 0:
+        raise ValueError('Frame selection contains no frames.')
+    return indexes
+
+
+def _atom_indexes(mol, atoms):
+    # indexes of the atoms of a selection string, which must not be empty
+    indexes = mol.atomselect(atoms, indexes=True)
+    if len(indexes) == 0:
+        raise ValueError(f'Atom selection "{atoms}" contains no atoms.')
+    return indexes
+
+
+def _read_atoms(mol, trajectory, indexes, keep, chunk_size):
+    # reads the frames `indexes` of a seekable trajectory in chunks, keeping only the coordinates of the atoms `keep`
+    coords = np.empty((len(keep), 3, len(indexes)), dtype=np.float32)
+    fields = {'box': [], 'boxangles': [], 'step': [], 'time': []}
+    fileloc = []
+    for start in range(0, len(indexes), chunk_size):
+        stop = min(start + chunk_size, len(indexes))
+        mol.read(trajectory, frames=[indexes[start:stop]])
+        coords[:, :, start:stop] = mol.coords[keep]
+        for field in fields:
+            fields[field].append(getattr(mol, field))
+        fileloc += [[mol.fileloc[0][0], int(i)] for i in indexes[start:stop]] #one entry per frame, as a full read
+    mol.filter(keep, _logger=False)
+    mol.coords = coords
+    for field, values in fields.items():
+        setattr(mol, field, np.concatenate(values, axis=-1))
+    mol.fileloc = fileloc
+    return mol
+
+
+def load_molecule(topology=None, trajectory=None, mol=None, frames=None, atoms=None, chunk_size=1000):
+    '''
+    Returns the MoleculeKit `Molecule` to analyse, loading it from files if `mol` is not provided.
+
+    Parameters
+    ----------
+    topology : str, optional
+        Path to the topology file (e.g., .pdb, .psf). Required if `mol` is not provided.
+    trajectory : str, optional
+        Path to the trajectory file (e.g., .dcd, .xtc). Required if `mol` is not provided.
+        A directory written by `cache_trajectory` is memory-mapped, together with its own topology (`topology` is then ignored).
+    mol : Molecule, optional
+        A pre-loaded MoleculeKit `Molecule` object. If provided, `topology` and `trajectory` are ignored.
+    frames : slice, range or array-like of int, optional
+        Frames to keep. For XTC and DCD files and trajectory caches only these frames are decoded; other formats
+        are read in full and filtered. If `mol` is provided, a copy with these frames is returned.
+    atoms : str, optional
+        Atom selection string of the atoms to keep (default all atoms, see `projection_atoms`). XTC and DCD files are
+        decoded `chunk_size` frames at a time and only the coordinates of these atoms are kept from each chunk; trajectory
+        caches only read these atoms; other formats are read in full and filtered. If `mol` is provided, a copy of these atoms is returned.
+    chunk_size : int, default=1000
+        Number of frames decoded at once when `atoms` is given.
+
+    Returns
+    -------
+    mol : Molecule
+
+    Raises
+    ------
+    FileNotFoundError
+        If required topology or trajectory files are missing.
+    ValueError
+        If the frame selection is empty or out of range, or the atom selection is empty.
+    '''
+    if mol is not None:
+        if atoms is not None:
+            _atom_indexes(mol, atoms)
+        if frames is not None or atoms is not None:
+            mol = mol.copy(frames=None if frames is None else frame_indexes(frames, mol.numFrames), sel=atoms)
+        return mol
+
+    from .trajectory_cache import is_trajectory_cache, load_trajectory_cache
+    if is_trajectory_cache(trajectory):
+        return load_trajectory_cache(trajectory, frames, atoms)
+
+    if topology is None:
+        raise FileNotFoundError(f'Topology file not found: {topology}')
+
+    if trajectory is None:
+        raise FileNotFoundError(f'Trajectory file not found: {trajectory}')
+
+    mol = Molecule(topology, validateElements = False) #ref:PeriodicTable raises error with dummy atoms i. e. M
+    keep = None if atoms is None else _atom_indexes(mol, atoms)
+    if frames is None and keep is None:
+        mol.read(trajectory)
+        return mol
+
+    ext = os.path.splitext(str(trajectory))[1][1:].lower()
+    n_frames = count_frames(trajectory) if ext in SEEKABLE_FORMATS and os.path.isfile(trajectory) else None
+    if n_frames is None:
+        mol.read(trajectory)
+        if frames is not None:
+            mol.dropFrames(keep=frame_indexes(frames, mol.numFrames))
+        if keep is not None:
+            mol.filter(keep, _logger=False)
+    elif keep is None:
+        mol.read(trajectory, frames=[frame_indexes(frames, n_frames)])
+    else:
+        mol = _read_atoms(mol, trajectory, frame_indexes(slice(None) if frames is None else frames, n_frames), keep, chunk_size)
+    return mol
@@ -1,6 +1,15 @@
 from .compute_projections import *
 from .compute_id import *
+from .distance_matrix import matrix_frames
+from .reduction import reduce_projection
+from .load_trajectory import load_molecule
+from .pooled import project_replicas, pooled_id, _check_id_method
+from .planner import plan_estimation, available_memory, BUDGET_ACTIONS
+from .duplicates import unique_frames, expand_local
+from .progressive import chunk_reader, progressive_global_id
+from .multiscale import multiscale_id
 import logging
+import warnings
 from moleculekit.molecule import Molecule
 from moleculekit.projections.projection import Projection
 import os 
@@ -16,7 +25,7 @@ logger.propagate = False
 
 
 
-def intrinsic_dimension(topology= None, trajectory=None, mol = None, projection_method = 'Distances', id_method = 'local', projection_kwargs = None, id_kwargs = None, verbose=True):
+def intrinsic_dimension(topology= None, trajectory=None, mol = None, projection_method = 'Distances', id_method = 'local', projection_kwargs = None, id_kwargs = None, distance_matrix = None, reduction_kwargs = None, frames = None, pooled_filename = None, budget = None, duplicate_tolerance = None, progressive = None, verbose=True):
     '''
     Performs projection of molecular dynamics data followed by intrinsic dimension (ID) estimation.
     This function loads a protein trajectory or a Molecule object from MoleculeKit, computes a projection,
@@ -26,10 +35,14 @@ def intrinsic_dimension(topology= None, trajectory=None, mol = None, projection_
     ----------
     topology : str, optional
         Path to the topology file (e.g., .pdb, .psf). Required if `mol` is not provided.
-    trajectory : str, optional
+    trajectory : str or list of str, optional
         Path to the trajectory file (e.g., .dcd, .xtc). Required if `mol` is not provided.
-    mol : Molecule, optional
+        A list of trajectories sharing `topology` (e.g. the replicas of an mdCATH domain) is pooled:
+        each one is projected in turn into a single preallocated array, and the ID of the pooled
+        frames is returned together with the ID of each replica.
+    mol : Molecule or list of Molecule, optional
         A pre-loaded MoleculeKit `Molecule` object. If provided, `topology` and `trajectory` are ignored.
+        A list of molecules sharing one topology is pooled as a list of trajectories.
     projection_method : str, callable, or numpy.ndarray, default='Distances'
         Method for generating the molecular projection. Can be one of:
             - 'Distances' : pairwise distances or number of contacts between selected atoms.
@@ -41,6 +54,7 @@ def intrinsic_dimension(topology= None, trajectory=None, mol = None, projection_
         Method for computing intrinsic dimension. One of:
             - 'local' : compute frame-wise ID (instantaneous) and averaged.
             - 'global' : compute ID over the entire projection.
+            - 'multiscale' : compute global ID as a function of the neighbourhood scale (see `multiscale_id`).
     projection_kwargs : dict, optional
         Parameters passed according to the projection method. 
         Defaults:
@@ -48,15 +62,66 @@ def intrinsic_dimension(topology= None, trajectory=None, mol = None, projection_
             - sele : str, atom selection string (default="name CA").
             - step : int, subsampling interval (default=1).
             - metric : str, either "distances" or "contacts" (default="distances").
+            - max_features : int, maximum number of pairs of atoms (default all pairs).
+            - sampling : str, how pairs are chosen within max_features, "random", "bands" or "farthest" (default="random").
+            - seed : int, seed of the random pair sampling.
             For "Dihedrals"
             - dihedrals : tuple of str, including phi, psi, chi1, .., chi5, omega (default=("psi","phi")).
             - sincos : bool, return sin/cos of angles if True (default=False).
+            For "Coordinate", the parameters of MoleculeKit's `MetricCoordinate` (e.g. atomsel, refmol). Without `groupsel`,
+            frames are aligned to the reference by batched Kabsch superposition instead of one at a time.
     id_kwargs : dict, optional
         Parameters for intrinsic dimension estimation.
             - estimator : str, name of the estimator from scikit-dimension, including CorrInt, DANCo, ESS, FisherS, KNN, lPCA, MADA, MiND_ML, MLE, MOM, TLE, TwoNN (default="TwoNN").
             - last : int, number of frames to average over starting from the end of the simulation (default=100).
         Additional keys are passed directly to the chosen estimator’s constructor. These should match the estimator’s parameter names in scikit-dimension.
         For example:``{"estimator": "KNN", "k": 15, "last": 200}``
+        For "multiscale", the estimator and "last" are ignored and the keys are those of `multiscale_id`:
+            - max_rank : int, number of neighbours searched once, bounding the largest scale (default=64).
+            - method : str, "gride" (ratios of the 2n-th to n-th neighbour distances) or "decimation" (TwoNN on subsets of the frames) (default="gride").
+            - ranks : list of int, scales to evaluate (default powers of two).
+    distance_matrix : np.ndarray or str, optional
+        Precomputed frame-by-frame distance matrix (e.g. pairwise RMSD from `pairwise_rmsd`), either square 
+        of shape (n_frames, n_frames) or condensed of shape (n_frames * (n_frames - 1) / 2,). A path to a `.npy` 
+        file is memory-mapped. If provided, topology, trajectory, mol, projection_method and projection_kwargs 
+        are ignored. Only the neighbour-based estimators TwoNN, MLE and MOM are supported.
+    reduction_kwargs : dict, optional
+        If provided, the projection is reduced to its leading components before ID estimation (see `reduce_projection`).
+            - method : str, "pca" (incremental), "randomized" or "tica" (default="pca").
+            - n_components : int, number of components to keep.
+            - variance : float, fraction of (kinetic, for TICA) variance to keep, e.g. 0.9.
+            - lag : int, TICA lag time in frames (default=1).
+            - chunk_size : int, number of frames fitted at once (default=1000).
+        For example: ``{"method": "tica", "lag": 10, "variance": 0.9}``
+    frames : slice, range or array-like of int, optional
+        Frames of the trajectory to analyse, e.g. ``slice(0, None, 10)`` for one frame every ten or ``slice(-500, None)`` 
+        for the last 500. For XTC and DCD files only the selected frames are read from disk. Also applied to `mol` if provided.
+        For pooled replicas, applied to each of them. Only the atoms read by the projection are loaded (see `projection_atoms`),
+        e.g. no solvent for "Distances" and "Dihedrals".
+    pooled_filename : str, optional
+        For pooled replicas, path to a `.npy` file holding the pooled projection, which is then memory-mapped instead of kept in RAM.
+    budget : str or dict, optional
+        If provided, runtime and memory of the estimation are predicted for the actual projection shape with a cost model
+        calibrated once per machine (see `planner.py`), the projection is cast to float32 if float64 does not fit in memory,
+        and the pointwise fits are parallelised when worthwhile. Either "auto" (free memory, no time limit) or a dict with:
+            - time : float, maximum runtime in seconds.
+            - memory : float, maximum memory in bytes (default free memory).
+            - action : str, "warn" or "raise" when the run is predicted to exceed the budget (default="warn").
+        For example: ``{"time": 600, "action": "raise"}``
+    duplicate_tolerance : float, optional
+        If provided, repeated frames (e.g. from restarts or overlapping chunks), which give zero neighbour distances,
+        are removed before ID estimation (see `unique_frames`): 0 removes identical frames only, a positive value also frames
+        falling in the same cell of a grid of that side. Local ID is then mapped back to every frame. Ignored for `distance_matrix` and pooled replicas.
+    progressive : dict, optional
+        Global ID only. If provided, frames are read and projected in chunks from the start of the selection and the ID
+        is updated after each chunk, reusing the neighbours already found for TwoNN, MLE and MOM; reading stops once the
+        estimate has converged (see `progressive_global_id`). An empty dict uses the defaults:
+            - chunk_size : int, number of frames read at once (default=500).
+            - tolerance : float, largest change of the ID between chunks that counts as converged (default=0.1).
+            - patience : int, number of consecutive converged chunks after which reading stops (default=2).
+        For example: ``{"chunk_size": 1000, "tolerance": 0.05}``. A projection array is consumed by rows. Features must not depend
+        on the frames read ("contacts" and "farthest" sampling are not supported; random pairs are drawn once). Not combined with
+        pooled replicas, `reduction_kwargs`, `budget` or `duplicate_tolerance`.
     verbose : bool, default=True
         If True, logging messages are shown. If False, suppress logger output.
 
@@ -76,6 +141,23 @@ def intrinsic_dimension(topology= None, trajectory=None, mol = None, projection_
 	    gid100 : float
 		    Global intrinsic dimension computed over last `last` frames
 
+    If "multiscale":
+        curve : DataFrame
+            One row per scale, with columns "scale" (mean neighbour distance) and "ID" among others
+
+    If "global" with `progressive`:
+        gid : float
+            Global intrinsic dimension of the frames consumed
+        n_frames : int
+            Number of frames read before the estimate converged (all selected frames if it did not)
+        trace : DataFrame
+            One row per chunk, with columns "frames", "global ID" and "change"
+
+    If several replicas are given:
+        results : DataFrame
+            One "pooled" row followed by one row per replica, with columns "replica", "frames", 
+            "entire simulation", "last simulation", "instantaneous" (see `pooled_id`).
+
     Raises
     ------
     FileNotFoundError
@@ -86,6 +168,8 @@ def intrinsic_dimension(topology= None, trajectory=None, mol = None, projection_
         If `projection_method` or `id_method` is invalid.
     ImportError
         If custom projection class cannot be loaded.
+    RuntimeError
+        If the run is predicted to exceed `budget` and its action is "raise".
 
     Notes
     -----
@@ -93,13 +177,8 @@ def intrinsic_dimension(topology= None, trajectory=None, mol = None, projection_
     '''
     
     # ----DEFAULT KWARGS PARAMETERS ----
-    projection_kwargs = projection_kwargs or {}
-    id_kwargs = id_kwargs or {}
+    id_kwargs = dict(id_kwargs or {}) # copied, as the same dict may be reused across calls (e.g. windows)
 
-    sele = projection_kwargs.get('sele', 'name CA')
-    step = projection_kwargs.get('step', 1)
-    dihedrals = projection_kwargs.get('dihedrals', ('phi', 'psi'))
-    sincos = projection_kwargs.get('sincos', False)
     estimator = id_kwargs.pop('estimator','TwoNN')
     last = id_kwargs.pop('last', int(100))
 
@@ -109,20 +188,82 @@ def intrinsic_dimension(topology= None, trajectory=None, mol = None, projection_
     else:
         logger.setLevel(logging.CRITICAL + 1)  # effectively disables logger output
 
+    if distance_matrix is not None:
+        if isinstance(distance_matrix, (str, os.PathLike)):
+            distance_matrix = np.load(distance_matrix, mmap_mode='r')
+        logger.info(f'Using a precomputed distance matrix of {matrix_frames(distance_matrix)} frames.')
+        return _estimate_id(distance_matrix, id_method, estimator, last, id_kwargs, precomputed=True)
+
+    # only the atoms read by the projection are loaded (a given mol is only copied if frames are selected)
+    atoms = projection_atoms(projection_method, projection_kwargs) if mol is None or frames is not None else None
+
+    if isinstance(mol, (list, tuple)) or (mol is None and isinstance(trajectory, (list, tuple))):
+        _check_id_method(id_method) #before any replica is projected
+        projection, bounds = project_replicas(lambda m: _project(m, projection_method, projection_kwargs), topology, trajectory, 
+                                              mol if isinstance(mol, (list, tuple)) else None, frames, pooled_filename, atoms)
+        logger.info(f'Pooled {len(bounds)} replicas into a projection of shape {projection.shape}.')
+        if reduction_kwargs is not None:
+            projection = reduce_projection(projection, **reduction_kwargs)
+        return pooled_id(projection, bounds, id_method, estimator, last, **id_kwargs)
+
+    if progressive is not None:
+        if id_method != 'global':
+            raise ValueError(f'Progressive estimation requires id_method "global", got {id_method} instead.')
+        if reduction_kwargs is not None or budget is not None or duplicate_tolerance is not None:
+            raise ValueError('Progressive estimation cannot be combined with reduction_kwargs, budget or duplicate_tolerance.')
+        if isinstance(projection_method, np.ndarray): #chunks are rows of the array
+            read_chunk, n_frames, project = lambda start, stop: projection_method[start:stop], len(projection_method), lambda rows: rows
+        else:
+            read_chunk, n_frames = chunk_reader(topology, trajectory, mol, frames, projection_atoms(projection_method, projection_kwargs))
+            projection_kwargs = _fixed_features(projection_method, projection_kwargs)
+            project = lambda m: _project(m, projection_method, projection_kwargs)
+        gid, n_consumed, trace = progressive_global_id(read_chunk, project, n_frames, estimator, **progressive, **id_kwargs)
+        logger.info(f'Progressive global ID of {gid:.2f} after reading {n_consumed} of {n_frames} frames.')
+        return gid, n_consumed, trace
+
     #load Molecule or protein and trajectory
-    if mol is None:
-        if topology is None:
-            raise FileNotFoundError(f'Topology file not found: {topology}')
+    mol = load_molecule(topology, trajectory, mol, frames, atoms)
 
-        if trajectory is None:
-            raise FileNotFoundError(f'Trajectory file not found: {trajectory}')
-        
-        mol = Molecule(topology, validateElements = False) #ref:PeriodicTable raises error with dummy atoms i. e. M
-        mol.read(trajectory)
+    projection = _project(mol, projection_method, projection_kwargs)
+
+    if reduction_kwargs is not None:
+        n_features = projection.shape[1]
+        projection = reduce_projection(projection, **reduction_kwargs)
+        logger.info(f'Projection reduced from {n_features} to {projection.shape[1]} features.')
+
+    inverse, n_last = None, last
+    if duplicate_tolerance is not None:
+        keep, inverse = unique_frames(projection, duplicate_tolerance)
+        logger.info(f'Removed {len(projection) - len(keep)} duplicate frames out of {len(projection)}.')
+        n_last = int(np.sum(keep >= len(projection) - last)) #frames kept in the last section
+        projection = projection[keep]
+
+    n_jobs = 1
+    if budget is not None and id_method in ('local', 'global'): #an invalid id_method is reported by _estimate_id
+        projection, n_jobs = _apply_budget(projection, id_method, estimator, n_last, id_kwargs, budget)
+
+    out = _estimate_id(projection, id_method, estimator, n_last, id_kwargs, n_jobs=n_jobs)
+    if inverse is not None and id_method == 'local':
+        out = expand_local(out[2], inverse, last)
+    return out
+
+
+def _project(mol, projection_method, projection_kwargs):
+    # ----DEFAULT KWARGS PARAMETERS ----
+    projection_kwargs = projection_kwargs or {}
+
+    sele = projection_kwargs.get('sele', 'name CA')
+    step = projection_kwargs.get('step', 1)
+    metric_type = projection_kwargs.get('metric', 'distances')
+    subset = {key: projection_kwargs[key] for key in ('max_features', 'sampling', 'seed') if key in projection_kwargs}
+    dihedrals = projection_kwargs.get('dihedrals', ('phi', 'psi'))
+    sincos = projection_kwargs.get('sincos', False)
 
     # Determine projection
-    builtins = {'Distances': lambda: compute_projections(mol, 'Distances', sele=sele, step=step),
+    builtins = {'Distances': lambda: compute_projections(mol, 'Distances', sele=sele, step=step, metric=metric_type, **subset),
             'Dihedrals': lambda:  compute_projections(mol, 'Dihedrals', dihedrals=dihedrals, sincos=sincos)}
+    if 'groupsel' not in projection_kwargs: #grouped coordinates are left to MoleculeKit
+        builtins['Coordinate'] = lambda: compute_projections(mol, 'Coordinate', **projection_kwargs)
         
     if isinstance(projection_method, str) and projection_method in builtins.keys():
         projection = builtins[projection_method]
@@ -155,17 +296,63 @@ def intrinsic_dimension(topology= None, trajectory=None, mol = None, projection_
     else:
         raise TypeError('projection_method must be a string referring to a MoleculeKit Projection class, an array, or a Projection object. If string, the first letter of each word should be capitalized.')
 
+    return projection
+
+
+def _fixed_features(projection_method, projection_kwargs):
+    # projection kwargs giving the same features for every chunk of frames, for progressive estimation
+    projection_kwargs = dict(projection_kwargs or {})
+    if projection_method != 'Distances':
+        return projection_kwargs
+    if projection_kwargs.get('metric', 'distances') == 'contacts':
+        raise ValueError('Progressive estimation does not support "contacts", whose pairs depend on the frames read.')
+    if 'max_features' in projection_kwargs:
+        sampling = projection_kwargs.get('sampling', 'random')
+        if sampling == 'farthest':
+            raise ValueError('Progressive estimation does not support "farthest" sampling, whose pairs depend on the frames read.')
+        if sampling == 'random' and projection_kwargs.get('seed') is None: #same random pairs in every chunk
+            projection_kwargs['seed'] = int(np.random.SeedSequence().generate_state(1)[0])
+    return projection_kwargs
+
+
+def _apply_budget(projection, id_method, estimator, last, id_kwargs, budget):
+    budget = {} if budget == 'auto' else dict(budget)
+    action = budget.get('action', 'warn')
+    if action not in BUDGET_ACTIONS:
+        raise ValueError(f'Invalid budget action: {action}. Use one of {BUDGET_ACTIONS}.')
+    memory = budget.get('memory')
+    if memory is None and available_memory() is not None:
+        memory = available_memory() + projection.nbytes #the projection is already in memory
+    plan = plan_estimation(*projection.shape, estimator=estimator, id_method=id_method, dtype=projection.dtype, last=last,
+                           time_budget=budget.get('time'), memory_budget=memory, **id_kwargs)
+    logger.info(f'Planned {id_method} ID with "{estimator}": about {plan["time"]:.1f} s and {plan["memory"] / 2**20:.0f} MiB '
+                f'({plan["dtype"]}, {plan["n_jobs"]} jobs).')
+    if not plan['within_budget']:
+        message = (f'{id_method.capitalize()} ID with "{estimator}" on a projection of shape {projection.shape} is predicted to take '
+                   f'{plan["time"]:.0f} s and {plan["memory"] / 2**20:.0f} MiB, over the budget of {budget.get("time")} s and {memory} bytes.')
+        if action == 'raise':
+            raise RuntimeError(message)
+        warnings.warn(message)
+    if plan['dtype'] != projection.dtype:
+        logger.info(f'Projection cast from {projection.dtype} to {plan["dtype"]} to fit the memory budget.')
+        projection = projection.astype(plan['dtype']) #fresh buffer: the original is released once the caller rebinds it
+    return projection, plan['n_jobs']
+
 
+def _estimate_id(projection, id_method, estimator, last, id_kwargs, precomputed=False, knn=None, n_jobs=1):
     # ID estimation mapping
     if id_method == 'local':
         logger.info(f'Computing {id_method} intrinsic dimension using estimator "{estimator}" (last simulation section = {last} frames).')
-        out = compute_local(projection=projection, estimator=estimator, last=last, **id_kwargs)
+        out = compute_local(projection=projection, estimator=estimator, last=last, precomputed=precomputed, knn=knn, n_jobs=n_jobs, **id_kwargs)
     elif id_method == 'global':
         logger.info(f'Computing {id_method} intrinsic dimension using estimator "{estimator}" (last simulation section = {last} frames).')
-        out = compute_global(projection=projection, estimator=estimator, last=last, **id_kwargs)
+        out = compute_global(projection=projection, estimator=estimator, last=last, precomputed=precomputed, **id_kwargs)
+    elif id_method == 'multiscale':
+        logger.info(f'Computing {id_method} intrinsic dimension from one search of {id_kwargs.get("max_rank", 64)} neighbours.')
+        out = multiscale_id(projection, precomputed=precomputed, n_jobs=n_jobs, **id_kwargs)
     else:
         raise TypeError(
-            f'id_method must be "local" or "global", got {id_method} instead.'
+            f'id_method must be "local" or "global" or "multiscale", got {id_method} instead.'
         )
 
     return out
@@ -0,0 +1,152 @@
+from io import StringIO
+import numpy as np
+from moleculekit.molecule import Molecule
+from .load_trajectory import frame_indexes
+
+
+def _open(filename):
+    try:
+        import h5py
+    except ImportError:
+        raise ImportError('Reading mdCATH files requires the `h5py` package. Install it with `pip install h5py`.')
+    return h5py.File(filename, 'r')
+
+
+def _domain(h5, domain):
+    if domain is None:
+        domains = list(h5.keys())
+        if len(domains) != 1:
+            raise ValueError(f'File contains {len(domains)} domains, please specify one of {domains}.')
+        domain = domains[0]
+    if domain not in h5:
+        raise KeyError(f'Domain "{domain}" not found in file.')
+    return h5[domain]
+
+
+def _topology(group):
+    pdb = group['pdbProteinAtoms'][()]
+    if isinstance(pdb, bytes):
+        pdb = pdb.decode()
+    topo = Molecule()
+    topo.read(StringIO(pdb), type='pdb', validateElements=False)
+    return topo
+
+
+def _read_coords(dataset, indexes, chunk_size):
+    # fill a MoleculeKit-shaped (atoms, 3, frames) array, reading at most chunk_size frames at a time
+    coords = np.empty((dataset.shape[1], 3, len(indexes)), dtype=np.float32)
+    for start in range(0, len(indexes), chunk_size):
+        chunk = indexes[start:start + chunk_size]
+        unique, inverse = np.unique(chunk, return_inverse=True)
+        if len(unique) == unique[-1] - unique[0] + 1:
+            block = dataset[unique[0]:unique[-1] + 1]
+        else:
+            block = dataset[unique]
+        coords[:, :, start:start + len(chunk)] = np.transpose(block[inverse], (1, 2, 0))
+    return coords
+
+
+def _replica_molecule(topo, dataset, frames, chunk_size, fileloc):
+    n_frames = dataset.shape[0]
+    indexes = np.arange(n_frames) if frames is None else frame_indexes(frames, n_frames)
+    if dataset.shape[1] != topo.numAtoms:
+        raise ValueError(f'Coordinates have {dataset.shape[1]} atoms but the topology has {topo.numAtoms}.')
+    mol = topo.copy()
+    mol.coords = _read_coords(dataset, indexes, chunk_size)
+    mol.box = np.zeros((3, len(indexes)), dtype=np.float32)
+    mol.boxangles = np.zeros((3, len(indexes)), dtype=np.float32)
+    mol.step = indexes.copy()
+    mol.time = np.zeros(len(indexes), dtype=np.float32)
+    mol.fileloc = [[fileloc, i] for i in indexes]
+    return mol
+
+
+def read_mdcath(filename, temperature, replica, domain=None, frames=None, chunk_size=1000):
+    '''
+    Loads one (temperature, replica) trajectory of an mdCATH HDF5 file as a MoleculeKit `Molecule`.
+
+    The topology is parsed from the protein-only PDB stored in the file and coordinates
+    are read in chunks of frames, so no intermediate PDB or XTC files are written.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the mdCATH file, e.g. `mdcath_dataset_2hbaA00.h5`.
+    temperature : int or str
+        Temperature group, e.g. 320.
+    replica : int or str
+        Replica group, e.g. 0.
+    domain : str, optional
+        Domain name. Defaults to the only domain in the file.
+    frames : slice, range or array-like of int, optional
+        Frames to read (default all).
+    chunk_size : int, default=1000
+        Maximum number of frames read from the file at once.
+
+    Returns
+    -------
+    mol : Molecule
+
+    Raises
+    ------
+    ImportError
+        If `h5py` is not installed.
+    KeyError
+        If the domain, temperature or replica is not in the file.
+    '''
+    with _open(filename) as h5:
+        group = _domain(h5, domain)
+        topo = _topology(group)
+        path = f'{temperature}/{replica}'
+        if path not in group:
+            raise KeyError(f'Temperature {temperature}, replica {replica} not found in {group.name}.')
+        return _replica_molecule(topo, group[path]['coords'], frames, chunk_size, f'{filename}:{group.name}/{path}')
+
+
+def iter_mdcath(filename, domain=None, temperatures=None, replicas=None, frames=None, chunk_size=1000):
+    '''
+    Iterates over the (temperature, replica) trajectories of an mdCATH HDF5 file.
+
+    The topology is parsed once and reused for every trajectory; only one trajectory
+    is held in memory at a time. The yielded molecules can be passed as `mol` to
+    `intrinsic_dimension`, `section_id` and `secondary_structure_id`.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the mdCATH file.
+    domain : str, optional
+        Domain name. Defaults to the only domain in the file.
+    temperatures : list, optional
+        Temperatures to read (default all).
+    replicas : list, optional
+        Replicas to read (default all).
+    frames : slice, range or array-like of int, optional
+        Frames to read from each trajectory (default all).
+    chunk_size : int, default=1000
+        Maximum number of frames read from the file at once.
+
+    Yields
+    ------
+    temperature : str
+    replica : str
+    mol : Molecule
+
+    Raises
+    ------
+    ImportError
+        If `h5py` is not installed.
+    '''
+    with _open(filename) as h5:
+        group = _domain(h5, domain)
+        topo = _topology(group)
+        temps = sorted((k for k in group.keys() if k.isdigit()), key=int)
+        if temperatures is not None:
+            temps = [t for t in temps if t in {str(x) for x in temperatures}]
+        for temp in temps:
+            reps = sorted(group[temp].keys(), key=int)
+            if replicas is not None:
+                reps = [r for r in reps if r in {str(x) for x in replicas}]
+            for rep in reps:
+                mol = _replica_molecule(topo, group[temp][rep]['coords'], frames, chunk_size, f'{filename}:{group.name}/{temp}/{rep}')
+                yield temp, rep, mol
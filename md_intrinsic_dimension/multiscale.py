@@ -0,0 +1,159 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from scipy.optimize import brentq
+from .compute_id import nearest_neighbors
+from .distance_matrix import knn_from_distance_matrix, matrix_frames
+
+MULTISCALE_METHODS = ('gride', 'decimation')
+# below this fraction of kept frames with both decimated neighbours in the list, the missing frames (those in the
+# sparsest regions) bias the estimate
+MIN_COVERAGE = 0.9
+
+
+def gride_id(dists, n1, n2=None):
+    '''
+    Maximum likelihood intrinsic dimension (ID) from the ratios of the distances to the `n2`-th
+    and `n1`-th nearest neighbours of each point (Gride, Denti et al. 2022).
+
+    With n1 = 1 and n2 = 2 this is the maximum likelihood TwoNN estimate. Larger ranks probe the
+    data at the scale of the `n2`-th neighbour while averaging out noise.
+
+    Parameters
+    ----------
+    dists : np.ndarray
+        Sorted neighbour distances, shape (points, k) with k >= n2, excluding the point itself.
+    n1 : int
+        Rank of the inner neighbour (1 for the nearest).
+    n2 : int, optional
+        Rank of the outer neighbour (default 2 * n1).
+
+    Returns
+    -------
+    gid : float
+        NaN if no point has non-zero, distinct distances to both neighbours.
+
+    Raises
+    ------
+    ValueError
+        If the ranks are invalid.
+    '''
+    n2 = n2 or 2 * n1
+    if not 1 <= n1 < n2 <= dists.shape[1]:
+        raise ValueError(f'Ranks must satisfy 1 <= n1 < n2 <= {dists.shape[1]}, got {n1} and {n2} instead.')
+    inner, outer = dists[:, n1 - 1], dists[:, n2 - 1]
+    valid = (inner > 0) & (outer > inner) #duplicate frames give zero or equal distances
+    log_mu = np.log(outer[valid] / inner[valid])
+    n, total = len(log_mu), log_mu.sum()
+    if n == 0:
+        return np.nan
+    if n2 - n1 == 1: #closed form
+        return n / (n1 * total)
+
+    def score(d):
+        # derivative of the log-likelihood, decreasing in d
+        return n / d - (n2 - 1) * total - (n2 - n1 - 1) * np.sum(log_mu / np.expm1(-d * log_mu))
+
+    low = n / (n1 * total) #the score is positive there
+    high = 2 * low
+    while score(high) > 0:
+        high *= 2
+    return brentq(score, low, high)
+
+
+def _decimated_id(dists, inds, factor, rng):
+    # maximum likelihood TwoNN on a random 1/factor of the frames, taking the first two neighbours
+    # of each kept frame that are kept too from its full neighbour list
+    n = len(dists)
+    kept = np.zeros(n, dtype=bool)
+    kept[rng.choice(n, max(n // factor, 3), replace=False)] = True
+    member = kept[inds[kept]]
+    rank = np.cumsum(member, axis=1)
+    covered = rank[:, -1] >= 2 #frames whose two decimated neighbours are within the list
+    first = np.argmax(member[covered], axis=1)
+    second = np.argmax(rank[covered] >= 2, axis=1)
+    rows = dists[kept][covered]
+    r1 = np.take_along_axis(rows, first[:, None], axis=1)[:, 0]
+    r2 = np.take_along_axis(rows, second[:, None], axis=1)[:, 0]
+    gid = gride_id(np.column_stack((r1, r2)), 1) if covered.mean() >= MIN_COVERAGE else np.nan
+    return gid, float(np.mean(r2)) if len(r2) else np.nan, int(kept.sum()), float(covered.mean())
+
+
+def multiscale_id(projection, max_rank=64, method='gride', ranks=None, precomputed=False, seed=None, n_jobs=1):
+    '''
+    Computes intrinsic dimension (ID) as a function of the neighbourhood scale, from a single search
+    of the sorted `max_rank` nearest neighbours of every frame.
+
+    Each scale is then estimated from that one list, on a thread pool, at little more than the
+    cost of one global estimate:
+        - 'gride' : maximum likelihood ID from the ratios of the distances to the 2 * n1-th and n1-th
+          neighbours (see `gride_id`), for n1 = 1, 2, 4, ...
+        - 'decimation' : maximum likelihood TwoNN on random subsets of 1/2, 1/4, ... of the frames, the neighbours of a
+          kept frame within the subset being read from its full neighbour list.
+    A curve that is flat over a range of scales points to a well defined ID; a rising curve at small scales usually
+    reflects noise, a decreasing one at large scales the curvature of the data.
+
+    Parameters
+    ----------
+    projection : np.ndarray
+        Array of shape (frames, features), or a frame-by-frame distance matrix if `precomputed`.
+    max_rank : int, default=64
+        Number of neighbours searched, which bounds the largest scale.
+    method : str, default='gride'
+        'gride' or 'decimation'.
+    ranks : list of int, optional
+        For 'gride', inner ranks n1 to evaluate (default powers of two with 2 * n1 <= max_rank).
+        For 'decimation', decimation factors (default powers of two up to max_rank / 8, beyond which the two
+        decimated neighbours of many frames fall outside the list).
+    precomputed : bool, default=False
+        If True, `projection` is a square or condensed distance matrix (see distance_matrix.py).
+    seed : int, optional
+        Seed of the random subsets of 'decimation'.
+    n_jobs : int, default=1
+        Number of threads for the neighbour search and the scales, -1 for all CPUs.
+
+    Returns
+    -------
+    curve : DataFrame
+        One row per scale, with columns "scale" (mean distance to the outer neighbour), "ID", and
+        "n1", "n2" for 'gride' or "decimation", "frames", "coverage" (fraction of kept frames whose two
+        neighbours in the subset are within `max_rank`) for 'decimation'. The ID is NaN where the coverage is
+        below `MIN_COVERAGE`.
+
+    Raises
+    ------
+    ValueError
+        If `method` is invalid or `max_rank` is not between 2 and frames - 1.
+    '''
+    if method not in MULTISCALE_METHODS:
+        raise ValueError(f'Invalid multiscale method: {method}. Use one of {MULTISCALE_METHODS}.')
+    n_frames = matrix_frames(projection) if precomputed else len(projection)
+    if not 2 <= max_rank < n_frames:
+        raise ValueError(f'max_rank must be between 2 and {n_frames - 1}, got {max_rank} instead.')
+    n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+    if precomputed:
+        dists, inds = knn_from_distance_matrix(projection, max_rank)
+    else:
+        dists, inds = nearest_neighbors(projection, max_rank, n_jobs=n_jobs)
+
+    if method == 'gride':
+        tasks = ranks or [2 ** j for j in range(int(np.log2(max_rank)))]
+
+        def scale(n1):
+            return {'n1': n1, 'n2': 2 * n1, 'scale': float(np.mean(dists[:, 2 * n1 - 1])), 'ID': gride_id(dists, n1)}
+    else:
+        ranks = ranks or [2 ** j for j in range(max(int(np.log2(max_rank)) - 2, 1))]
+        tasks = list(zip(ranks, np.random.SeedSequence(seed).spawn(len(ranks))))
+
+        def scale(task):
+            factor, factor_seed = task
+            gid, radius, frames, coverage = _decimated_id(dists, inds, factor, np.random.default_rng(factor_seed))
+            return {'decimation': factor, 'frames': frames, 'coverage': coverage, 'scale': radius, 'ID': gid}
+
+    if n_jobs == 1:
+        rows = list(map(scale, tasks))
+    else:
+        with ThreadPoolExecutor(n_jobs) as pool:
+            rows = list(pool.map(scale, tasks))
+    return pd.DataFrame(rows)
@@ -0,0 +1,145 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# number of features from which nearest_neighbors uses blocked_knn instead of scikit-learn's search
+BLOCKED_KNN_FEATURES = 256
+
+
+def _row_block_knn(X, norms, k, start, stop, col_block, col_start=0, best=None):
+    # running top-k of rows start:stop over tiles of the columns from col_start, merged into best (squared distances, indexes)
+    rows = np.asarray(X[start:stop], dtype=np.float64)
+    if best is None:
+        best_d = np.full((stop - start, k), np.inf)
+        best_i = np.zeros((stop - start, k), dtype=np.int64)
+    else:
+        best_d, best_i = best
+    for c in range(col_start, len(X), col_block):
+        c_stop = min(c + col_block, len(X))
+        d2 = rows @ np.asarray(X[c:c_stop], dtype=np.float64).T
+        d2 *= -2
+        d2 += norms[start:stop, None]
+        d2 += norms[None, c:c_stop]
+        self_rows = np.arange(max(start, c), min(stop, c_stop))
+        d2[self_rows - start, self_rows - c] = np.inf #a frame is not its own neighbour
+        candidates_d = np.concatenate((best_d, d2), axis=1)
+        candidates_i = np.concatenate((best_i, np.broadcast_to(np.arange(c, c_stop), d2.shape)), axis=1)
+        top = np.argpartition(candidates_d, k - 1, axis=1)[:, :k]
+        best_d = np.take_along_axis(candidates_d, top, axis=1)
+        best_i = np.take_along_axis(candidates_i, top, axis=1)
+    order = np.argsort(best_d, axis=1, kind='stable')
+    return np.sqrt(np.clip(np.take_along_axis(best_d, order, axis=1), 0, None)), np.take_along_axis(best_i, order, axis=1)
+
+
+def _squared_norms(X, col_block):
+    norms = np.empty(len(X))
+    for start in range(0, len(X), col_block):
+        block = np.asarray(X[start:start + col_block], dtype=np.float64)
+        norms[start:start + col_block] = np.einsum('ij,ij->i', block, block)
+    return norms
+
+
+def blocked_knn(X, k, row_block=512, col_block=4096, n_jobs=1):
+    '''
+    Computes the sorted k nearest neighbours of each row by brute force, tiling the distance matrix.
+
+    Each tile of squared distances is computed with one matrix product, as ``|a|^2 + |b|^2 - 2 a.b``,
+    and merged into a running top-k of its rows, so that memory is O(frames * k) plus one tile per job
+    instead of O(frames^2). Blocks of rows are independent and run on a thread pool (NumPy releases the GIL
+    in matrix products). Tiles are computed in float64 whatever the dtype of `X`.
+
+    Parameters
+    ----------
+    X : np.ndarray
+        Data, shape (samples, features).
+    k : int
+        Number of neighbours, excluding the sample itself.
+    row_block : int, default=512
+        Rows per tile, and per task of the thread pool.
+    col_block : int, default=4096
+        Columns per tile.
+    n_jobs : int, default=1
+        Number of threads, -1 for all CPUs.
+
+    Returns
+    -------
+    dists : np.ndarray
+        Neighbour distances, shape (samples, k), increasing along each row.
+    inds : np.ndarray
+        Neighbour indexes, shape (samples, k).
+
+    Raises
+    ------
+    ValueError
+        If `k` is not between 1 and samples - 1, or `n_jobs` is neither -1 nor positive.
+    '''
+    n = len(X)
+    if not 1 <= k < n:
+        raise ValueError(f'k must be between 1 and {n - 1}, got {k} instead.')
+    if n_jobs != -1 and n_jobs < 1:
+        raise ValueError(f'n_jobs must be -1 or >= 1, got {n_jobs} instead.')
+    n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+    norms = _squared_norms(X, col_block)
+
+    dists = np.empty((n, k))
+    inds = np.empty((n, k), dtype=np.int64)
+
+    def rows(start):
+        stop = min(start + row_block, n)
+        dists[start:stop], inds[start:stop] = _row_block_knn(X, norms, k, start, stop, col_block)
+
+    if n_jobs == 1:
+        for start in range(0, n, row_block):
+            rows(start)
+    else:
+        with ThreadPoolExecutor(n_jobs) as pool:
+            list(pool.map(rows, range(0, n, row_block)))
+    return dists, inds
+
+
+def extend_knn(X, k, dists=None, inds=None, row_block=512, col_block=4096):
+    '''
+    Updates the sorted k nearest neighbours of the first rows of `X` after more rows were appended,
+    and computes those of the new rows, as `blocked_knn` on the whole of `X`.
+
+    Old rows are only compared with the new ones, so growing X chunk by chunk costs one
+    search over all pairs in total.
+
+    Parameters
+    ----------
+    X : np.ndarray
+        Data, shape (samples, features), whose first ``len(dists)`` rows were already searched.
+    k : int
+        Number of neighbours, excluding the sample itself.
+    dists, inds : np.ndarray, optional
+        Neighbours of the first rows, as returned by a previous call (default none).
+    row_block, col_block : int
+        Tile size, as in `blocked_knn`.
+
+    Returns
+    -------
+    dists : np.ndarray
+        Neighbour distances, shape (samples, k), increasing along each row.
+    inds : np.ndarray
+        Neighbour indexes, shape (samples, k).
+
+    Raises
+    ------
+    ValueError
+        If `k` is not between 1 and samples - 1.
+    '''
+    n = len(X)
+    n_old = 0 if dists is None else len(dists)
+    if not 1 <= k < n:
+        raise ValueError(f'k must be between 1 and {n - 1}, got {k} instead.')
+    norms = _squared_norms(X, col_block)
+    new_dists = np.empty((n, k))
+    new_inds = np.empty((n, k), dtype=np.int64)
+    for start in range(0, n_old, row_block):
+        stop = min(start + row_block, n_old)
+        best = (dists[start:stop, :k] ** 2, inds[start:stop, :k])
+        new_dists[start:stop], new_inds[start:stop] = _row_block_knn(X, norms, k, start, stop, col_block, n_old, best)
+    for start in range(n_old, n, row_block):
+        stop = min(start + row_block, n)
+        new_dists[start:stop], new_inds[start:stop] = _row_block_knn(X, norms, k, start, stop, col_block)
+    return new_dists, new_inds
@@ -0,0 +1,238 @@
+import json
+import os
+import platform
+import time
+import warnings
+import numpy as np
+import skdim
+from skdim._commonfuncs import LocalEstimator, get_nn
+from .compute_id import _pointwise_kernel
+from .kernels import NUMBA_AVAILABLE, twonn_pointwise
+
+BUDGET_ACTIONS = ('warn', 'raise')
+
+# features of the synthetic data used for calibration
+_CALIBRATION_FEATURES = 16
+# a global estimator whose first calibration fit takes longer is not timed a second time
+_CALIBRATION_SLOW = 0.5
+
+
+def cache_path():
+    '''Path of the per-machine cost model cache (under $XDG_CACHE_HOME, default ~/.cache).'''
+    root = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(root, 'md_intrinsic_dimension', 'cost_model.json')
+
+
+def _machine():
+    return f'{platform.node()}-{platform.machine()}-{os.cpu_count()}cpu-{"numba" if NUMBA_AVAILABLE else "numpy"}'
+
+
+def _load_cache():
+    try:
+        with open(cache_path()) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache):
+    path = cache_path()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(cache, f, indent=1)
+    except OSError:
+        pass #read-only home: the model is simply recalibrated next time
+
+
+def _timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    function(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def _calibrate_neighbours(rng):
+    n, d = 2000, 32
+    X = rng.normal(size=(n, d))
+    knn = _timed(get_nn, X, 20) / (n * n * d)
+    _, inds = get_nn(X[:400], 100)
+    kernel = _timed(twonn_pointwise, X[:400], inds) / (400 * 100 * 100 * d)
+    return {'knn': knn, 'twonn_kernel': kernel}
+
+
+def _calibrate_estimator(estimator, rng):
+    id_estimator = getattr(skdim.id, estimator)()
+    d = _CALIBRATION_FEATURES
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        if isinstance(id_estimator, LocalEstimator):
+            # per-frame cost of a local estimator, neighbour search excluded
+            n = id_estimator._N_NEIGHBORS + 50
+            X = rng.normal(size=(n, d))
+            knn = get_nn(X, id_estimator._N_NEIGHBORS)
+            elapsed = _timed(id_estimator.fit_transform_pw, X, precomputed_knn_arrays=knn)
+            return {'local': True, 'per_frame': elapsed / (n * d)}
+        first = _timed(id_estimator.fit, rng.normal(size=(100, d)))
+        alpha = 2.0
+        if first < _CALIBRATION_SLOW:
+            second = _timed(id_estimator.fit, rng.normal(size=(200, d)))
+            alpha = float(np.clip(np.log2(max(second, 1e-9) / max(first, 1e-9)), 1, 3))
+        return {'local': False, 'alpha': alpha, 'coefficient': first / (100 ** alpha * d)}
+
+
+def calibrate(estimators=('TwoNN',), force=False):
+    '''
+    Returns the cost model of this machine, timing the neighbour search and the given estimators
+    on small synthetic data if they are not cached yet.
+
+    The model is stored in `cache_path()`, keyed by host, architecture, number of CPUs and backend,
+    so each estimator is timed once per machine.
+
+    Parameters
+    ----------
+    estimators : tuple of str, default=('TwoNN',)
+        Estimators from scikit-dimension to calibrate.
+    force : bool, default=False
+        If True, repeat the micro-benchmarks even if cached.
+
+    Returns
+    -------
+    model : dict
+        Cost coefficients (seconds per operation).
+    '''
+    cache = _load_cache()
+    model = cache.setdefault(_machine(), {})
+    rng = np.random.default_rng(0)
+    changed = False
+    if force or 'knn' not in model:
+        model.update(_calibrate_neighbours(rng))
+        changed = True
+    estimators_model = model.setdefault('estimators', {})
+    for estimator in estimators:
+        if force or estimator not in estimators_model:
+            estimators_model[estimator] = _calibrate_estimator(estimator, rng)
+            changed = True
+    if changed:
+        _save_cache(cache)
+    return model
+
+
+def _kernel_estimator(estimator, id_kwargs):
+    return _pointwise_kernel(getattr(skdim.id, estimator)(**id_kwargs)) is not None
+
+
+def estimate_cost(n_frames, n_features, estimator='TwoNN', id_method='local', dtype=np.float32, last=100, n_jobs=1, model=None, **id_kwargs):
+    '''
+    Estimates runtime and peak memory of an ID estimation on a (n_frames, n_features) projection.
+
+    Parameters
+    ----------
+    n_frames, n_features : int
+        Shape of the projection.
+    estimator : str, default='TwoNN'
+        Estimator from scikit-dimension.
+    id_method : str, default='local'
+        'local' or 'global'.
+    dtype : numpy dtype, default=np.float32
+        Data type of the projection.
+    last : int, default=100
+        Number of frames of the "last simulation" estimate.
+    n_jobs : int, default=1
+        Number of parallel jobs of the pointwise fits.
+    model : dict, optional
+        Cost model, as returned by `calibrate` (calibrated if not given).
+    Any other additional keys are the estimator's parameters.
+
+    Returns
+    -------
+    cost : dict
+        "time" in seconds and "memory" in bytes.
+    '''
+    model = model or calibrate((estimator,))
+    coefficients = model['estimators'][estimator]
+    itemsize = np.dtype(dtype).itemsize
+    n, d = n_frames, n_features
+    data = n * d * itemsize
+
+    k = min(getattr(getattr(skdim.id, estimator), '_N_NEIGHBORS', 100), n - 1)
+    neighbours = n * k * 16
+
+    def fit_time(frames):
+        if coefficients['local']:
+            return model['knn'] * frames * frames * d + coefficients['per_frame'] * frames * d
+        return coefficients['coefficient'] * frames ** coefficients['alpha'] * d
+
+    if id_method == 'global':
+        seconds = fit_time(n) + fit_time(min(last, n))
+        if coefficients['local']:
+            scratch = neighbours
+        else: #pairwise distances, up to the 1 GiB chunks of scikit-learn
+            scratch = min(n * n * 8, 2 ** 30) if coefficients['alpha'] >= 1.5 else n * d * 8
+        return {'time': seconds, 'memory': data + scratch}
+
+    seconds = model['knn'] * n * n * d
+    if _kernel_estimator(estimator, id_kwargs):
+        if estimator == 'TwoNN': #the MLE kernel is negligible next to the neighbour search
+            seconds += model['twonn_kernel'] * n * k * k * d
+    elif coefficients['local']:
+        seconds += coefficients['per_frame'] * n * d
+    else:
+        seconds += n * fit_time(k) / max(n_jobs, 1)
+    return {'time': seconds, 'memory': data + neighbours}
+
+
+def available_memory():
+    '''Free physical memory in bytes, or None if unknown.'''
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def plan_estimation(n_frames, n_features, estimator='TwoNN', id_method='local', dtype=np.float32, last=100, time_budget=None, memory_budget=None, **id_kwargs):
+    '''
+    Chooses data type and parallelism for an ID estimation and checks it against a time and memory budget.
+
+    The projection is kept in float64 only if it fits the memory budget, otherwise float32 is used.
+    Pointwise fits of global estimators (e.g. local TwoNN without the compiled kernels, DANCo, FisherS)
+    are spread over all CPUs when they are projected to take more than a second.
+
+    Parameters
+    ----------
+    n_frames, n_features : int
+        Shape of the projection.
+    estimator : str, default='TwoNN'
+        Estimator from scikit-dimension.
+    id_method : str, default='local'
+        'local' or 'global'.
+    dtype : numpy dtype, default=np.float32
+        Data type of the projection.
+    last : int, default=100
+        Number of frames of the "last simulation" estimate.
+    time_budget : float, optional
+        Seconds.
+    memory_budget : float, optional
+        Bytes.
+    Any other additional keys are the estimator's parameters.
+
+    Returns
+    -------
+    plan : dict
+        "dtype", "n_jobs", "time" and "memory" (estimated), and "within_budget".
+    '''
+    model = calibrate((estimator,))
+    dtype = np.dtype(dtype)
+    if dtype == np.float64 and memory_budget is not None:
+        if estimate_cost(n_frames, n_features, estimator, id_method, dtype, last, model=model, **id_kwargs)['memory'] > memory_budget:
+            dtype = np.dtype(np.float32)
+
+    n_jobs = 1
+    pointwise = (id_method == 'local' and not model['estimators'][estimator]['local']
+                 and not _kernel_estimator(estimator, id_kwargs))
+    if pointwise and estimate_cost(n_frames, n_features, estimator, id_method, dtype, last, model=model, **id_kwargs)['time'] > 1:
+        n_jobs = os.cpu_count() or 1
+
+    cost = estimate_cost(n_frames, n_features, estimator, id_method, dtype, last, n_jobs=n_jobs, model=model, **id_kwargs)
+    within_budget = ((time_budget is None or cost['time'] <= time_budget)
+                     and (memory_budget is None or cost['memory'] <= memory_budget))
+    return {'dtype': dtype, 'n_jobs': n_jobs, 'time': cost['time'], 'memory': cost['memory'], 'within_budget': within_budget}
@@ -0,0 +1,150 @@
+import os
+import numpy as np
+import pandas as pd
+from .compute_id import compute_local, compute_global
+from .load_trajectory import load_molecule, count_frames, frame_indexes, SEEKABLE_FORMATS
+from .trajectory_cache import is_trajectory_cache
+
+
+def _replica_frames(topology, trajectory, mol, frames):
+    # number of frames each replica contributes, or None if it cannot be known without decoding
+    if mol is not None:
+        n_frames = mol.numFrames
+    else:
+        ext = os.path.splitext(str(trajectory))[1][1:].lower()
+        if not is_trajectory_cache(trajectory) and (ext not in SEEKABLE_FORMATS or not os.path.isfile(trajectory)):
+            return None
+        n_frames = count_frames(trajectory)
+        if n_frames is None:
+            return None
+    return n_frames if frames is None else len(frame_indexes(frames, n_frames))
+
+
+def project_replicas(project, topology=None, trajectories=None, mols=None, frames=None, filename=None, atoms=None):
+    '''
+    Projects several replicas sharing one topology into a single (frames, features) array.
+
+    Replicas are loaded and projected one at a time and copied into a buffer allocated once,
+    so peak memory is the pooled projection plus a single replica. If the number of frames of
+    some trajectory cannot be read from its header, projections are collected and concatenated instead.
+
+    Parameters
+    ----------
+    project : callable
+        Function mapping a `Molecule` to its projection array.
+    topology : str, optional
+        Path to the topology file shared by `trajectories`.
+    trajectories : list of str, optional
+        Paths to the trajectory files. Ignored if `mols` is provided.
+    mols : list of Molecule, optional
+        Pre-loaded replicas.
+    frames : slice, range or array-like of int, optional
+        Frames to keep from each replica (default all).
+    filename : str, optional
+        If provided, the pooled projection is written to this `.npy` file and returned memory-mapped.
+    atoms : str, optional
+        Atom selection string of the atoms loaded from each replica (default all atoms, see `load_molecule`).
+
+    Returns
+    -------
+    projection : np.ndarray
+        Pooled projection, shape (total frames, features).
+    bounds : list of tuple
+        (start, stop) rows of each replica in `projection`.
+    '''
+    sources = [(None, m) for m in mols] if mols is not None else [(t, None) for t in trajectories]
+    if len(sources) == 0:
+        raise ValueError('No replicas provided.')
+    counts = [_replica_frames(topology, t, m, frames) for t, m in sources]
+
+    if any(c is None for c in counts):
+        parts = [project(load_molecule(topology, t, m, frames, atoms)) for t, m in sources]
+        counts = [len(p) for p in parts]
+        projection = np.concatenate(parts)
+        if filename is not None:
+            np.save(filename, projection)
+            projection = np.load(filename, mmap_mode='r+')
+    else:
+        projection = None
+        start = 0
+        for i, ((trajectory, mol), count) in enumerate(zip(sources, counts)):
+            part = project(load_molecule(topology, trajectory, mol, frames, atoms))
+            if len(part) != count:
+                raise ValueError(f'Replica {i} has {len(part)} frames, expected {count}.')
+            if projection is None:
+                shape = (sum(counts), part.shape[1])
+                if filename is None:
+                    projection = np.empty(shape, dtype=part.dtype)
+                else:
+                    projection = np.lib.format.open_memmap(filename, mode='w+', dtype=part.dtype, shape=shape)
+            elif part.shape[1] != projection.shape[1]:
+                raise ValueError(f'Replicas have different numbers of features ({part.shape[1]} and {projection.shape[1]}). Do they share one topology?')
+            projection[start:start + count] = part
+            start += count
+            del part
+
+    bounds = list(zip(np.cumsum([0] + counts[:-1]).tolist(), np.cumsum(counts).tolist()))
+    return projection, bounds
+
+
+def _check_id_method(id_method):
+    # pooled replicas support "local" and "global" ID only
+    if id_method not in ('local', 'global'):
+        raise TypeError(
+            f'id_method must be "local" or "global", got {id_method} instead.'
+        )
+
+
+def pooled_id(projection, bounds, id_method='local', estimator='TwoNN', last=100, **id_kwargs):
+    '''
+    Computes the intrinsic dimension of a pooled projection and of each of its replicas.
+
+    Parameters
+    ----------
+    projection : np.ndarray
+        Pooled projection, shape (total frames, features), as returned by `project_replicas`.
+    bounds : list of tuple
+        (start, stop) rows of each replica.
+    id_method : str, default='local'
+        'local' or 'global'.
+    estimator : str, default='TwoNN'
+        Estimator from scikit-dimension.
+    last : int, default=100
+        Number of frames at the end of each replica used for "last simulation". For the pooled
+        row these are the last `last` frames of every replica.
+    Any other additional keys are passed directly to the chosen estimator’s constructor.
+
+    Returns
+    -------
+    results : DataFrame
+        One "pooled" row followed by one row per replica, with columns "replica", "frames",
+        "entire simulation", "last simulation", "instantaneous". In the pooled local ID
+        neighbours are searched across all replicas.
+
+    Raises
+    ------
+    TypeError
+        If `id_method` is not "local" or "global".
+    '''
+    _check_id_method(id_method)
+    tails = np.concatenate([np.arange(max(start, stop - last), stop) for start, stop in bounds])
+    if id_method == 'local':
+        all_sim, _, instantaneous = compute_local(projection, estimator=estimator, last=last, **id_kwargs)
+        pooled = (all_sim, float(np.mean(instantaneous[tails])), instantaneous)
+        replicas = [compute_local(projection[start:stop], estimator=estimator, last=last, **id_kwargs) for start, stop in bounds]
+    else:
+        all_sim, _ = compute_global(projection, estimator=estimator, last=None, **id_kwargs)
+        last_sim, _ = compute_global(projection[tails], estimator=estimator, last=None, **id_kwargs)
+        pooled = (all_sim, last_sim, [])
+        replicas = [(*compute_global(projection[start:stop], estimator=estimator, last=last, **id_kwargs), []) for start, stop in bounds]
+
+    results = []
+    for replica, (start, stop), (all_sim, last_sim, instantaneous) in zip(['pooled'] + list(range(len(bounds))), [(0, len(projection))] + bounds, [pooled] + replicas):
+        results.append({
+            'replica': replica,
+            'frames': stop - start,
+            'entire simulation': all_sim,
+            'last simulation': last_sim,
+            'instantaneous': instantaneous,
+        })
+    return pd.DataFrame(results)
@@ -0,0 +1,120 @@
+import os
+import numpy as np
+import pandas as pd
+import skdim
+from .compute_id import PRECOMPUTED_ESTIMATORS, _global_knn, _global_neighbors
+from .load_trajectory import load_molecule, count_frames, frame_indexes, SEEKABLE_FORMATS
+from .neighbours import extend_knn
+from .trajectory_cache import is_trajectory_cache
+
+
+def chunk_reader(topology=None, trajectory=None, mol=None, frames=None, atoms=None):
+    '''
+    Returns a reader of consecutive chunks of the selected frames and their number.
+
+    For XTC and DCD files and trajectory caches each chunk is decoded on its own; other formats are read in full once.
+    Only the atoms of the selection string `atoms` are kept, if given.
+
+    Returns
+    -------
+    read_chunk : callable
+        Function of (start, stop) returning the `Molecule` of selected frames start to stop.
+    n_frames : int
+        Number of selected frames.
+    '''
+    n_total = None
+    if mol is None:
+        ext = os.path.splitext(str(trajectory))[1][1:].lower()
+        if is_trajectory_cache(trajectory) or (ext in SEEKABLE_FORMATS and os.path.isfile(trajectory)):
+            n_total = count_frames(trajectory)
+        if n_total is None:
+            mol, atoms = load_molecule(topology, trajectory, atoms=atoms), None
+    if mol is not None:
+        n_total = mol.numFrames
+    indexes = frame_indexes(frames if frames is not None else slice(None), n_total)
+    return (lambda start, stop: load_molecule(topology, trajectory, mol, indexes[start:stop], atoms)), len(indexes)
+
+
+def progressive_global_id(read_chunk, project, n_frames, estimator='TwoNN', chunk_size=500, tolerance=0.1, patience=2, **id_kwargs):
+    '''
+    Estimates global intrinsic dimension (ID) on a growing prefix of the frames, reading and projecting
+    one chunk at a time, and stops as soon as the estimate has converged.
+
+    For the neighbour-based estimators TwoNN, MLE and MOM, the nearest neighbours of the frames already read
+    are kept and only updated with the new chunk (see `extend_knn`), so that the whole run costs a single
+    neighbour search over the frames consumed. Other estimators are refitted on the frames read so far.
+    Chunks are projected into one array of `n_frames` rows, allocated after the first chunk, so that the frames
+    read are never copied again.
+
+    Parameters
+    ----------
+    read_chunk : callable
+        Function of (start, stop) returning the `Molecule` of those frames.
+    project : callable
+        Function mapping a `Molecule` to its projection array.
+    n_frames : int
+        Number of frames available.
+    estimator : str, default='TwoNN'
+        Name of the estimator from scikit-dimension.
+    chunk_size : int, default=500
+        Number of frames read at once. The first estimate is made once more frames than neighbours have been read.
+    tolerance : float, default=0.1
+        Largest change of the ID between consecutive estimates that counts as converged.
+    patience : int, default=2
+        Number of consecutive converged estimates after which reading stops.
+    **id_kwargs
+        Passed to the estimator's constructor.
+
+    Returns
+    -------
+    gid : float
+        Global ID of the frames consumed.
+    n_consumed : int
+        Number of frames read and projected.
+    trace : DataFrame
+        One row per estimate, with columns "frames", "global ID" and "change" (absolute difference with the previous estimate).
+
+    Raises
+    ------
+    ValueError
+        If `chunk_size`, `tolerance` or `patience` is invalid, or there are too few frames for one estimate.
+    '''
+    if chunk_size < 1:
+        raise ValueError(f'chunk_size must be >= 1, got {chunk_size} instead.')
+    if tolerance < 0:
+        raise ValueError(f'tolerance must be >= 0, got {tolerance} instead.')
+    if patience < 1:
+        raise ValueError(f'patience must be >= 1, got {patience} instead.')
+
+    id_estimator = getattr(skdim.id, estimator)(**id_kwargs)
+    reuse = estimator in PRECOMPUTED_ESTIMATORS
+    k = _global_neighbors(id_estimator, n_frames) if reuse else 1
+
+    frames = dists = inds = None
+    trace = []
+    converged = 0
+    for start in range(0, n_frames, chunk_size):
+        stop = min(start + chunk_size, n_frames)
+        chunk = project(read_chunk(start, stop))
+        if frames is None: #filled in place chunk by chunk, the prefix read so far being a view
+            frames = np.empty((n_frames, chunk.shape[1]), dtype=chunk.dtype)
+        elif chunk.shape[1] != frames.shape[1]:
+            raise ValueError(f'Chunks have different numbers of features ({chunk.shape[1]} and {frames.shape[1]}).')
+        frames[start:stop] = chunk
+        projection = frames[:stop]
+        if len(projection) <= k:
+            continue
+        if reuse:
+            dists, inds = extend_knn(projection, k, dists, inds)
+            gid = _global_knn(id_estimator, dists, inds)
+        else:
+            gid = id_estimator.fit_transform(projection)
+        change = abs(gid - trace[-1]['global ID']) if trace else np.nan
+        trace.append({'frames': len(projection), 'global ID': gid, 'change': change})
+        converged = converged + 1 if change <= tolerance else 0
+        if converged >= patience:
+            break
+
+    if not trace:
+        raise ValueError(f'At least {k + 1} frames are required, got {n_frames}.')
+    return trace[-1]['global ID'], trace[-1]['frames'], pd.DataFrame(trace)
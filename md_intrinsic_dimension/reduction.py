@@ -0,0 +1,127 @@
+import numpy as np
+from scipy.linalg import eigh
+from sklearn.decomposition import IncrementalPCA, PCA
+
+REDUCTION_METHODS = ('pca', 'randomized', 'tica')
+
+
+def _chunks(n_frames, chunk_size, min_size):
+    # contiguous chunks, the last one merged into the previous if too small for a partial fit
+    bounds = list(range(0, n_frames, chunk_size)) + [n_frames]
+    if len(bounds) > 2 and bounds[-1] - bounds[-2] < min_size:
+        del bounds[-2]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _n_kept(ratios, n_components, variance):
+    # number of leading components to keep according to a cumulative fraction threshold
+    n_kept = len(ratios)
+    if variance is not None:
+        n_kept = min(n_kept, int(np.searchsorted(np.cumsum(ratios), variance) + 1))
+    if n_components is not None:
+        n_kept = min(n_kept, n_components)
+    return n_kept
+
+
+def _incremental_pca(projection, n_components, chunk_size):
+    ipca = IncrementalPCA(n_components=n_components)
+    for start, stop in _chunks(len(projection), chunk_size, n_components):
+        ipca.partial_fit(projection[start:stop])
+    return ipca
+
+
+def _transform(projection, mean, components, chunk_size):
+    reduced = np.empty((len(projection), len(components)))
+    for start, stop in _chunks(len(projection), chunk_size, 1):
+        reduced[start:stop] = (projection[start:stop] - mean) @ components.T
+    return reduced
+
+
+def reduce_projection(projection, method='pca', n_components=None, variance=None, lag=1, chunk_size=1000, max_components=100, random_state=None):
+    '''
+    Reduces a projection to its leading PCA or TICA components before ID estimation.
+
+    PCA is fitted incrementally, chunk by chunk, so that the (features x features) covariance
+    is never built. TICA is solved in the space of the leading incremental-PCA components,
+    where the instantaneous and time-lagged covariances are small.
+
+    Parameters
+    ----------
+    projection : np.ndarray
+        Array of projections of shape (frames, features).
+    method : str, default='pca'
+        One of:
+            - 'pca' : incremental PCA, fitted in chunks of `chunk_size` frames.
+            - 'randomized' : PCA with randomized SVD.
+            - 'tica' : time-lagged independent component analysis with lag `lag`.
+    n_components : int, optional
+        Number of components to keep.
+    variance : float, optional
+        Keep the smallest number of components whose cumulative explained variance
+        (kinetic variance, i.e. squared eigenvalues, for TICA) reaches this fraction, e.g. 0.9.
+        If both `n_components` and `variance` are given, the smaller number of components is kept.
+    lag : int, default=1
+        Lag time in frames, only used by 'tica'.
+    chunk_size : int, default=1000
+        Number of frames processed at once. Must be at least `n_components` for 'pca' and 'tica'.
+    max_components : int, default=100
+        Maximum number of components computed when `n_components` is not given.
+    random_state : int, optional
+        Seed for the 'randomized' method.
+
+    Returns
+    -------
+    reduced : np.ndarray
+        Array of shape (frames, kept_components).
+
+    Raises
+    ------
+    ValueError
+        If `method` is unknown or the parameters are inconsistent, e.g. `n_components` larger than the number
+        of features, frames or (for 'pca' and 'tica') `chunk_size`.
+    '''
+    if method not in REDUCTION_METHODS:
+        raise ValueError(f'Invalid reduction method: {method}. Use one of {REDUCTION_METHODS}.')
+    if variance is not None and not 0 < variance <= 1:
+        raise ValueError(f'`variance` must be in (0, 1], got {variance} instead.')
+    n_frames, n_features = projection.shape
+    if n_components is not None and n_components > min(n_features, n_frames):
+        raise ValueError(f'n_components={n_components} exceeds the number of features ({n_features}) or frames ({n_frames}).')
+    if n_components is not None and method != 'randomized' and n_components > chunk_size:
+        raise ValueError(f'n_components={n_components} exceeds chunk_size={chunk_size}: incremental fits need at least '
+                         f'n_components frames per chunk, increase chunk_size or use method "randomized".')
+    n_fit = min(n_components or max_components, n_features, n_frames)
+    if method != 'randomized':
+        n_fit = min(n_fit, chunk_size)
+
+    if method == 'randomized':
+        pca = PCA(n_components=n_fit, svd_solver='randomized', random_state=random_state).fit(projection)
+        n_kept = _n_kept(pca.explained_variance_ratio_, n_components, variance)
+        reduced = _transform(projection, pca.mean_, pca.components_[:n_kept], chunk_size)
+
+    elif method == 'pca':
+        ipca = _incremental_pca(projection, n_fit, chunk_size)
+        n_kept = _n_kept(ipca.explained_variance_ratio_, n_components, variance)
+        reduced = _transform(projection, ipca.mean_, ipca.components_[:n_kept], chunk_size)
+
+    else:
+        if not 0 < lag < n_frames:
+            raise ValueError(f'`lag` must be between 1 and the number of frames, got {lag} instead.')
+        # TICA in the space of the leading principal components (all of them if affordable)
+        n_pca = min(max_components, n_features, chunk_size, n_frames)
+        ipca = _incremental_pca(projection, n_pca, chunk_size)
+        pcs = _transform(projection, ipca.mean_, ipca.components_, chunk_size)
+        pcs -= pcs.mean(axis=0)
+        x, y = pcs[:-lag], pcs[lag:]
+        c0 = (x.T @ x + y.T @ y) / (2 * len(x))
+        ctau = (x.T @ y + y.T @ x) / (2 * len(x))
+        # regularise directions with (numerically) zero variance
+        c0 += np.eye(len(c0)) * 1e-10 * np.trace(c0)
+        eigenvalues, eigenvectors = eigh(ctau, c0)
+        order = np.argsort(eigenvalues)[::-1]
+        eigenvalues, eigenvectors = eigenvalues[order], eigenvectors[:, order]
+        kinetic = eigenvalues**2 / np.sum(eigenvalues**2)
+        n_kept = _n_kept(kinetic, n_components, variance)
+        reduced = pcs @ eigenvectors[:, :n_kept]
+
+    return reduced
@@ -0,0 +1,193 @@
+import json
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from .kernels import start_threads
+
+WINDOW_STATUSES = ('done', 'timed out')
+
+# how often a waiting scan checks for cancellation, in seconds
+_POLL_INTERVAL = 0.05
+
+# timed out windows still running in the background, at most MAX_ABANDONED_WINDOWS: each keeps its CPU and the
+# memory of its projection until it ends, so a new window waits for one of them to end beyond that
+MAX_ABANDONED_WINDOWS = 4
+_abandoned = []
+_abandoned_lock = threading.Lock()
+
+
+def _wait_abandoned(cancel):
+    # waits until fewer than MAX_ABANDONED_WINDOWS abandoned windows are running, False if cancelled meanwhile
+    while True:
+        with _abandoned_lock:
+            _abandoned[:] = [thread for thread in _abandoned if thread.is_alive()]
+            if len(_abandoned) < MAX_ABANDONED_WINDOWS:
+                return True
+            oldest = _abandoned[0]
+        if cancel is not None and cancel.is_set():
+            return False
+        oldest.join(_POLL_INTERVAL)
+
+
+def _run_window(compute, window, timeout, cancel):
+    # runs compute(window) in a daemon thread, waiting at most `timeout` seconds and returning early on cancellation.
+    # Python threads cannot be killed: a timed out window keeps running in the background and its result is discarded
+    outcome = {}
+
+    def target():
+        try:
+            outcome['result'] = compute(window)
+        except BaseException as e:
+            outcome['error'] = e
+
+    start_threads()
+    if not _wait_abandoned(cancel):
+        return 'cancelled', None
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while thread.is_alive():
+        wait = _POLL_INTERVAL if deadline is None else min(_POLL_INTERVAL, deadline - time.monotonic())
+        if wait <= 0 or (cancel is not None and cancel.is_set()):
+            with _abandoned_lock:
+                _abandoned.append(thread)
+            return 'timed out' if wait <= 0 else 'cancelled', None
+        thread.join(wait)
+    if 'error' in outcome:
+        raise outcome['error']
+    return 'done', outcome['result']
+
+
+@contextmanager
+def cancel_on_signals(cancel, signals=(signal.SIGINT,)):
+    '''
+    Sets `cancel` when one of `signals` is received, restoring the previous handlers on exit.
+
+    Parameters
+    ----------
+    cancel : threading.Event
+        Event set on the first signal.
+    signals : tuple of int, default=(signal.SIGINT,)
+        Signal numbers. Handlers can only be installed from the main thread.
+    '''
+    previous = {}
+    try:
+        for signum in signals:
+            previous[signum] = signal.signal(signum, lambda *_: cancel.set())
+        yield cancel
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+
+
+def _compute_window(compute, window, timeout, cancel):
+    if timeout is None and cancel is None:
+        return 'done', compute(window)
+    return _run_window(compute, window, timeout, cancel)
+
+
+def iter_windows(windows, compute, window_timeout=None, cancel=None, n_jobs=1):
+    '''
+    Computes each window, yielding ``(window, status, result)`` as soon as it is done.
+
+    Windows that take longer than `window_timeout` are yielded with status "timed out" and result None,
+    and the scan moves on. Their computation cannot be stopped and goes on in the background, holding its CPU and
+    memory: once `MAX_ABANDONED_WINDOWS` of them are running, a new window waits for one to end. The scan stops, without yielding the running windows, as soon as `cancel` is set
+    or the generator is closed.
+
+    Parameters
+    ----------
+    windows : iterable
+        Windows passed to `compute`.
+    compute : callable
+        Function of one window.
+    window_timeout : float, optional
+        Wall-clock budget of each window in seconds (default no limit).
+    cancel : threading.Event, optional
+        Cooperative cancellation flag, e.g. set from another thread or by `cancel_on_signals`.
+    n_jobs : int, default=1
+        Number of windows computed at once by a thread pool. If larger than 1, windows are yielded in
+        completion order and at most `n_jobs` of them are in flight.
+
+    Yields
+    ------
+    window, status, result
+        Status is one of "done" or "timed out".
+    '''
+    if n_jobs == 1:
+        for window in windows:
+            if cancel is not None and cancel.is_set():
+                return
+            status, result = _compute_window(compute, window, window_timeout, cancel)
+            if status == 'cancelled':
+                return
+            yield window, status, result
+        return
+
+    windows = iter(windows)
+    start_threads()
+    pool = ThreadPoolExecutor(n_jobs)
+    in_flight = {}
+
+    def submit():
+        for window in windows:
+            in_flight[pool.submit(_compute_window, compute, window, window_timeout, cancel)] = window
+            return
+
+    try:
+        for _ in range(n_jobs):
+            submit()
+        while in_flight:
+            done, _ = wait(in_flight, timeout=_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            if cancel is not None and cancel.is_set():
+                return
+            for future in done:
+                window = in_flight.pop(future)
+                status, result = future.result()
+                submit()
+                if status == 'cancelled':
+                    return
+                yield window, status, result
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _to_json(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def append_row(sink, row):
+    '''Appends one result row to a JSON Lines file, flushed at once so that it survives a crash.'''
+    with open(sink, 'a') as f:
+        f.write(json.dumps(row, default=_to_json) + '\n')
+
+
+def read_scan(sink):
+    '''
+    Reads the rows appended to a sink by `iter_section_id` or `iter_secondary_structure_id`.
+
+    Parameters
+    ----------
+    sink : str
+        Path to the JSON Lines file.
+
+    Returns
+    -------
+    results : DataFrame
+        One row per computed window, in completion order, with "instantaneous" as arrays.
+    '''
+    with open(sink) as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    results = pd.DataFrame(rows)
+    for column in ('instantaneous', 'window'):
+        if column in results:
+            results[column] = results[column].apply(np.asarray)
+    return results
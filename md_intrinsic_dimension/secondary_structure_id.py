@@ -5,6 +5,11 @@ import pandas as pd
 from moleculekit.molecule import Molecule 
 import moleculekit.projections.metricsecondarystructure as mss 
 import os 
+import threading
+from .load_trajectory import load_molecule
+from .scan import iter_windows, cancel_on_signals, append_row
+from .section_id import _window_id, _store_keys, _window_atoms
+from .window_store import cached_window_id
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -14,7 +19,7 @@ handler.setFormatter(formatter)
 logger.addHandler(handler)
 logger.propagate = False
 
-def secondary_structure_id(topology= None, trajectory=None, mol = None, mol_ref=None, simplified=True, projection_method = 'Distances', id_method = 'local', projection_kwargs = None, id_kwargs = None, verbose=True):
+def secondary_structure_id(topology= None, trajectory=None, mol = None, mol_ref=None, simplified=True, projection_method = 'Distances', id_method = 'local', projection_kwargs = None, id_kwargs = None, frames = None, window_timeout = None, cancel = None, cancel_signals = None, store = None, verbose=True):
     '''
     Computes intrinsic dimension (ID) estimation on contiguous secondary structure elements identified from a protein trajectory.
     This function loads a molecular trajectory, identifies consecutive residues with the same secondary structure assignment (using DSSP via MoleculeKit), 
@@ -68,6 +73,18 @@ def secondary_structure_id(topology= None, trajectory=None, mol = None, mol_ref=
         Parameters for intrinsic dimension estimation. Examples:
             - estimator : str, e.g., "TwoNN", "MLE", "KNN", etc. (default="TwoNN").
             - last : int, number of final frames to average over (default=100).
+    frames : slice, range or array-like of int, optional
+        Frames of the trajectory to analyse, e.g. ``slice(0, None, 10)`` for one frame every ten or ``slice(-500, None)`` 
+        for the last 500. For XTC and DCD files only the selected frames are read from disk. Also applied to `mol` if provided.
+    window_timeout : float, optional
+        Wall-clock budget of each segment in seconds. A segment over budget is recorded as timed out, 
+        with NaN ID, and the scan continues with the next one.
+    cancel : threading.Event, optional
+        Cancellation flag, e.g. set from another thread. When set, the scan stops and returns the segments computed so far.
+    cancel_signals : tuple of int, optional
+        Signals that cancel the scan, e.g. ``(signal.SIGINT,)``. Only from the main thread.
+    store : WindowStore, optional
+        Store of window results, as in `section_id`. A segment shares its entry with the `section_id` window of the same resids.
     verbose : bool, default=True
         If True, logs are shown. If False, logs are suppressed.
 
@@ -76,6 +93,7 @@ def secondary_structure_id(topology= None, trajectory=None, mol = None, mol_ref=
     results : pandas.DataFrame
         Table with ID results per secondary structure segment.
         Columns: 'window index', 'resids range',sec str type, 'entire simulation', 'last simulation', 'instantaneous'.
+        ``results.attrs["timed out"]`` and ``results.attrs["cancelled"]`` as in `section_id`.
 
     secStr_table : pandas.DataFrame
         Per-residue DSSP assignment.
@@ -107,21 +125,130 @@ def secondary_structure_id(topology= None, trajectory=None, mol = None, mol_ref=
     id_kwargs = id_kwargs or {}
 
     #load Molecule or protein and trajectory
-    if mol is None:
-        if topology is None:
-            raise FileNotFoundError(f'Topology file not found: {topology}')
-
-        if trajectory is None:
-            raise FileNotFoundError(f'Trajectory file not found: {trajectory}')
-        
-        mol = Molecule(topology, validateElements = False) #ref:PeriodicTable raises error with dummy atoms i. e. M
-        mol.read(trajectory)
+    atoms = _window_atoms(projection_method, projection_kwargs)
+    mol = load_molecule(topology, trajectory, mol, frames, atoms)
     
+    _check_mol_ref(mol, mol_ref, atoms)
+
+    if simplified == True:
+        logger.info(f'Secondary structures considered: Coil (C), Strand (E) and Helix (H).')
+    else:
+       logger.info("Secondary structure types: Alpha Helix (H), Isolated Beta-Bridge (B), Extended Strand (E), \n "
+    "3-Helix (G), 5-Helix (I), Turn (T), Bend (S), Loop/Irregular (' ').")
+
+    logger.info(f'Computing {id_method} Intrinsic Dimension from {projection_method}.')
+
+    secStr_table, secStr_sequence = _secondary_structure_segments(mol_ref, simplified)
+
+    #from here compute ID
+    segments = _computable_segments(secStr_sequence)
+    if cancel is None and cancel_signals:
+        cancel = threading.Event()
+    results =[]
+    timed_out = []
+    hits = store.hits if store is not None else 0
+    with cancel_on_signals(cancel, cancel_signals or ()):
+        for status, row in _iter_segment_rows(mol, segments, projection_method, id_method, projection_kwargs, id_kwargs, window_timeout, cancel, store=store):
+            if status == 'timed out':
+                timed_out.append((row['start'], row['end']))
+            results.append(row)
+    cancelled = cancel is not None and cancel.is_set()
+    if cancelled:
+        logger.warning(f'Scan cancelled after {len(results)} of {len(segments)} segments.')
+    if store is not None:
+        logger.info(f'{store.hits - hits} of {len(segments)} segments taken from the store.')
+    results = pd.DataFrame(results)
+    results.attrs['timed out'] = timed_out
+    results.attrs['cancelled'] = cancelled
+    return results, secStr_table
+
+
+def iter_secondary_structure_id(topology= None, trajectory=None, mol = None, mol_ref=None, simplified=True, projection_method = 'Distances', id_method = 'local', projection_kwargs = None, id_kwargs = None, frames = None, window_timeout = None, cancel = None, n_jobs = 1, sink = None, store = None, verbose=True):
+    '''
+    Computes intrinsic dimension (ID) on secondary structure elements as `secondary_structure_id`, yielding each segment's row as soon as it is computed.
+
+    Only the segments in flight are held in memory. Closing the generator (e.g. breaking out of a loop) stops the scan.
+    The per-residue DSSP table is not produced.
+
+    Parameters
+    ----------
+    topology, trajectory, mol, mol_ref, simplified, projection_method, id_method, projection_kwargs, id_kwargs, frames, window_timeout, cancel, store, verbose
+        As in `secondary_structure_id`.
+    n_jobs : int, default=1
+        Number of segments computed at once by a thread pool. If larger than 1, rows are yielded in completion order.
+    sink : str, optional
+        Path to a JSON Lines file to which each row is appended as soon as it is computed (see `read_scan`).
+
+    Yields
+    ------
+    row : dict
+        Keys as the columns of `secondary_structure_id`. Timed out segments have NaN ID.
+    '''
+    if verbose:
+        logger.setLevel(logging.INFO)
+    else:
+        logger.setLevel(logging.ERROR)
+
+    atoms = _window_atoms(projection_method, projection_kwargs)
+    mol = load_molecule(topology, trajectory, mol, frames, atoms)
+    _check_mol_ref(mol, mol_ref, atoms)
+    _, secStr_sequence = _secondary_structure_segments(mol_ref, simplified)
+    segments = _computable_segments(secStr_sequence)
+    logger.info(f'Computing {id_method} Intrinsic Dimension from {projection_method} on {len(segments)} segments.')
+    for _, row in _iter_segment_rows(mol, segments, projection_method, id_method, projection_kwargs or {}, id_kwargs or {}, window_timeout, cancel, n_jobs, sink, store):
+        yield row
+
+
+def _computable_segments(secStr_sequence):
+    segments = []
+    for start, end, ss in secStr_sequence:
+        if (end - start) < 1: #too short to compute any projection
+            logger.warning(f'Skipping segment {start}-{end}: at least two residues per segment are required.')
+            continue
+        segments.append((start, end, ss))
+    return segments
+
+
+def _iter_segment_rows(mol, segments, projection_method, id_method, projection_kwargs, id_kwargs, window_timeout=None, cancel=None, n_jobs=1, sink=None, store=None):
+    # (status, secondary_structure_id row) of the given (start, end, type) segments, as they are computed or found in `store`
+    fingerprint, parameters = _store_keys(mol, projection_method, id_method, projection_kwargs, id_kwargs, store)
+
+    def compute(segment):
+        start, end, _ = segment
+        resid_sele = f'resid {start} to {end}'
+        window_mol = mol.copy()
+        window_mol.filter(resid_sele, _logger=False) ##
+        window_id = lambda: _window_id(window_mol, projection_method, id_method, projection_kwargs, id_kwargs)
+        return window_mol.get('resid', 'name CA'), cached_window_id(window_id, store, fingerprint, parameters, start, end)
+
+    for (start, end, ss), status, out in iter_windows(segments, compute, window_timeout, cancel, n_jobs):
+        if status == 'timed out':
+            logger.warning(f'Segment {start}-{end} exceeded {window_timeout} s and was skipped.')
+            out = (mol.get('resid', f'name CA and resid {start} to {end}'), (np.nan, np.nan, []))
+        window, (all_sim, last, instantaneous) = out
+        row = {
+            'start': start,
+            'end': end, 
+            'sec str type': ss,
+            'window': window,
+            'entire simulation': all_sim,
+            'last simulation': last, 
+            'instantaneous': instantaneous, 
+        }
+        if sink is not None:
+            append_row(sink, row)
+        yield status, row
+
+
+def _check_mol_ref(mol, mol_ref, atoms=None):
+    # mol only holds the atoms of the selection `atoms`, if given
     if mol_ref is None:
         raise FileNotFoundError(f'Missing reference structure for DSSP computation. Please provide a one frame MoleculeKit Molecule object.')
     else:
         if mol_ref.numFrames > 1:
             raise ValueError('ref_mol must be 1 frame long. Please load only the topology in this MoleculeKit Molecule object.')
+        if atoms is not None:
+            mol_ref = mol_ref.copy(sel=atoms)
         if mol.numAtoms != mol_ref.numAtoms:
             raise ValueError(f'mol_ref and mol have a different number of atoms.')
         keys = ['name', 'resid', 'resname', 'chain', 'segid']
@@ -129,14 +256,9 @@ def secondary_structure_id(topology= None, trajectory=None, mol = None, mol_ref=
             if not (mol.get(key) == mol_ref.get(key)).all():
                 raise ValueError(f'mol and mol_ref differ in {key}.')
 
-    if simplified == True:
-        logger.info(f'Secondary structures considered: Coil (C), Strand (E) and Helix (H).')
-    else:
-       logger.info("Secondary structure types: Alpha Helix (H), Isolated Beta-Bridge (B), Extended Strand (E), \n "
-    "3-Helix (G), 5-Helix (I), Turn (T), Bend (S), Loop/Irregular (' ').")
-
-    logger.info(f'Computing {id_method} Intrinsic Dimension from {projection_method}.')
 
+def _secondary_structure_segments(mol_ref, simplified):
+    # per-residue DSSP table and (start, end, type) of contiguous secondary structure elements
     met = mss.MetricSecondaryStructure(sel = 'protein', simplified = simplified, integer = False) #integer converts letters to numbers
     
     projection = met.project(mol_ref)
@@ -165,38 +287,5 @@ def secondary_structure_id(topology= None, trajectory=None, mol = None, mol_ref=
     start.append(ss_start)
     end.append(secStr_table.iloc[-1]['resid index'])
     ss_type.append(secStr_table.iloc[-1]['sec str type'])
-    secStr_sequence = list(zip(start, end, ss_type)) 
-
-    #from here compute ID
-    results =[]
-    for start, end, ss in secStr_sequence:
-        if (end - start) < 1: #too short to compute any projection
-            logger.warning(f'Skipping segment {start}-{end}: at least two residues per segment are required.')
-            continue
-        resid_sele = f'resid {start} to {end}'
-        window_mol = mol.copy()
-        window_mol.filter(resid_sele, _logger=False) ##
-
-        #outname = f'{start:03d}'
-
-        if id_method == 'local':
-            all_sim, last, instantaneous = intrinsic_dimension(mol=window_mol, projection_method=projection_method, id_method='local', projection_kwargs=projection_kwargs, id_kwargs=id_kwargs, verbose = False)
-        elif id_method == 'global': 
-            all_sim, last = intrinsic_dimension(mol=window_mol, projection_method=projection_method, id_method='global', projection_kwargs=projection_kwargs, id_kwargs=id_kwargs, verbose = False)
-            instantaneous = []
-        else:
-            raise TypeError(
-            f'id_method must be "local" or "global", got {id_method} instead.'
-        )
-        
-        results.append({
-            'start': start,
-            'end': end, 
-            'sec str type': ss,
-            'window': window_mol.get('resid', 'name CA'),
-            'entire simulation': all_sim,
-            'last simulation': last, 
-            'instantaneous': instantaneous, 
-        })        
-    results = pd.DataFrame(results)
-    return results, secStr_table
+    secStr_sequence = list(zip(start, end, ss_type))
+    return secStr_table, secStr_sequence
@@ -4,6 +4,10 @@ import numpy as np
 import pandas as pd
 from moleculekit.molecule import Molecule 
 import os 
+import threading
+from .load_trajectory import load_molecule
+from .scan import iter_windows, cancel_on_signals, append_row
+from .window_store import trajectory_fingerprint, scan_parameters, cached_window_id
 
 
 logger = logging.getLogger(__name__)
@@ -15,7 +19,7 @@ logger.addHandler(handler)
 logger.propagate = False
 
 
-def section_id(topology=None, trajectory=None, mol=None, window_size=10, stride=1, projection_method='Distances', id_method='local', projection_kwargs=None, id_kwargs=None, verbose=True):
+def section_id(topology=None, trajectory=None, mol=None, window_size=10, stride=1, projection_method='Distances', id_method='local', projection_kwargs=None, id_kwargs=None, frames=None, window_timeout=None, cancel=None, cancel_signals=None, store=None, verbose=True):
     '''
     Computes intrinsic dimension (ID) on sliding residue windows across a protein trajectory.
     This function loads a protein trajectory and slices the protein into overlapping windows of fixed residue length. 
@@ -55,6 +59,20 @@ def section_id(topology=None, trajectory=None, mol=None, window_size=10, stride=
         Parameters for intrinsic dimension estimation. Examples:
             - estimator : str, name of the estimator from scikit-dimension, including CorrInt, DANCo, ESS, FisherS, KNN, lPCA, MADA, MiND_ML, MLE, MOM, TLE, TwoNN (default="TwoNN")
             - last : int, number of frames to average over starting from the end of the simulation (default=100).
+    frames : slice, range or array-like of int, optional
+        Frames of the trajectory to analyse, e.g. ``slice(0, None, 10)`` for one frame every ten or ``slice(-500, None)`` 
+        for the last 500. For XTC and DCD files only the selected frames are read from disk. Also applied to `mol` if provided.
+    window_timeout : float, optional
+        Wall-clock budget of each window in seconds. A window over budget is recorded as timed out, 
+        with NaN ID, and the scan continues with the next one (its computation goes on in the background, and at most
+        `scan.MAX_ABANDONED_WINDOWS` of them run at once).
+    cancel : threading.Event, optional
+        Cancellation flag, e.g. set from another thread. When set, the scan stops and returns the windows computed so far.
+    cancel_signals : tuple of int, optional
+        Signals that cancel the scan, e.g. ``(signal.SIGINT,)`` to return partial results on Ctrl+C. Only from the main thread.
+    store : WindowStore, optional
+        Store of window results: windows already computed on the same frames with the same parameters are taken from it,
+        the others are computed and added to it. Not used with a `Projection` object as `projection_method`.
     verbose : bool, default=True
         If True, logs are shown. If False, logs are suppressed.
 
@@ -62,6 +80,8 @@ def section_id(topology=None, trajectory=None, mol=None, window_size=10, stride=
     -------
     results : DataFrame 
         columns include "start", "end", "entire simulation", "last simulation", "instantaneous". 
+        ``results.attrs["timed out"]`` lists the (start, end) of timed out windows and 
+        ``results.attrs["cancelled"]`` tells whether the scan was cancelled.
     
     Raises
     ------
@@ -94,22 +114,13 @@ def section_id(topology=None, trajectory=None, mol=None, window_size=10, stride=
     id_kwargs = id_kwargs or {}
 
     #load Molecule or protein and trajectory
-    if mol is None:
-        if topology is None:
-            raise FileNotFoundError(f'Topology file not found: {topology}')
-
-        if trajectory is None:
-            raise FileNotFoundError(f'Trajectory file not found: {trajectory}')
-        
-        mol = Molecule(topology, validateElements = False) #ref:PeriodicTable raises error with dummy atoms i. e. M
-        mol.read(trajectory)
-        
+    mol = load_molecule(topology, trajectory, mol, frames, _window_atoms(projection_method, projection_kwargs))
     resids = mol.get('resid', sel='all')  
     resids = np.unique(resids) #one number per resid instead of per atom
 
     total_resids = len(resids)
 
-    windows = range(0, total_resids - window_size + 1, stride)
+    windows = _residue_windows(mol, window_size, stride)
     windows_number = len(windows)
     
     extra_aa = (total_resids - window_size) % stride
@@ -117,35 +128,220 @@ def section_id(topology=None, trajectory=None, mol=None, window_size=10, stride=
         logger.info(f'Protein has {total_resids} amino acids. Slicing in {windows_number} windows of {window_size} amino acids each and {stride} aminos stride.')
         logger.info(f'Last {extra_aa} amino acids will be ingored.')
     logger.info(f'Computing {id_method} Intrinsic Dimension from {projection_method}.')
-    results=[]
-    
+    return _scan_windows(mol, windows, projection_method, id_method, projection_kwargs, id_kwargs, window_timeout, cancel, cancel_signals, store)
+
+
+def adaptive_section_id(topology=None, trajectory=None, mol=None, window_size=10, stride=1, coarse_stride=None, coarse_frame_step=4, change=None, threshold=None, projection_method='Distances', id_method='local', projection_kwargs=None, id_kwargs=None, frames=None, window_timeout=None, cancel=None, cancel_signals=None, store=None, verbose=True):
+    '''
+    Computes intrinsic dimension (ID) on sliding residue windows, at full resolution only where the ID profile varies.
+
+    A first pass computes a cheap profile with windows every `coarse_stride` residues, on one frame every
+    `coarse_frame_step`. Coarse windows where the profile jumps by more than `change`, or crosses `threshold`,
+    with respect to a neighbouring coarse window are then replaced by the `stride`-spaced windows they cover,
+    computed on all frames. Elsewhere the coarse estimate is kept.
+
+    Parameters
+    ----------
+    topology, trajectory, mol, window_size, stride, projection_method, id_method, projection_kwargs, id_kwargs, frames, window_timeout, cancel, cancel_signals, store, verbose
+        As in `section_id`. `stride` is the spacing of full resolution windows.
+    coarse_stride : int, optional
+        Spacing of the windows of the first pass (default half the window size).
+    coarse_frame_step : int, default=4
+        The first pass uses one frame every `coarse_frame_step`, and "last" of `id_kwargs` is divided by it so that
+        "last simulation" covers the same time span. With id_method "local", enough frames for the estimator's
+        neighbourhood must remain (e.g. 101 for TwoNN).
+    change : float, optional
+        Minimum difference of "entire simulation" ID between neighbouring coarse windows that triggers refinement.
+        Defaults to the mean plus one standard deviation of these differences, unless `threshold` is given.
+    threshold : float, optional
+        ID value: coarse windows on opposite sides of it are refined.
+
+    Returns
+    -------
+    results : DataFrame 
+        The columns of `section_id`, plus "resolution": "coarse" for first-pass windows (whose "entire simulation",
+        "last simulation" and "instantaneous" ID are estimated from the subsampled frames only) and "fine" for
+        refined ones, sorted by "start".
+
+    Raises
+    ------
+    ValueError
+        If window_size <=1 or coarse_frame_step < 1.
+    '''
+    if verbose:
+        logger.setLevel(logging.INFO) 
+    else:
+        logger.setLevel(logging.CRITICAL + 1)
+
+    if window_size <= 1:
+        raise ValueError("`window_size` must be > 1.")
+    if coarse_frame_step < 1:
+        raise ValueError(f'coarse_frame_step must be >= 1, got {coarse_frame_step} instead.')
+    coarse_stride = coarse_stride or max(window_size // 2, 1)
+
+    mol = load_molecule(topology, trajectory, mol, frames, _window_atoms(projection_method, projection_kwargs))
+    coarse_mol = mol.copy(frames=np.arange(0, mol.numFrames, coarse_frame_step))
+    if cancel is None and cancel_signals:
+        cancel = threading.Event()
+    scan = dict(projection_method=projection_method, id_method=id_method, projection_kwargs=projection_kwargs or {}, 
+                id_kwargs=id_kwargs or {}, window_timeout=window_timeout, cancel=cancel, cancel_signals=cancel_signals, store=store)
+
+    coarse_id_kwargs = {**scan['id_kwargs'], 'last': max(scan['id_kwargs'].get('last', 100) // coarse_frame_step, 1)}
+    coarse = _scan_windows(coarse_mol, _residue_windows(mol, window_size, coarse_stride), **{**scan, 'id_kwargs': coarse_id_kwargs})
+    coarse['resolution'] = 'coarse'
+    profile = coarse['entire simulation'].to_numpy(dtype=float)
+    jumps = np.abs(np.diff(profile))
+    if change is None and threshold is None and len(jumps) > 0:
+        change = np.nanmean(jumps) + np.nanstd(jumps)
+    flagged = np.zeros(len(profile), dtype=bool)
+    if change is not None:
+        sharp = jumps > change
+        flagged[:-1] |= sharp
+        flagged[1:] |= sharp
+    if threshold is not None:
+        crossing = (profile[:-1] - threshold) * (profile[1:] - threshold) < 0
+        flagged[:-1] |= crossing
+        flagged[1:] |= crossing
+
+    # each coarse window stands for the fine windows starting before the next coarse one
+    fine_windows = _residue_windows(mol, window_size, stride)
+    fine_starts = np.array([start for start, _ in fine_windows])
+    owner = np.searchsorted(coarse['start'].to_numpy(), fine_starts, side='right') - 1
+    refined = [window for window, j in zip(fine_windows, owner) if j >= 0 and flagged[j]]
+    logger.info(f'Coarse pass: {len(coarse)} windows on {coarse_mol.numFrames} frames. '
+                f'Refining {flagged.sum()} of them with {len(refined)} of {len(fine_windows)} full resolution windows.')
+
+    fine = _scan_windows(mol, refined, **scan)
+    fine['resolution'] = 'fine'
+    results = pd.concat([coarse[~flagged], fine], ignore_index=True)
+    results = results.sort_values(['start', 'resolution'], kind='stable', ignore_index=True)
+    results.attrs['timed out'] = coarse.attrs['timed out'] + fine.attrs['timed out']
+    results.attrs['cancelled'] = coarse.attrs['cancelled'] or fine.attrs['cancelled']
+    return results
+
+
+def iter_section_id(topology=None, trajectory=None, mol=None, window_size=10, stride=1, projection_method='Distances', id_method='local', projection_kwargs=None, id_kwargs=None, frames=None, window_timeout=None, cancel=None, n_jobs=1, sink=None, store=None, verbose=True):
+    '''
+    Computes intrinsic dimension (ID) on sliding residue windows as `section_id`, yielding each window's row as soon as it is computed.
+
+    Only the windows in flight are held in memory. Closing the generator (e.g. breaking out of a loop) stops the scan.
 
-    for i in windows:
-        start = resids[i]
-        end = resids[i + window_size - 1]
-        resid_sele = f"resid {start} to {end}"
-        window_mol = mol.copy()
-        window_mol.filter(resid_sele, _logger=False)
-        
-        if id_method == 'local':
-            all_sim, last, instantaneous = intrinsic_dimension(mol=window_mol, projection_method=projection_method, id_method='local', projection_kwargs=projection_kwargs, id_kwargs=id_kwargs, verbose = False)
-        elif id_method == 'global':
-            all_sim, last = intrinsic_dimension(mol=window_mol, projection_method=projection_method, id_method='global', projection_kwargs=projection_kwargs, id_kwargs=id_kwargs, verbose = False)
-            instantaneous = []
-        else:
-            raise TypeError(
-            f'id_method must be "local" or "global", got {id_method} instead.'
-        )
-
-        results.append({
+    Parameters
+    ----------
+    topology, trajectory, mol, window_size, stride, projection_method, id_method, projection_kwargs, id_kwargs, frames, window_timeout, cancel, store, verbose
+        As in `section_id`.
+    n_jobs : int, default=1
+        Number of windows computed at once by a thread pool. If larger than 1, rows are yielded in completion order.
+    sink : str, optional
+        Path to a JSON Lines file to which each row is appended as soon as it is computed (see `read_scan`).
+
+    Yields
+    ------
+    row : dict
+        Keys "start", "end", "entire simulation", "last simulation", "instantaneous", as the columns of `section_id`.
+        Timed out windows have NaN ID.
+
+    Raises
+    ------
+    ValueError
+        If window_size <=1 as ID can't be computed.
+    '''
+    if verbose:
+        logger.setLevel(logging.INFO) 
+    else:
+        logger.setLevel(logging.CRITICAL + 1)
+
+    if window_size <= 1:
+        raise ValueError("`window_size` must be > 1.")
+
+    mol = load_molecule(topology, trajectory, mol, frames, _window_atoms(projection_method, projection_kwargs))
+    windows = _residue_windows(mol, window_size, stride)
+    logger.info(f'Computing {id_method} Intrinsic Dimension from {projection_method} on {len(windows)} windows.')
+    for _, row in _iter_window_rows(mol, windows, projection_method, id_method, projection_kwargs or {}, id_kwargs or {}, window_timeout, cancel, n_jobs, sink, store):
+        yield row
+
+
+def _iter_window_rows(mol, windows, projection_method, id_method, projection_kwargs, id_kwargs, window_timeout=None, cancel=None, n_jobs=1, sink=None, store=None):
+    # (status, section_id row) of the given (start, end) windows, as they are computed or found in `store`
+    fingerprint, parameters = _store_keys(mol, projection_method, id_method, projection_kwargs, id_kwargs, store)
+
+    def compute(window):
+        start, end = window
+
+        def window_id():
+            window_mol = mol.copy()
+            window_mol.filter(f"resid {start} to {end}", _logger=False)
+            return _window_id(window_mol, projection_method, id_method, projection_kwargs, id_kwargs)
+        return cached_window_id(window_id, store, fingerprint, parameters, start, end)
+
+    for (start, end), status, out in iter_windows(windows, compute, window_timeout, cancel, n_jobs):
+        if status == 'timed out':
+            logger.warning(f'Window {start}-{end} exceeded {window_timeout} s and was skipped.')
+            out = (np.nan, np.nan, [])
+        all_sim, last, instantaneous = out
+        row = {
             'start': start,
             'end': end, 
             'entire simulation': all_sim,
             'last simulation': last,
             'instantaneous': instantaneous,
-        })
+        }
+        if sink is not None:
+            append_row(sink, row)
+        yield status, row
+
+
+def _scan_windows(mol, windows, projection_method, id_method, projection_kwargs, id_kwargs, window_timeout=None, cancel=None, cancel_signals=None, store=None):
+    # section_id table of the given (start, end) windows
+    if cancel is None and cancel_signals:
+        cancel = threading.Event()
+    results = []
+    timed_out = []
+    hits = store.hits if store is not None else 0
+    with cancel_on_signals(cancel, cancel_signals or ()):
+        for status, row in _iter_window_rows(mol, windows, projection_method, id_method, projection_kwargs, id_kwargs, window_timeout, cancel, store=store):
+            if status == 'timed out':
+                timed_out.append((row['start'], row['end']))
+            results.append(row)
+    cancelled = cancel is not None and cancel.is_set()
+    if cancelled:
+        logger.warning(f'Scan cancelled after {len(results)} of {len(windows)} windows.')
+    if store is not None:
+        logger.info(f'{store.hits - hits} of {len(windows)} windows taken from the store.')
     results = pd.DataFrame(results)
+    results.attrs['timed out'] = timed_out
+    results.attrs['cancelled'] = cancelled
 
     return results
 
 
+def _store_keys(mol, projection_method, id_method, projection_kwargs, id_kwargs, store):
+    # (trajectory fingerprint, parameters) part of the store keys of a scan, None without a store
+    if store is None:
+        return None, None
+    return trajectory_fingerprint(mol), scan_parameters(projection_method, id_method, projection_kwargs, id_kwargs)
+
+
+def _window_id(window_mol, projection_method, id_method, projection_kwargs, id_kwargs):
+    # (entire simulation, last simulation, instantaneous) ID of one window
+    if id_method == 'local':
+        return intrinsic_dimension(mol=window_mol, projection_method=projection_method, id_method='local', projection_kwargs=projection_kwargs, id_kwargs=id_kwargs, verbose = False)
+    elif id_method == 'global':
+        all_sim, last = intrinsic_dimension(mol=window_mol, projection_method=projection_method, id_method='global', projection_kwargs=projection_kwargs, id_kwargs=id_kwargs, verbose = False)
+        return all_sim, last, []
+    else:
+        raise TypeError(
+        f'id_method must be "local" or "global", got {id_method} instead.'
+    )
+
+
+def _window_atoms(projection_method, projection_kwargs):
+    # atoms loaded for a scan: those read by the projection and the CA atoms of the residues, None for all atoms
+    atoms = projection_atoms(projection_method, projection_kwargs)
+    return None if atoms is None else f'({atoms}) or name CA'
+
+
+def _residue_windows(mol, window_size, stride):
+    # (first, last) resid of each sliding window
+    resids = np.unique(mol.get('resid', sel='all'))
+    return [(resids[i], resids[i + window_size - 1]) for i in range(0, len(resids) - window_size + 1, stride)]
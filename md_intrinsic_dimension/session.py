@@ -0,0 +1,231 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import skdim
+from .compute_id import compute_local, compute_global, nearest_neighbors, _n_neighbors
+from .kernels import start_threads
+from .load_trajectory import load_molecule
+from .md_intrinsic_dimension import _project
+from .section_id import _residue_windows
+from .secondary_structure_id import _check_mol_ref, _secondary_structure_segments
+from .window_store import _freeze
+
+logger = logging.getLogger(__name__)
+
+
+class IDSession:
+    '''
+    Keeps a loaded trajectory, its projections and neighbour graphs, and a worker pool
+    across repeated intrinsic dimension (ID) analyses.
+
+    The methods mirror `intrinsic_dimension`, `section_id` and `secondary_structure_id`
+    and return the same results, but the molecule is loaded once, each projection
+    (whole molecule or residue window) is computed once per set of parameters, and
+    the nearest-neighbour search of local ID is shared between estimators.
+    Section scans run their windows on the session's thread pool.
+
+    Parameters
+    ----------
+    topology : str, optional
+        Path to the topology file (e.g., .pdb, .psf). Required if `mol` is not provided.
+    trajectory : str, optional
+        Path to the trajectory file (e.g., .dcd, .xtc). Required if `mol` is not provided.
+    mol : Molecule, optional
+        A pre-loaded MoleculeKit `Molecule` object. If provided, `topology` and `trajectory` are ignored.
+    frames : slice, range or array-like of int, optional
+        Frames of the trajectory to analyse (default all).
+    n_jobs : int, optional
+        Number of worker threads (default: number of CPUs).
+
+    Examples
+    --------
+    >>> with IDSession(topology='villin/2f4k.pdb', trajectory='villin/2f4k_f1.xtc') as session:
+    ...     session.intrinsic_dimension(id_kwargs={'estimator': 'TwoNN'})
+    ...     session.intrinsic_dimension(id_kwargs={'estimator': 'MLE'})  # reuses projection and neighbours
+    ...     session.section_id(window_size=10)
+    '''
+
+    def __init__(self, topology=None, trajectory=None, mol=None, frames=None, n_jobs=None):
+        self.mol = load_molecule(topology, trajectory, mol, frames)
+        self.n_jobs = n_jobs or os.cpu_count()
+        self._pool = None
+        self._lock = threading.Lock()
+        self._projections = {}
+        self._neighbours = {}
+        self._segments = {}
+
+    @property
+    def pool(self):
+        '''The session's thread pool, created on first use.'''
+        if self._pool is None:
+            start_threads()
+            self._pool = ThreadPoolExecutor(max_workers=self.n_jobs)
+        return self._pool
+
+    def close(self):
+        '''Shuts down the worker pool. Cached projections are kept.'''
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def clear_cache(self):
+        '''Drops cached projections, neighbour graphs and secondary structure assignments.'''
+        with self._lock:
+            self._projections.clear()
+            self._neighbours.clear()
+            self._segments.clear()
+
+    def projection(self, projection_method='Distances', projection_kwargs=None, resids=None):
+        '''
+        Returns the (cached) projection of the whole molecule or of a residue range.
+
+        Parameters
+        ----------
+        projection_method : str or Projection, default='Distances'
+            As in `intrinsic_dimension`.
+        projection_kwargs : dict, optional
+            As in `intrinsic_dimension`.
+        resids : tuple of int, optional
+            (first, last) resid of a window; the whole molecule if None.
+
+        Returns
+        -------
+        projection : np.ndarray
+            Array of shape (frames, features).
+        '''
+        if isinstance(projection_method, np.ndarray):
+            return projection_method
+        key = (_freeze(projection_method), _freeze(projection_kwargs or {}), resids)
+        cached = self._projections.get(key)
+        if cached is None:
+            mol = self.mol
+            if resids is not None:
+                mol = mol.copy()
+                mol.filter(f'resid {resids[0]} to {resids[1]}', _logger=False)
+            # the parameters are stored too, so that identity-based keys stay unique
+            cached = (_project(mol, projection_method, projection_kwargs), projection_method, projection_kwargs)
+            with self._lock:
+                self._projections[key] = cached
+        return cached[0]
+
+    def neighbours(self, projection, k, key=None):
+        '''
+        Returns the sorted k nearest neighbours of each frame of a projection, reusing any
+        previous search with at least k neighbours for the same `key`. Without a `key`, the
+        projection is keyed by its content.
+        '''
+        key = _freeze(projection) if key is None else key #not id(): a freed array's id can be reused
+        cached = self._neighbours.get(key)
+        if cached is None or cached[0].shape[1] < k:
+            cached = nearest_neighbors(projection, k)
+            with self._lock:
+                self._neighbours[key] = cached
+        return cached[0][:, :k], cached[1][:, :k]
+
+    def _estimate(self, projection, key, id_method, id_kwargs):
+        id_kwargs = dict(id_kwargs or {})
+        estimator = id_kwargs.pop('estimator', 'TwoNN')
+        last = id_kwargs.pop('last', int(100))
+        if id_method == 'local':
+            k = _n_neighbors(getattr(skdim.id, estimator)(**id_kwargs), len(projection))
+            knn = self.neighbours(projection, k, key=key)
+            return compute_local(projection=projection, estimator=estimator, last=last, knn=knn, **id_kwargs)
+        elif id_method == 'global':
+            return compute_global(projection=projection, estimator=estimator, last=last, **id_kwargs)
+        raise TypeError(
+            f'id_method must be "local" or "global", got {id_method} instead.'
+        )
+
+    def _window(self, resids, projection_method, id_method, projection_kwargs, id_kwargs):
+        projection = self.projection(projection_method, projection_kwargs, resids=resids)
+        key = (_freeze(projection_method), _freeze(projection_kwargs or {}), resids)
+        out = self._estimate(projection, key, id_method, id_kwargs)
+        if id_method == 'global':
+            return out[0], out[1], []
+        return out
+
+    def intrinsic_dimension(self, projection_method='Distances', id_method='local', projection_kwargs=None, id_kwargs=None):
+        '''
+        Same as `intrinsic_dimension` on the session's molecule.
+
+        Returns
+        -------
+        If "local": mean_all, mean_last, local_id. If "global": gid, gid100.
+        '''
+        projection = self.projection(projection_method, projection_kwargs)
+        key = (_freeze(projection_method), _freeze(projection_kwargs or {}), None)
+        return self._estimate(projection, key, id_method, id_kwargs)
+
+    def section_id(self, window_size=10, stride=1, projection_method='Distances', id_method='local', projection_kwargs=None, id_kwargs=None):
+        '''
+        Same as `section_id` on the session's molecule, with windows computed on the worker pool.
+
+        Returns
+        -------
+        results : DataFrame
+            columns include "start", "end", "entire simulation", "last simulation", "instantaneous".
+        '''
+        if window_size <= 1:
+            raise ValueError("`window_size` must be > 1.")
+        if id_method not in ('local', 'global'):
+            raise TypeError(
+                f'id_method must be "local" or "global", got {id_method} instead.'
+            )
+        windows = _residue_windows(self.mol, window_size, stride)
+        outs = self.pool.map(lambda w: self._window(w, projection_method, id_method, projection_kwargs, id_kwargs), windows)
+        results = [{
+            'start': start,
+            'end': end,
+            'entire simulation': all_sim,
+            'last simulation': last,
+            'instantaneous': instantaneous,
+        } for (start, end), (all_sim, last, instantaneous) in zip(windows, outs)]
+        return pd.DataFrame(results)
+
+    def secondary_structure_id(self, mol_ref, simplified=True, projection_method='Distances', id_method='local', projection_kwargs=None, id_kwargs=None):
+        '''
+        Same as `secondary_structure_id` on the session's molecule, with segments computed on the worker pool.
+
+        Returns
+        -------
+        results : pandas.DataFrame
+            Table with ID results per secondary structure segment.
+        secStr_table : pandas.DataFrame
+            Per-residue DSSP assignment.
+        '''
+        _check_mol_ref(self.mol, mol_ref)
+        if id_method not in ('local', 'global'):
+            raise TypeError(
+                f'id_method must be "local" or "global", got {id_method} instead.'
+            )
+        key = (id(mol_ref), simplified)
+        if key not in self._segments:
+            self._segments[key] = (mol_ref, _secondary_structure_segments(mol_ref, simplified))
+        secStr_table, secStr_sequence = self._segments[key][1]
+
+        segments = []
+        for start, end, ss in secStr_sequence:
+            if (end - start) < 1: #too short to compute any projection
+                logger.warning(f'Skipping segment {start}-{end}: at least two residues per segment are required.')
+                continue
+            segments.append((start, end, ss))
+        outs = self.pool.map(lambda s: self._window(s[:2], projection_method, id_method, projection_kwargs, id_kwargs), segments)
+        results = [{
+            'start': start,
+            'end': end,
+            'sec str type': ss,
+            'window': self.mol.get('resid', sel=f'name CA and resid {start} to {end}'),
+            'entire simulation': all_sim,
+            'last simulation': last,
+            'instantaneous': instantaneous,
+        } for (start, end, ss), (all_sim, last, instantaneous) in zip(segments, outs)]
+        return pd.DataFrame(results), secStr_table
@@ -0,0 +1,262 @@
+import importlib
+import logging
+import os
+import pickle
+import socket
+import threading
+import time
+import traceback
+import uuid
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+handler = logging.StreamHandler()
+formatter = logging.Formatter('%(name)s - %(levelname)s - %(message)s')
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+logger.propagate = False
+
+_ITEMS = 'items.pkl'
+_CLAIMS = 'claims'
+_RESULTS = 'results'
+
+
+def _atomic_write(path, value):
+    # pickles value next to path and renames it into place, so that readers never see a partial file
+    tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp, 'wb') as f:
+        pickle.dump(value, f)
+    os.replace(tmp, path)
+
+
+def _load(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def _write_items(directory, items):
+    # writes the work list once, checking that every node was given the same one
+    path = os.path.join(directory, _ITEMS)
+    tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp, 'wb') as f:
+        pickle.dump(list(items), f)
+    try:
+        os.link(tmp, path) #fails if another node wrote the list first
+    except FileExistsError:
+        with open(tmp, 'rb') as f, open(path, 'rb') as g:
+            same = f.read() == g.read()
+        if not same:
+            raise ValueError(f'{directory} already holds a different list of items.')
+    finally:
+        os.remove(tmp)
+
+
+def _read_claim(path):
+    # (mtime, content) of a claim file, None if it does not exist
+    try:
+        with open(path) as f:
+            return os.fstat(f.fileno()).st_mtime_ns, f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _claim(path, worker):
+    # token of a new claim, None if the item is already claimed (O_EXCL creation is atomic, including on NFS v3+)
+    token = f'{worker} {uuid.uuid4().hex}'
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+    except FileExistsError:
+        return None
+    with os.fdopen(fd, 'w') as f:
+        f.write(token)
+    return token
+
+
+def _reclaim(path, content):
+    # removes a stale claim, only if it still holds the content seen as stale
+    aside = f'{path}.{uuid.uuid4().hex}.stale'
+    try:
+        os.rename(path, aside)
+    except FileNotFoundError:
+        return False
+    with open(aside) as f:
+        stale = f.read() == content
+    if not stale: #claimed again in the meantime: put it back
+        try:
+            os.link(aside, path)
+        except FileExistsError:
+            pass
+    os.remove(aside)
+    return stale
+
+
+def _release(path, token):
+    if (_read_claim(path) or (None, None))[1] == token:
+        os.remove(path)
+
+
+def _heartbeat(path, interval, stop):
+    # touches the claim until stop is set, so that other workers see it is alive
+    while not stop.wait(interval):
+        try:
+            os.utime(path)
+        except FileNotFoundError: #reclaimed by another worker, which will compute the item again
+            return
+
+
+def _function(function):
+    if callable(function):
+        return function
+    return getattr(importlib.import_module(__package__), function)
+
+
+def run_shard(directory, items=None, function='intrinsic_dimension', kwargs=None, worker=None, stale_after=600, poll=10, wait=True, verbose=True):
+    '''
+    Computes the items of a work list shared by several workers (e.g. nodes of a cluster) through a directory
+    of a shared filesystem, without a database or a message broker.
+
+    Every worker runs this function on the same directory. A worker claims an item by creating its claim file
+    atomically (exclusive creation), computes it and writes its result to a file of its own (by atomic rename), so
+    each item is computed once whatever the number of workers. Claims are touched every ``stale_after / 4`` seconds
+    while an item is computed; a claim left untouched for `stale_after` seconds (as seen by the waiting worker's clock)
+    belongs to a dead worker and is taken over. Results are gathered with `merge_shards`.
+
+    Parameters
+    ----------
+    directory : str
+        Shared directory, created if needed.
+    items : list of dict, optional
+        Keyword arguments of `function` for each item, e.g. ``{"topology": ..., "trajectory": ...}``. The first worker writes
+        the list to `directory`; the others must give the same list or None to read it.
+    function : str or callable, default='intrinsic_dimension'
+        Function computing one item, or the name of a function of this package (e.g. "section_id").
+    kwargs : dict, optional
+        Keyword arguments shared by all items, e.g. ``{"verbose": False}``.
+    worker : str, optional
+        Name of this worker in claims and results (default host name and process id).
+    stale_after : float, default=600
+        Seconds after which an untouched claim is taken over.
+    poll : float, default=10
+        Seconds between two passes over items claimed by other workers.
+    wait : bool, default=True
+        If True, return once every item has a result, taking over stale claims. If False, return after one pass.
+    verbose : bool, default=True
+        If True, logs are shown. If False, logs are suppressed.
+
+    Returns
+    -------
+    computed : list of int
+        Indexes of the items computed by this worker. An item whose function raised an error is not retried: its traceback is kept instead of a result.
+
+    Raises
+    ------
+    ValueError
+        If `items` differs from the list already in `directory`, or no list was written yet, or stale_after <= 0.
+    '''
+    logger.setLevel(logging.INFO if verbose else logging.CRITICAL + 1)
+    if stale_after <= 0:
+        raise ValueError(f'stale_after must be > 0, got {stale_after} instead.')
+    worker = worker or f'{socket.gethostname()}-{os.getpid()}'
+    function = _function(function)
+    kwargs = kwargs or {}
+    os.makedirs(os.path.join(directory, _CLAIMS), exist_ok=True)
+    os.makedirs(os.path.join(directory, _RESULTS), exist_ok=True)
+    if items is not None:
+        _write_items(directory, items)
+    if not os.path.isfile(os.path.join(directory, _ITEMS)):
+        raise ValueError(f'{directory} holds no list of items: give `items` to the first worker.')
+    items = _load(os.path.join(directory, _ITEMS))
+
+    computed = []
+    seen = {} #claim (mtime, content) of items claimed by others, and when this worker first saw it
+    pending = list(range(len(items)))
+    while pending:
+        for i in pending:
+            result_path = os.path.join(directory, _RESULTS, f'{i}.pkl')
+            claim_path = os.path.join(directory, _CLAIMS, f'{i}.claim')
+            if os.path.exists(result_path):
+                continue
+            token = _claim(claim_path, worker)
+            if token is None:
+                claim = _read_claim(claim_path)
+                if claim is None:
+                    continue #released, claimed again at the next pass
+                if seen.get(i, (None,))[0] != claim:
+                    seen[i] = (claim, time.monotonic())
+                    continue
+                if time.monotonic() - seen[i][1] < stale_after or not _reclaim(claim_path, claim[1]):
+                    continue
+                logger.warning(f'Item {i}: taking over the stale claim of "{claim[1].split(" ")[0]}".')
+                token = _claim(claim_path, worker)
+                if token is None:
+                    continue
+            if os.path.exists(result_path): #finished between the check and the claim
+                _release(claim_path, token)
+                continue
+
+            stop = threading.Event()
+            beat = threading.Thread(target=_heartbeat, args=(claim_path, stale_after / 4, stop), daemon=True)
+            beat.start()
+            start = time.perf_counter()
+            record = {'item': i, 'worker': worker, 'result': None, 'error': None}
+            try:
+                record['result'] = function(**items[i], **kwargs)
+            except Exception:
+                record['error'] = traceback.format_exc()
+                logger.warning(f'Item {i} failed: {record["error"].splitlines()[-1]}')
+            finally:
+                stop.set()
+                beat.join()
+            record['seconds'] = time.perf_counter() - start
+            _atomic_write(result_path, record)
+            _release(claim_path, token)
+            computed.append(i)
+            logger.info(f'Item {i} computed in {record["seconds"]:.1f} s.')
+
+        pending = [i for i in pending if not os.path.exists(os.path.join(directory, _RESULTS, f'{i}.pkl'))]
+        if not wait:
+            break
+        if pending:
+            time.sleep(poll)
+    logger.info(f'{worker} computed {len(computed)} of {len(items)} items.')
+    return computed
+
+
+def merge_shards(directory):
+    '''
+    Gathers the results written by `run_shard` workers.
+
+    Parameters
+    ----------
+    directory : str
+        Shared directory of `run_shard`.
+
+    Returns
+    -------
+    results : DataFrame
+        If every computed item returned a DataFrame (e.g. `section_id`), their concatenation with a first "item" column.
+        Otherwise one row per computed item, with columns "item", "worker", "seconds", "error" and "result".
+        ``results.attrs["pending"]`` lists the items without result and ``results.attrs["errors"]`` maps failed items
+        to their traceback.
+    '''
+    items = _load(os.path.join(directory, _ITEMS))
+    records = []
+    pending = []
+    for i in range(len(items)):
+        path = os.path.join(directory, _RESULTS, f'{i}.pkl')
+        if os.path.exists(path):
+            records.append(_load(path))
+        else:
+            pending.append(i)
+    errors = {r['item']: r['error'] for r in records if r['error'] is not None}
+    done = [r for r in records if r['error'] is None]
+    if done and all(isinstance(r['result'], pd.DataFrame) for r in done):
+        results = pd.concat([r['result'].assign(item=r['item']) for r in done], ignore_index=True)
+        results = results[['item'] + [c for c in results.columns if c != 'item']]
+    else:
+        results = pd.DataFrame(records, columns=['item', 'worker', 'seconds', 'error', 'result'])
+        results['result'] = pd.Series([r['result'] for r in records], index=results.index, dtype=object) #results as returned
+    results.attrs['pending'] = pending
+    results.attrs['errors'] = errors
+    return results
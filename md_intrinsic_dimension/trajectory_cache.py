@@ -0,0 +1,191 @@
+import json
+import os
+import shutil
+import uuid
+import numpy as np
+from moleculekit.molecule import Molecule
+from .load_trajectory import SEEKABLE_FORMATS, count_frames, frame_indexes, load_molecule, _atom_indexes
+
+CACHE_VERSION = 2
+
+_METADATA = 'metadata.json'
+_COORDS = 'coords.npy'
+_FRAME_FIELDS = 'frames.npz'
+
+
+def is_trajectory_cache(path):
+    '''Returns True if `path` is a directory written by `cache_trajectory`.'''
+    return isinstance(path, (str, os.PathLike)) and os.path.isfile(os.path.join(path, _METADATA))
+
+
+def _metadata(path):
+    with open(os.path.join(path, _METADATA)) as f:
+        metadata = json.load(f)
+    if metadata['version'] != CACHE_VERSION:
+        raise ValueError(f'Trajectory cache version {metadata["version"]} is not supported, expected {CACHE_VERSION}.')
+    return metadata
+
+
+def cache_frames(path):
+    '''Returns the number of frames of a trajectory cache.'''
+    return _metadata(path)['n_frames']
+
+
+def _write_chunk(coords, fields, mol, start):
+    stop = start + mol.numFrames
+    coords[start:stop] = np.transpose(mol.coords, (2, 0, 1))
+    for field in fields:
+        fields[field][..., start:stop] = getattr(mol, field)
+    return stop
+
+
+def cache_trajectory(path, topology=None, trajectory=None, mol=None, chunk_size=1000):
+    '''
+    Converts a trajectory once into an uncompressed, memory-mappable cache directory, read back by
+    `intrinsic_dimension`, `section_id` and `secondary_structure_id` when passed as `trajectory`.
+
+    Coordinates are stored frame by frame, as a (frames, atoms, 3) array, so that a chunk of frames is a
+    contiguous block of the file: reloading is a memory map with no decoding, viewed in MoleculeKit's
+    (atoms, 3, frames) layout, and selecting frames reads only those blocks. XTC and DCD files are converted
+    in chunks of frames, so the trajectory is never held in memory. The topology is copied alongside.
+    The cache is written to a temporary directory renamed to `path` once complete, so that a failed
+    conversion leaves nothing behind.
+
+    Parameters
+    ----------
+    path : str
+        Directory to create.
+    topology : str, optional
+        Path to the topology file (e.g., .pdb, .psf). Required if `mol` is not provided.
+    trajectory : str, optional
+        Path to the trajectory file (e.g., .dcd, .xtc). Required if `mol` is not provided.
+    mol : Molecule, optional
+        A pre-loaded MoleculeKit `Molecule` object. If provided, `topology` and `trajectory` are ignored
+        and its topology is written as PDB.
+    chunk_size : int, default=1000
+        Number of frames decoded at once.
+
+    Returns
+    -------
+    path : str
+
+    Raises
+    ------
+    FileNotFoundError
+        If required topology or trajectory files are missing.
+    FileExistsError
+        If `path` already exists.
+    '''
+    if mol is None:
+        if topology is None or not os.path.isfile(topology):
+            raise FileNotFoundError(f'Topology file not found: {topology}')
+        if trajectory is None or not os.path.isfile(trajectory):
+            raise FileNotFoundError(f'Trajectory file not found: {trajectory}')
+    if os.path.exists(path):
+        raise FileExistsError(f'{path} already exists.')
+    tmp = f'{os.path.normpath(path)}.{uuid.uuid4().hex}.tmp'
+    os.makedirs(tmp)
+    try:
+        _write_cache(tmp, topology, trajectory, mol, chunk_size)
+        try:
+            os.rename(tmp, path)
+        except OSError as e: #created meanwhile by another conversion
+            raise FileExistsError(f'{path} already exists.') from e
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return path
+
+
+def _write_cache(path, topology, trajectory, mol, chunk_size):
+    if mol is not None:
+        topology_name = 'topology.pdb'
+        mol.copy(frames=[0]).write(os.path.join(path, topology_name))
+        chunks = [mol]
+        n_frames = mol.numFrames
+    else:
+        topology_name = 'topology' + os.path.splitext(str(topology))[1].lower()
+        shutil.copyfile(topology, os.path.join(path, topology_name))
+        ext = os.path.splitext(str(trajectory))[1][1:].lower()
+        n_frames = count_frames(trajectory) if ext in SEEKABLE_FORMATS else None
+        if n_frames is None:
+            chunks = [load_molecule(topology, trajectory)]
+            n_frames = chunks[0].numFrames
+        else:
+            chunks = (load_molecule(topology, trajectory, frames=slice(start, start + chunk_size))
+                      for start in range(0, n_frames, chunk_size))
+
+    coords = None
+    fields = {}
+    start = 0
+    for chunk in chunks:
+        if coords is None:
+            coords = np.lib.format.open_memmap(os.path.join(path, _COORDS), mode='w+', dtype=np.float32,
+                                               shape=(n_frames, chunk.numAtoms, 3))
+            fields = {field: np.zeros(getattr(chunk, field).shape[:-1] + (n_frames,), dtype=getattr(chunk, field).dtype)
+                      for field in ('box', 'boxangles', 'step', 'time')}
+        start = _write_chunk(coords, fields, chunk, start)
+    coords.flush()
+    del coords
+    np.savez(os.path.join(path, _FRAME_FIELDS), **fields)
+
+    metadata = {'version': CACHE_VERSION, 'topology': topology_name, 'n_frames': n_frames,
+                'source': None if mol is not None else os.path.abspath(trajectory)}
+    with open(os.path.join(path, _METADATA), 'w') as f:
+        json.dump(metadata, f, indent=1)
+
+
+def _frame_slice(indexes):
+    # the equivalent slice if the indexes are evenly spaced and increasing, so that the memory map is viewed and not copied
+    if len(indexes) == 1:
+        return slice(indexes[0], indexes[0] + 1)
+    step = indexes[1] - indexes[0]
+    if step > 0 and np.all(np.diff(indexes) == step):
+        return slice(indexes[0], indexes[-1] + 1, step)
+    return indexes
+
+
+def load_trajectory_cache(path, frames=None, atoms=None):
+    '''
+    Loads a trajectory cache written by `cache_trajectory` as a MoleculeKit `Molecule` whose coordinates
+    are a copy-on-write memory map: only the frames and atoms actually used are read from disk.
+
+    Parameters
+    ----------
+    path : str
+        Cache directory.
+    frames : slice, range or array-like of int, optional
+        Frames to keep (default all frames).
+    atoms : str, optional
+        Atom selection string of the atoms to keep (default all atoms). Their coordinates are copied
+        into memory.
+
+    Returns
+    -------
+    mol : Molecule
+
+    Raises
+    ------
+    ValueError
+        If the cache was written by an incompatible version, or the frame or atom selection is invalid.
+    '''
+    metadata = _metadata(path)
+    mol = Molecule(os.path.join(path, metadata['topology']), validateElements = False)
+    coords = np.load(os.path.join(path, _COORDS), mmap_mode='c')
+    fields = np.load(os.path.join(path, _FRAME_FIELDS))
+    selection = slice(None) if frames is None else _frame_slice(frame_indexes(frames, metadata['n_frames']))
+    if coords.shape[1] != mol.numAtoms:
+        raise ValueError(f'Cached coordinates have {coords.shape[1]} atoms but the topology has {mol.numAtoms}.')
+
+    if atoms is None: #(atoms, 3, frames) view of the memory map
+        mol.coords = np.transpose(coords[selection], (1, 2, 0))
+    else:
+        keep = _atom_indexes(mol, atoms)
+        mol.filter(keep, _logger=False)
+        selected = coords[selection][:, keep] if isinstance(selection, slice) else coords[np.ix_(selection, keep)]
+        mol.coords = np.ascontiguousarray(np.transpose(selected, (1, 2, 0)))
+    for field in ('box', 'boxangles', 'step', 'time'):
+        setattr(mol, field, fields[field][..., selection])
+    indexes = np.arange(metadata['n_frames'])[selection]
+    mol.fileloc = [[metadata['source'] or path, int(i)] for i in indexes]
+    return mol
@@ -0,0 +1,174 @@
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from moleculekit.molecule import Molecule
+
+
+def _freeze(value):
+    # hashable stand-in for projection parameters: Molecules (e.g. a reference) and arrays are keyed by content,
+    # other unhashable objects raise TypeError as they cannot be keyed safely
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, Molecule):
+        return ('Molecule', trajectory_fingerprint(value))
+    if isinstance(value, np.ndarray):
+        return ('array', value.dtype.str, value.shape, hashlib.blake2b(np.ascontiguousarray(value).tobytes(), digest_size=16).hexdigest())
+    hash(value)
+    return value
+
+
+def _copy(value):
+    # copy of a stored result, so that neither the caller nor the store can modify the other's arrays
+    return tuple(np.array(v) if isinstance(v, np.ndarray) else v for v in value)
+
+
+def trajectory_fingerprint(mol):
+    '''
+    Returns a digest of the coordinates and atoms of a `Molecule`, identifying its trajectory (and frame selection)
+    independently of the object or of the file it was read from.
+    '''
+    digest = hashlib.blake2b(digest_size=16)
+    for field in ('resid', 'name', 'chain', 'segid'):
+        digest.update(np.ascontiguousarray(getattr(mol, field)).astype(str).tobytes())
+    digest.update(repr(mol.coords.shape).encode())
+    digest.update(np.ascontiguousarray(mol.coords).tobytes())
+    return digest.hexdigest()
+
+
+def scan_parameters(projection_method, id_method, projection_kwargs, id_kwargs):
+    '''
+    Returns the hashable part of a window key describing how windows are projected and estimated,
+    or None if the projection cannot be keyed (a `Projection` object, a callable, or parameters holding
+    unhashable objects other than Molecules and arrays).
+    '''
+    if not isinstance(projection_method, str):
+        return None
+    id_kwargs = {'estimator': 'TwoNN', 'last': 100, **(id_kwargs or {})} #defaults of intrinsic_dimension
+    try:
+        return (projection_method, id_method, _freeze(projection_kwargs or {}), _freeze(id_kwargs))
+    except TypeError:
+        return None
+
+
+def _nbytes(value):
+    return sum(np.asarray(v).nbytes for v in value)
+
+
+class WindowStore:
+    '''
+    Bounded in-memory store of window ID results, shared by `section_id`, `adaptive_section_id`,
+    `secondary_structure_id` and their iterators through their `store` argument.
+
+    Results are keyed by (trajectory fingerprint, first resid, last resid, projection and estimation parameters),
+    so that a scan only computes the windows missing from earlier scans of the same frames, e.g. those added by a
+    smaller stride, or the windows of another estimator. When a bound is exceeded, the least recently used results
+    are evicted. The store is thread safe.
+
+    Parameters
+    ----------
+    max_entries : int, optional
+        Maximum number of windows kept (default no limit).
+    max_bytes : int, optional
+        Maximum memory of the stored results, mostly their "instantaneous" ID series (default no limit).
+
+    Attributes
+    ----------
+    hits, misses : int
+        Number of windows found in and missing from the store since it was created.
+
+    Examples
+    --------
+    >>> store = WindowStore(max_entries=10000)
+    >>> section_id(mol=mol, stride=4, store=store)
+    >>> section_id(mol=mol, stride=2, store=store)  # computes the odd windows only
+    >>> store.invalidate(mol)
+    '''
+
+    def __init__(self, max_entries=None, max_bytes=None):
+        if max_entries is not None and max_entries < 1:
+            raise ValueError(f'max_entries must be >= 1, got {max_entries} instead.')
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        '''Returns a copy of the (entire simulation, last simulation, instantaneous) result stored under `key`, or None.'''
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return _copy(value)
+
+    def put(self, key, value):
+        '''Stores a copy of a window result, evicting the least recently used ones beyond the bounds.'''
+        value = _copy(value)
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= _nbytes(self._entries.pop(key))
+            self._entries[key] = value
+            self.nbytes += _nbytes(value)
+            while self._entries and ((self.max_entries is not None and len(self._entries) > self.max_entries)
+                                     or (self.max_bytes is not None and self.nbytes > self.max_bytes)):
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= _nbytes(evicted)
+
+    def invalidate(self, mol=None, windows=None):
+        '''
+        Removes stored results.
+
+        Parameters
+        ----------
+        mol : Molecule, optional
+            Only remove the results of this trajectory, with its current frames (default all trajectories).
+        windows : list of tuple, optional
+            Only remove these (first resid, last resid) windows (default all windows).
+
+        Returns
+        -------
+        n_removed : int
+        '''
+        fingerprint = None if mol is None else trajectory_fingerprint(mol)
+        windows = None if windows is None else {(int(start), int(end)) for start, end in windows}
+        with self._lock:
+            removed = [key for key in self._entries
+                       if (fingerprint is None or key[0] == fingerprint) and (windows is None or (key[1], key[2]) in windows)]
+            for key in removed:
+                self.nbytes -= _nbytes(self._entries.pop(key))
+        return len(removed)
+
+    def clear(self):
+        '''Removes all stored results and resets the statistics.'''
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = self.hits = self.misses = 0
+
+
+def cached_window_id(compute, store, fingerprint, parameters, start, end):
+    '''
+    Returns compute() for the window of resids `start` to `end`, looked up in and added to `store`
+    unless the store or the parameters are None.
+    '''
+    if store is None or parameters is None:
+        return compute()
+    key = (fingerprint, int(start), int(end), parameters)
+    value = store.get(key)
+    if value is None:
+        value = compute()
+        store.put(key, value)
+    return value
@@ -1,4 +1,6 @@
 from pathlib import Path
+from moleculekit.molecule import Molecule
+import pytest
 
 TEST_DATA_DIR = Path(__file__).parent / "data"
 
@@ -6,3 +8,11 @@ TOPO_PATH = str(TEST_DATA_DIR / "2hbaA00.pdb")
 TRAJ_PATH = str(TEST_DATA_DIR / "2hbaA00_320_0.xtc")
 
 REF_PATH = Path(__file__).parent / "test_outputs"
+
+
+@pytest.fixture(scope="module")
+def load_mol():
+    # the test trajectory, loaded once per module: tests must not modify it
+    mole = Molecule(TOPO_PATH)
+    mole.read(TRAJ_PATH)
+    return mole
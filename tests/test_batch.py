@@ -0,0 +1,56 @@
+from md_intrinsic_dimension import batch_id, intrinsic_dimension
+import importlib
+import numpy as np
+import pytest
+import time
+from tests.conftest import TOPO_PATH, TRAJ_PATH
+
+batch = importlib.import_module("md_intrinsic_dimension.batch")
+
+
+def test_results(load_mol):
+    results = batch_id([TRAJ_PATH, (TOPO_PATH, TRAJ_PATH), load_mol], topology=TOPO_PATH, projection_method="Dihedrals",
+                       frames=slice(0, 300), verbose=False)
+    mean_all, mean_last, local_id = intrinsic_dimension(mol=load_mol, projection_method="Dihedrals", frames=slice(0, 300), verbose=False)
+    assert results["trajectory"].iloc[0] == str(TRAJ_PATH)
+    assert (results["frames"] == 300).all()
+    assert np.allclose(results["entire simulation"], mean_all)
+    assert np.allclose(results["last simulation"], mean_last)
+    assert np.allclose(results["instantaneous"].iloc[2], local_id)
+
+    results = batch_id([load_mol], projection_method="Dihedrals", id_method="global", verbose=False)
+    assert results.loc[0, ["entire simulation", "last simulation"]].tolist() == pytest.approx(
+        intrinsic_dimension(mol=load_mol, projection_method="Dihedrals", id_method="global", verbose=False))
+    assert set(results.attrs["stats"]) == {"load time", "estimate time", "wait time", "wall time", "overlap"}
+    assert 0 <= results.attrs["stats"]["overlap"] <= 1
+
+
+def test_bounded_prefetch(load_mol, monkeypatch):
+    # estimation is slow, so loading runs ahead as far as the queue allows
+    project, estimate = batch._project, batch._estimate_id
+    loaded = []
+    ahead = []
+
+    def counted_project(*args):
+        loaded.append(None)
+        return project(*args)
+
+    def slow_estimate(*args):
+        time.sleep(0.2)
+        ahead.append(len(loaded))
+        return estimate(*args)
+
+    monkeypatch.setattr(batch, "_project", counted_project)
+    monkeypatch.setattr(batch, "_estimate_id", slow_estimate)
+    results = batch_id([load_mol] * 5, projection_method="Dihedrals", id_method="global", prefetch=2, verbose=False)
+    assert len(results) == 5
+    assert all(n <= i + 3 for i, n in enumerate(ahead))
+
+
+def test_errors(load_mol):
+    with pytest.raises(ValueError, match="prefetch and n_loaders must be >= 1"):
+        batch_id([load_mol], prefetch=0)
+    with pytest.raises(TypeError, match="id_method must be"):
+        batch_id([load_mol], id_method="none")
+    with pytest.raises(FileNotFoundError):
+        batch_id(["missing.xtc"], verbose=False)
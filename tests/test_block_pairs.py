@@ -0,0 +1,51 @@
+from md_intrinsic_dimension import block_pair_id, section_id
+from md_intrinsic_dimension.compute_id import compute_global
+from md_intrinsic_dimension.block_pairs import distance_tensor
+import numpy as np
+import pytest
+from tests.conftest import TOPO_PATH, TRAJ_PATH
+
+
+@pytest.fixture(scope="module")
+def matrix(load_mol):
+    return block_pair_id(mol=load_mol, block_size=10)
+
+
+def test_distance_tensor(load_mol, tmp_path):
+    ca = load_mol.atomselect("name CA", indexes=True)
+    tensor = distance_tensor(load_mol, ca, filename=tmp_path / "tensor.npy", row_block=7)
+    assert isinstance(tensor, np.memmap)
+    xyz = load_mol.coords[ca, :, 3]
+    assert np.allclose(tensor[3], np.linalg.norm(xyz[:, None] - xyz[None], axis=2), atol=1e-4)
+
+
+def test_diagonal(load_mol, matrix):
+    # the 52 CA atoms give blocks 1-10, ..., 31-40 and 41-52
+    assert list(matrix.index) == ["1-10", "11-20", "21-30", "31-40", "41-52"]
+    assert np.allclose(matrix.to_numpy(), matrix.to_numpy().T)
+    sections = section_id(mol=load_mol, window_size=10, stride=10, id_method="global", verbose=False)
+    assert np.allclose(np.diag(matrix)[:4], sections["entire simulation"][:4], rtol=1e-5)
+
+
+def test_off_diagonal(load_mol, matrix):
+    ca = load_mol.atomselect("name CA", indexes=True)
+    a, b = ca[:10], ca[20:30]
+    delta = load_mol.coords[a][:, None] - load_mol.coords[b][None]
+    projection = np.linalg.norm(delta, axis=2).reshape(-1, load_mol.numFrames).T
+    assert matrix.loc["1-10", "21-30"] == pytest.approx(compute_global(projection)[0], rel=1e-4)
+
+
+def test_parallel(load_mol, matrix):
+    np.testing.assert_allclose(block_pair_id(mol=load_mol, block_size=10, n_jobs=2), matrix)
+
+
+def test_small_blocks(load_mol):
+    with pytest.raises(ValueError, match="block_size must be >= 3"):
+        block_pair_id(mol=load_mol, block_size=2)
+
+
+def test_context_selection(load_mol):
+    # "protein" depends on the bonds of the molecule: it is evaluated on all atoms
+    expected = block_pair_id(mol=load_mol.copy(frames=np.arange(300)), block_size=10)
+    matrix = block_pair_id(topology=TOPO_PATH, trajectory=TRAJ_PATH, sele="protein and name CA", frames=slice(0, 300), block_size=10)
+    np.testing.assert_allclose(matrix, expected)
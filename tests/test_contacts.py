@@ -0,0 +1,66 @@
+from md_intrinsic_dimension import contact_map, contact_distances, intrinsic_dimension
+from md_intrinsic_dimension.compute_projections import compute_projections
+from md_intrinsic_dimension.kernels import pair_distances
+from scipy.spatial.distance import pdist
+import numpy as np
+import pytest
+
+
+@pytest.fixture(scope="module")
+def dense_contacts(load_mol):
+    ca = load_mol.atomselect("name CA", indexes=True)
+    i, j = np.triu_indices(len(ca), k=1)
+    pairs = np.column_stack((ca[i], ca[j]))
+    return pair_distances(load_mol.coords, pairs) <= 8, pairs
+
+
+def test_contact_map(load_mol, dense_contacts):
+    dense, all_pairs = dense_contacts
+    packed, pairs = contact_map(load_mol, sample=None)
+    ever = dense.any(axis=0)
+    assert np.array_equal(pairs, all_pairs[ever])
+    assert np.array_equal(np.unpackbits(packed, axis=1, count=len(pairs)), dense[:, ever])
+
+
+def test_contacts_projection(load_mol, dense_contacts):
+    # the projection is exact: a pair in contact in a single frame is kept
+    dense, _ = dense_contacts
+    projection = compute_projections(load_mol, "Distances", metric="contacts")
+    assert np.array_equal(projection, dense[:, dense.any(axis=0)])
+
+
+def test_sampled_frames(load_mol):
+    exact, exact_pairs = contact_map(load_mol, sample=None)
+    packed, pairs = contact_map(load_mol, sample=50, chunk_size=128)
+    assert np.array_equal(pairs, exact_pairs)
+    assert np.array_equal(packed, exact)
+
+
+def test_contact_distances(load_mol, dense_contacts, tmp_path):
+    dense, _ = dense_contacts
+    packed, _ = contact_map(load_mol)
+    expected = pdist(dense.astype(float))
+    assert np.allclose(contact_distances(packed, block_size=64, chunk_bytes=8), expected)
+    contact_distances(packed, filename=str(tmp_path / "contacts.npy"))
+    assert np.allclose(np.load(tmp_path / "contacts.npy"), expected)
+
+
+def test_id_from_contacts(load_mol, dense_contacts):
+    # binary frames have many tied neighbours, so only neighbour distances are compared exactly
+    from md_intrinsic_dimension.distance_matrix import knn_from_distance_matrix
+    from skdim._commonfuncs import get_nn
+
+    packed, pairs = contact_map(load_mol)
+    matrix = contact_distances(packed)
+    projection = np.unpackbits(packed, axis=1, count=len(pairs)).astype(float)
+    assert np.allclose(knn_from_distance_matrix(matrix, 20)[0], get_nn(projection, 20)[0])
+    mean_all, _, _ = intrinsic_dimension(
+        distance_matrix=matrix, id_kwargs={"estimator": "MLE"}, verbose=False
+    )
+    expected, _, _ = intrinsic_dimension(
+        mol=load_mol,
+        projection_kwargs={"metric": "contacts"},
+        id_kwargs={"estimator": "MLE"},
+        verbose=False,
+    )
+    assert np.isclose(mean_all, expected, rtol=0.02)
@@ -0,0 +1,56 @@
+from md_intrinsic_dimension import intrinsic_dimension, pairwise_rmsd
+from md_intrinsic_dimension.compute_projections import compute_projections
+from scipy.spatial.distance import pdist, squareform
+import numpy as np
+import pytest
+from tests.conftest import REF_PATH
+
+ATOL = 0.1
+
+
+@pytest.fixture
+def dihedral_distances(load_mol):
+    return pdist(compute_projections(load_mol, "Dihedrals"))
+
+
+class TestPrecomputed:
+    @pytest.mark.parametrize("square", [False, True])
+    def test_local_matches_projection(self, dihedral_distances, square):
+        matrix = squareform(dihedral_distances) if square else dihedral_distances
+        lid, lid100, local_id = intrinsic_dimension(distance_matrix=matrix)
+        assert np.allclose(np.load(REF_PATH / "local.npy"), local_id, atol=ATOL)
+        assert np.allclose(np.load(REF_PATH / "mean_all.npy"), lid, atol=ATOL)
+        assert np.allclose(np.load(REF_PATH / "mean_last.npy"), lid100, atol=ATOL)
+
+    def test_global_matches_projection(self, dihedral_distances):
+        gid, gid100 = intrinsic_dimension(
+            distance_matrix=dihedral_distances, id_method="global"
+        )
+        assert np.allclose(np.load(REF_PATH / "global_all.npy"), gid, atol=ATOL)
+        assert np.allclose(np.load(REF_PATH / "global_last.npy"), gid100, atol=ATOL)
+
+    def test_unsupported_estimator(self, dihedral_distances):
+        with pytest.raises(ValueError, match="does not support precomputed"):
+            intrinsic_dimension(
+                distance_matrix=dihedral_distances, id_kwargs={"estimator": "lPCA"}
+            )
+
+
+class TestPairwiseRmsd:
+    def test_matches_alignment(self, load_mol):
+        rmsd = squareform(pairwise_rmsd(load_mol, block_size=64))
+        ref = load_mol.copy()
+        ref.dropFrames(keep=5)
+        aligned = load_mol.copy()
+        aligned.align("protein and name CA", refmol=ref)
+        sel = aligned.atomselect("protein and name CA")
+        diff = aligned.coords[sel] - ref.coords[sel]
+        expected = np.sqrt((diff**2).sum(axis=1).mean(axis=0))
+        assert np.allclose(expected, rmsd[5], atol=1e-4)
+
+    def test_memmap_output(self, load_mol, tmp_path):
+        filename = tmp_path / "rmsd.npy"
+        rmsd = pairwise_rmsd(load_mol, filename=filename, block_size=100, n_jobs=2)
+        assert np.array_equal(np.load(filename), rmsd)
+        gid, _ = intrinsic_dimension(distance_matrix=str(filename), id_method="global")
+        assert gid > 0
@@ -0,0 +1,39 @@
+from md_intrinsic_dimension import intrinsic_dimension
+from md_intrinsic_dimension.duplicates import unique_frames
+import numpy as np
+import pytest
+
+
+def test_unique_frames():
+    X = np.array([[0.0, 1.0], [2.0, 3.0], [0.0, 1.0], [-0.0, 1.0], [2.0, 3.05]])
+    keep, inverse = unique_frames(X)
+    assert keep.tolist() == [1, 3, 4]
+    assert np.array_equal(X[keep][inverse], X)
+
+    keep, inverse = unique_frames(X, tolerance=0.5)
+    assert keep.tolist() == [3, 4]
+    assert inverse.tolist() == [0, 1, 0, 0, 1]
+    # frames are snapped to a grid: close frames across a cell boundary are kept
+    keep, _ = unique_frames(np.array([[0.49], [0.51]]), tolerance=0.5)
+    assert keep.tolist() == [0, 1]
+
+    with pytest.raises(ValueError, match="tolerance must be >= 0"):
+        unique_frames(X, tolerance=-1)
+
+
+def test_duplicated_frames(load_mol):
+    kwargs = dict(projection_method="Dihedrals", verbose=False)
+    mean_all, mean_last, lid = intrinsic_dimension(mol=load_mol, **kwargs)
+
+    # a restart repeating frames 100-199 after the end of the trajectory
+    repeated = load_mol.copy(frames=np.r_[0:500, 100:200])
+    dup_all, dup_last, dup_lid = intrinsic_dimension(mol=repeated, duplicate_tolerance=0, **kwargs)
+    assert len(dup_lid) == 600
+    assert np.allclose(dup_lid[:500], lid)
+    assert np.array_equal(dup_lid[500:], dup_lid[100:200])
+    assert dup_last == pytest.approx(np.mean(lid[100:200]))
+
+    gid, _ = intrinsic_dimension(mol=load_mol, id_method="global", **kwargs)
+    dup_gid, dup_gid_last = intrinsic_dimension(mol=repeated, id_method="global", duplicate_tolerance=0, **kwargs)
+    assert dup_gid == pytest.approx(gid)
+    assert np.isfinite(dup_gid_last)
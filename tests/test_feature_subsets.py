@@ -0,0 +1,70 @@
+from md_intrinsic_dimension import feature_subset_shift, intrinsic_dimension
+from md_intrinsic_dimension.compute_projections import compute_projections
+from md_intrinsic_dimension.compute_id import compute_global
+from md_intrinsic_dimension.feature_subsets import sample_pairs, _pairs_from_codes
+import numpy as np
+import pytest
+
+
+@pytest.fixture(scope="module")
+def ca(load_mol):
+    return load_mol.atomselect("name CA", indexes=True)
+
+
+def test_pairs_from_codes():
+    i, j = np.triu_indices(37, k=1)
+    assert np.array_equal(_pairs_from_codes(np.arange(len(i)), 37), (i, j))
+
+
+@pytest.mark.parametrize("sampling", ["random", "bands", "farthest"])
+def test_budget(load_mol, ca, sampling):
+    pairs = sample_pairs(load_mol, ca, 300, sampling=sampling, seed=0)
+    assert 0 < len(pairs) <= 300
+    assert np.all(pairs[:, 0] < pairs[:, 1])
+    assert len(np.unique(pairs, axis=0)) == len(pairs)
+    projection = compute_projections(
+        load_mol, "Distances", max_features=300, sampling=sampling, seed=0
+    )
+    full = compute_projections(load_mol, "Distances")
+    i, j = np.triu_indices(len(ca), k=1)
+    columns = {(a, b): c for c, (a, b) in enumerate(zip(ca[i], ca[j]))}
+    expected = full[:, [columns[tuple(p)] for p in pairs]]
+    assert np.array_equal(projection, expected)
+
+
+def test_bands(load_mol, ca):
+    pairs = sample_pairs(load_mol, ca, 200, sampling="bands")
+    separations = np.unique(np.searchsorted(ca, pairs[:, 1]) - np.searchsorted(ca, pairs[:, 0]))
+    assert separations[0] == 1
+    assert len(pairs) == sum(len(ca) - s for s in separations)
+
+
+def test_seed(load_mol, ca):
+    first = sample_pairs(load_mol, ca, 100, seed=1)
+    assert np.array_equal(first, sample_pairs(load_mol, ca, 100, seed=1))
+    assert not np.array_equal(first, sample_pairs(load_mol, ca, 100, seed=2))
+
+
+def test_projection_kwargs(load_mol):
+    gid, _ = intrinsic_dimension(
+        mol=load_mol,
+        id_method="global",
+        projection_kwargs={"max_features": 100, "seed": 0},
+        verbose=False,
+    )
+    assert np.isfinite(gid)
+
+
+def test_invalid_sampling(load_mol, ca):
+    with pytest.raises(ValueError, match="Invalid pair sampling"):
+        sample_pairs(load_mol, ca, 100, sampling="wrong")
+
+
+def test_shift(load_mol):
+    results = feature_subset_shift(load_mol, 300, seed=0, sample=200)
+    assert list(results["sampling"]) == ["all pairs", "random", "bands", "farthest"]
+    assert results["features"][0] == 52 * 51 // 2
+    full = compute_projections(load_mol.copy(frames=np.unique(np.linspace(0, 499, 200).astype(int))), "Distances")
+    expected, _ = compute_global(full, last=200)
+    assert np.isclose(results["global ID"][0], expected, rtol=1e-4)
+    assert np.allclose(results["shift"], results["global ID"] - results["global ID"][0])
@@ -0,0 +1,59 @@
+from md_intrinsic_dimension import id_map, section_id
+from md_intrinsic_dimension.compute_id import compute_global
+from md_intrinsic_dimension.id_map import block_ids, time_blocks
+import importlib
+import numpy as np
+import pytest
+
+
+def test_time_blocks():
+    assert time_blocks(10, 4, 3) == [(0, 4), (3, 7), (6, 10)]
+    assert time_blocks(3, 4, 1) == []
+
+
+@pytest.mark.parametrize("estimator", ["TwoNN", "MLE", "lPCA"])
+def test_block_ids(estimator):
+    # overlapping blocks whose size is not a multiple of the stride
+    X = np.random.default_rng(0).normal(size=(300, 12))
+    blocks = time_blocks(len(X), 120, 45)
+    expected = [compute_global(X[start:stop], estimator=estimator)[0] for start, stop in blocks]
+    assert np.allclose(block_ids(X, blocks, estimator), expected)
+
+
+@pytest.mark.parametrize("block_size, block_stride", [(201, 50), (200, 33)])
+def test_block_ids_coprime(monkeypatch, block_size, block_stride):
+    # tiles follow the stride, not gcd(size, stride) = 1: few distance tiles are computed
+    id_map_module = importlib.import_module("md_intrinsic_dimension.id_map")
+    calls = []
+    tile = id_map_module._tile
+    monkeypatch.setattr(id_map_module, "_tile", lambda *args: calls.append(args) or tile(*args))
+    X = np.random.default_rng(0).normal(size=(600, 12))
+    blocks = time_blocks(len(X), block_size, block_stride)
+    expected = [compute_global(X[start:stop])[0] for start, stop in blocks]
+    assert np.allclose(block_ids(X, blocks), expected)
+    tiles_per_block = -(-block_size // block_stride)
+    assert len(calls) <= -(-len(X) // block_stride) * tiles_per_block
+    assert all(args[-1] == block_stride for args in calls)
+    calls.clear()
+    assert np.allclose(block_ids(X, [(0, 200), (7, 207)]), [compute_global(X[:200])[0], compute_global(X[7:207])[0]])
+    assert len(calls) == 2 #uneven blocks are computed one by one
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_id_map(load_mol, n_jobs):
+    ids, windows, blocks = id_map(mol=load_mol, window_size=10, stride=5, block_size=200, block_stride=100,
+                                  projection_method="Dihedrals", n_jobs=n_jobs)
+    assert ids.shape == (len(windows), len(blocks)) == (9, 4)
+    assert blocks.tolist() == [[0, 200], [100, 300], [200, 400], [300, 500]]
+    for j, (start, stop) in enumerate(blocks):
+        sections = section_id(mol=load_mol, window_size=10, stride=5, projection_method="Dihedrals", id_method="global",
+                              frames=slice(start, stop), verbose=False)
+        assert np.array_equal(sections[["start", "end"]].to_numpy(), windows)
+        assert np.allclose(sections["entire simulation"], ids[:, j])
+
+
+def test_id_map_errors(load_mol):
+    with pytest.raises(ValueError, match="fewer than block_size=600"):
+        id_map(mol=load_mol, block_size=600)
+    with pytest.raises(ValueError, match="must be > 1"):
+        id_map(mol=load_mol, window_size=1)
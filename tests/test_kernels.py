@@ -0,0 +1,156 @@
+from md_intrinsic_dimension import intrinsic_dimension, kernels
+from md_intrinsic_dimension.compute_projections import compute_projections
+from moleculekit.molecule import Molecule
+from moleculekit.projections.metriccoordinate import MetricCoordinate
+from moleculekit.projections.metricdihedral import MetricDihedral, Dihedral
+from skdim._commonfuncs import get_nn
+import numpy as np
+import pytest
+import skdim
+import subprocess
+import sys
+import textwrap
+from tests.conftest import TOPO_PATH, REF_PATH
+
+ATOL = 0.1
+
+BACKENDS = [
+    False,
+    pytest.param(
+        True,
+        marks=pytest.mark.skipif(
+            not kernels.NUMBA_AVAILABLE, reason="numba not installed"
+        ),
+    ),
+]
+
+
+@pytest.fixture(params=BACKENDS, ids=["numpy", "numba"])
+def backend(request, monkeypatch):
+    monkeypatch.setattr(kernels, "NUMBA_AVAILABLE", request.param)
+    return request.param
+
+
+@pytest.fixture(scope="module")
+def dihedrals(load_mol):
+    angles = Dihedral.proteinDihedrals(mol=load_mol, sel="protein", dih=("phi", "psi"))
+    return MetricDihedral(dih=angles, sincos=False, protsel="all").project(load_mol)
+
+
+def test_dihedrals(backend, load_mol, dihedrals):
+    projection = compute_projections(load_mol, "Dihedrals")
+    delta = (projection - dihedrals + 180) % 360 - 180
+    assert projection.dtype == np.float32
+    assert np.allclose(delta, 0, atol=1e-3)
+
+
+def test_dihedrals_sincos(backend, load_mol):
+    projection = compute_projections(load_mol, "Dihedrals", sincos=True)
+    angles = compute_projections(load_mol, "Dihedrals")
+    assert projection.shape == (500, 2 * angles.shape[1])
+    assert np.allclose(projection[:, 0::2], np.sin(np.deg2rad(angles)), atol=1e-5)
+
+
+def test_distances(backend, load_mol):
+    projection = compute_projections(load_mol, "Distances")
+    ca = load_mol.atomselect("name CA", indexes=True)
+    i, j = np.triu_indices(len(ca), k=1)
+    expected = np.linalg.norm(load_mol.coords[ca[i]] - load_mol.coords[ca[j]], axis=1).T
+    assert projection.shape == (500, len(ca) * (len(ca) - 1) // 2)
+    assert np.allclose(projection, expected, atol=1e-4)
+    contacts = compute_projections(load_mol, "Distances", metric="contacts")
+    in_contact = expected <= 8
+    assert np.array_equal(contacts, in_contact[:, in_contact.any(axis=0)])
+
+
+def test_distances_not_wrapped(backend, load_mol):
+    # as MetricDistance(sele, sele, periodic="selections"), which never wraps pairs within one selection
+    from moleculekit.projections.metricdistance import MetricDistance
+
+    mol = load_mol.copy(frames=np.arange(3))
+    ca = mol.atomselect("name CA", indexes=True)
+    mol.coords[ca[0], 0, :] += mol.box[0] #one atom moved to a periodic image
+    projection = compute_projections(mol, "Distances")
+    expected = MetricDistance("name CA", "name CA", periodic="selections").project(mol)
+    assert np.allclose(projection, expected, atol=1e-4)
+    assert np.all(projection[:, :len(ca) - 1] > mol.box[0][:, None] / 2) #longer than any minimum-image distance
+
+
+def test_twonn_pointwise(backend, dihedrals):
+    _, knn = get_nn(dihedrals, k=100)
+    expected = skdim.id.TwoNN().fit_transform_pw(dihedrals, precomputed_knn=knn)
+    assert np.allclose(kernels.twonn_pointwise(dihedrals, knn), expected, atol=1e-5)
+
+
+def test_mle_pointwise(backend, dihedrals):
+    dists, knn = get_nn(dihedrals, k=20)
+    expected = skdim.id.MLE().fit_transform_pw(
+        dihedrals, precomputed_knn_arrays=(dists, knn)
+    )
+    assert np.allclose(kernels.mle_pointwise(dists), expected)
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"atomsel": "protein and name CA", "refmol": Molecule(TOPO_PATH)},
+        {"atomsel": "protein", "trajalnsel": "name CA", "pbc": False},
+        {"atomsel": "name CA"},
+    ],
+)
+def test_coordinates(load_mol, kwargs):
+    expected = MetricCoordinate(**kwargs).project(load_mol)
+    projection = compute_projections(load_mol, "Coordinate", **kwargs)
+    assert projection.dtype == np.float32
+    assert np.allclose(projection, expected, atol=1e-3)
+    # aligning frames onto the first one in chunks that do not divide the trajectory
+    atoms = load_mol.atomselect(kwargs["atomsel"], indexes=True)
+    aligned = kernels.aligned_coordinates(load_mol.coords, atoms, atoms, load_mol.coords[atoms, :, 0], chunk_size=7)
+    assert np.allclose(aligned[0], load_mol.coords[atoms, :, 0].T.ravel(), atol=1e-3)
+    with pytest.raises(RuntimeError, match="Cannot align"):
+        compute_projections(load_mol, "Coordinate", atomsel="name CA", refmol=load_mol, refalnsel="protein")
+
+
+def test_reference_local(backend, load_mol):
+    mean_all, mean_last, local_id = intrinsic_dimension(
+        mol=load_mol, projection_method="Dihedrals", verbose=False
+    )
+    assert np.allclose(np.load(REF_PATH / "local.npy"), local_id, atol=ATOL)
+    assert np.allclose(np.load(REF_PATH / "mean_all.npy"), mean_all, atol=ATOL)
+    assert np.allclose(np.load(REF_PATH / "mean_last.npy"), mean_last, atol=ATOL)
+
+
+def test_unsupported_settings_use_skdim():
+    # non-default settings fall back to skdim
+    from md_intrinsic_dimension.compute_id import _pointwise_kernel
+
+    assert _pointwise_kernel(skdim.id.MLE(dnoise="dnoiseGaussH")) is None
+    assert _pointwise_kernel(skdim.id.TwoNN(dist=True)) is None
+    assert _pointwise_kernel(skdim.id.TwoNN()) is not None
+
+
+# numba kernels first run on worker threads: the pool must be started from the main thread,
+# otherwise the interpreter hangs at exit with the TBB threading layer
+WORKER_THREADS = {
+    "pool": """
+        from md_intrinsic_dimension.scan import iter_windows
+        list(iter_windows(range(4), lambda _: kernels.pair_distances(coords, pairs), n_jobs=2))
+    """,
+    "timeout": """
+        from md_intrinsic_dimension.scan import iter_windows
+        list(iter_windows(range(2), lambda _: kernels.pair_distances(coords, pairs), window_timeout=60))
+    """,
+}
+
+
+@pytest.mark.skipif(not kernels.NUMBA_AVAILABLE, reason="numba not installed")
+@pytest.mark.parametrize("code", WORKER_THREADS.values(), ids=WORKER_THREADS.keys())
+def test_exit_after_worker_threads(code):
+    script = textwrap.dedent("""
+        import numpy as np
+        from md_intrinsic_dimension import kernels
+        coords = np.random.default_rng(0).normal(size=(20, 3, 50)).astype(np.float32)
+        pairs = np.array([[0, 1], [2, 3]])
+    """) + textwrap.dedent(code)
+    completed = subprocess.run([sys.executable, "-c", script], timeout=120)
+    assert completed.returncode == 0
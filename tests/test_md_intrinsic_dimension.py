@@ -1,6 +1,7 @@
 from md_intrinsic_dimension import intrinsic_dimension
 from moleculekit.molecule import Molecule
 from moleculekit.projections.metriccoordinate import MetricCoordinate
+import importlib
 import numpy as np
 import pytest
 from tests.conftest import TOPO_PATH, TRAJ_PATH, REF_PATH
@@ -8,13 +9,6 @@ from tests.conftest import TOPO_PATH, TRAJ_PATH, REF_PATH
 ATOL = 0.1
 
 
-@pytest.fixture
-def load_mol():
-    mole = Molecule(TOPO_PATH)
-    mole.read(TRAJ_PATH)
-    return mole
-
-
 @pytest.fixture
 def load_dih_local_ID():
     return np.load(REF_PATH / "local.npy")
@@ -172,3 +166,155 @@ class TestID:
                 projection_method="Dihedrals",
                 id_method="NotCorrectMethod",
             )
+
+
+class TestFrames:
+    def test_slice_from_files(self, load_mol):
+        expected = intrinsic_dimension(
+            mol=load_mol.copy(frames=np.arange(0, 500, 2)),
+            projection_method="Dihedrals",
+            id_method="global",
+        )
+        gid, gid100 = intrinsic_dimension(
+            topology=TOPO_PATH,
+            trajectory=TRAJ_PATH,
+            projection_method="Dihedrals",
+            id_method="global",
+            frames=slice(None, None, 2),
+        )
+        assert np.allclose(expected, (gid, gid100))
+
+    def test_index_array_on_mol(self, load_mol):
+        last = np.arange(-300, 0)
+        gid, _ = intrinsic_dimension(
+            mol=load_mol, projection_method="Dihedrals", id_method="global", frames=last
+        )
+        _, gid100 = intrinsic_dimension(
+            mol=load_mol,
+            projection_method="Dihedrals",
+            id_method="global",
+            id_kwargs={"last": 300},
+        )
+        assert np.isclose(gid, gid100)
+
+    def test_out_of_range(self):
+        with pytest.raises(ValueError, match="Frame selection out of range"):
+            intrinsic_dimension(
+                topology=TOPO_PATH,
+                trajectory=TRAJ_PATH,
+                projection_method="Dihedrals",
+                frames=[0, 1000],
+            )
+
+
+class TestAtoms:
+    def test_projection_atoms(self):
+        from md_intrinsic_dimension.compute_projections import projection_atoms
+
+        assert projection_atoms("Distances") == "name CA"
+        assert projection_atoms("Distances", {"sele": "name CB"}) == "name CB"
+        assert projection_atoms("Dihedrals") == "protein"
+        assert projection_atoms("Coordinate", {"atomsel": "name CA"}) is None #wrapping uses all atoms
+        assert projection_atoms("Coordinate", {"atomsel": "name CA", "trajalnsel": "name N", "pbc": False}) == "(name CA) or (name N) or (name N)"
+        assert projection_atoms("Coordinate", {"atomsel": "name CA", "refmol": object(), "pbc": False}) is None #protein and name CA
+        assert projection_atoms("Distances", {"sele": "index 1 5 9"}) is None
+        assert projection_atoms("Distances", {"sele": "name CA and within 8 of resid 10"}) is None
+        assert projection_atoms("Rmsd") is None
+        assert projection_atoms(np.zeros((3, 2))) is None
+
+    def test_load_selected_atoms(self, load_mol):
+        from md_intrinsic_dimension.load_trajectory import load_molecule
+
+        ca = load_mol.atomselect("name CA")
+        for frames in (None, [5, 1, -1]):
+            mol = load_molecule(TOPO_PATH, TRAJ_PATH, frames=frames, atoms="name CA", chunk_size=64)
+            indexes = slice(None) if frames is None else [5, 1, 499]
+            assert mol.numAtoms == ca.sum()
+            assert np.array_equal(mol.coords, load_mol.coords[ca][:, :, indexes])
+            assert np.array_equal(mol.time, load_mol.time[indexes])
+            assert [f[1] for f in mol.fileloc] == list(np.arange(500)[indexes])
+        assert load_molecule(mol=load_mol, atoms="name CA").numAtoms == ca.sum()
+        with pytest.raises(ValueError, match="contains no atoms"):
+            load_molecule(TOPO_PATH, TRAJ_PATH, atoms="resname XYZ")
+
+    @pytest.mark.parametrize("projection_method", ["Distances", "Dihedrals"])
+    def test_same_id(self, load_mol, projection_method):
+        expected = intrinsic_dimension(mol=load_mol, projection_method=projection_method, id_method="global")
+        gid = intrinsic_dimension(topology=TOPO_PATH, trajectory=TRAJ_PATH, projection_method=projection_method, id_method="global")
+        assert np.allclose(expected, gid)
+
+    @pytest.mark.parametrize("sele", ["index", "protein and name CA", "name CA and within 8 of resid 10"])
+    def test_context_selection(self, load_mol, sele):
+        # selections depending on other atoms are evaluated on the full molecule, whatever the input
+        if sele == "index":
+            sele = "index " + " ".join(map(str, load_mol.atomselect("name CA", indexes=True)))
+        kwargs = dict(projection_method="Distances", projection_kwargs={"sele": sele}, id_method="global")
+        expected = intrinsic_dimension(mol=load_mol, **kwargs)
+        frames = slice(0, 500, 2)
+        assert np.allclose(expected, intrinsic_dimension(topology=TOPO_PATH, trajectory=TRAJ_PATH, **kwargs))
+        assert np.allclose(
+            intrinsic_dimension(mol=load_mol, frames=frames, **kwargs),
+            intrinsic_dimension(mol=load_mol.copy(frames=np.arange(500)[frames]), **kwargs),
+        )
+
+
+class TestPooled:
+    def test_replica_mols(self, load_mol, load_dih_local_ID):
+        halves = [load_mol.copy(frames=np.arange(250)), load_mol.copy(frames=np.arange(250, 500))]
+        results = intrinsic_dimension(mol=halves, projection_method="Dihedrals")
+        assert list(results["replica"]) == ["pooled", 0, 1]
+        assert list(results["frames"]) == [500, 250, 250]
+        assert np.allclose(load_dih_local_ID, results["instantaneous"][0], atol=ATOL)
+        _, _, second = intrinsic_dimension(
+            mol=halves[1], projection_method="Dihedrals", verbose=False
+        )
+        assert np.allclose(second, results["instantaneous"][2])
+
+    def test_replica_files_buffer(self, tmp_path):
+        from md_intrinsic_dimension.pooled import project_replicas
+        from md_intrinsic_dimension.compute_projections import compute_projections
+
+        projection, bounds = project_replicas(
+            lambda m: compute_projections(m, "Dihedrals"),
+            topology=TOPO_PATH,
+            trajectories=[TRAJ_PATH, TRAJ_PATH],
+            frames=slice(None, None, 5),
+            filename=str(tmp_path / "pooled.npy"),
+        )
+        assert bounds == [(0, 100), (100, 200)]
+        pooled = np.load(tmp_path / "pooled.npy")
+        assert pooled.shape[0] == 200
+        assert np.array_equal(pooled[:100], pooled[100:])
+
+    def test_replica_mols_global(self, load_mol):
+        halves = [load_mol.copy(frames=np.arange(250)), load_mol.copy(frames=np.arange(250, 500))]
+        results = intrinsic_dimension(
+            mol=halves, projection_method="Dihedrals", id_method="global"
+        )
+        expected = intrinsic_dimension(
+            mol=load_mol, projection_method="Dihedrals", id_method="global"
+        )
+        assert np.isclose(expected[0], results["entire simulation"][0])
+        assert np.isclose(expected[1], results["last simulation"][2])
+
+    def test_pooled_global_fits(self, monkeypatch):
+        # pooled set and pooled tails fitted once each, replicas twice each
+        import skdim
+        from md_intrinsic_dimension.pooled import pooled_id
+
+        fit_transform = skdim.id.TwoNN.fit_transform
+        sizes = []
+        def counted(self, X, *args, **kwargs):
+            sizes.append(len(X))
+            return fit_transform(self, X, *args, **kwargs)
+        monkeypatch.setattr(skdim.id.TwoNN, "fit_transform", counted)
+        projection = np.random.default_rng(0).normal(size=(300, 5))
+        pooled_id(projection, [(0, 150), (150, 300)], id_method="global", last=100)
+        assert sizes == [300, 200, 150, 100, 150, 100]
+
+    def test_replica_wrong_method(self, monkeypatch):
+        # checked before any replica is loaded
+        pooled = importlib.import_module("md_intrinsic_dimension.pooled")
+        monkeypatch.setattr(pooled, "load_molecule", lambda *args: pytest.fail("replica loaded"))
+        with pytest.raises(TypeError, match='id_method must be "local" or "global"'):
+            intrinsic_dimension(topology=TOPO_PATH, trajectory=[TRAJ_PATH, TRAJ_PATH], projection_method="Dihedrals", id_method="multiscale")
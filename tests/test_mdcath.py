@@ -0,0 +1,48 @@
+from md_intrinsic_dimension import intrinsic_dimension, section_id, read_mdcath, iter_mdcath
+import numpy as np
+import pandas as pd
+import pytest
+from tests.conftest import TOPO_PATH, REF_PATH
+
+h5py = pytest.importorskip("h5py")
+
+
+@pytest.fixture
+def mdcath_file(load_mol, tmp_path):
+    # same layout as the mdCATH dataset: domain/temperature/replica/coords, in Angstrom
+    filename = tmp_path / "mdcath_dataset_2hbaA00.h5"
+    coords = np.transpose(load_mol.coords, (2, 0, 1))
+    with h5py.File(filename, "w") as f:
+        domain = f.create_group("2hbaA00")
+        domain.create_dataset("pdbProteinAtoms", data=open(TOPO_PATH).read())
+        for temp in ("320", "348"):
+            for rep in ("0", "1"):
+                domain.create_dataset(f"{temp}/{rep}/coords", data=coords, chunks=(50, coords.shape[1], 3))
+    return filename
+
+
+def test_read_matches_xtc(load_mol, mdcath_file):
+    mol = read_mdcath(mdcath_file, 320, 0, chunk_size=64)
+    assert mol.numFrames == load_mol.numFrames
+    assert np.array_equal(mol.coords, load_mol.coords)
+    _, _, local_id = intrinsic_dimension(mol=mol, projection_method="Dihedrals")
+    assert np.allclose(np.load(REF_PATH / "local.npy"), local_id, atol=0.1)
+
+
+def test_read_frames(load_mol, mdcath_file):
+    mol = read_mdcath(mdcath_file, 348, 1, frames=[5, 3, 3, 400], chunk_size=2)
+    assert np.array_equal(mol.coords, load_mol.coords[:, :, [5, 3, 3, 400]])
+
+
+def test_iter_section(mdcath_file):
+    runs = list(iter_mdcath(mdcath_file, temperatures=[320]))
+    assert [(t, r) for t, r, _ in runs] == [("320", "0"), ("320", "1")]
+    sections = section_id(mol=runs[1][2], projection_method="Dihedrals", id_method="global")
+    pd.testing.assert_frame_equal(
+        pd.read_pickle(REF_PATH / "section_id.pkl"), sections, rtol=1e-5, atol=1e-8
+    )
+
+
+def test_missing_replica(mdcath_file):
+    with pytest.raises(KeyError, match="replica 7 not found"):
+        read_mdcath(mdcath_file, 320, 7)
@@ -0,0 +1,64 @@
+from md_intrinsic_dimension import intrinsic_dimension
+from md_intrinsic_dimension.multiscale import multiscale_id, gride_id
+from md_intrinsic_dimension.compute_id import nearest_neighbors
+from moleculekit.molecule import Molecule
+from scipy.spatial.distance import pdist
+import numpy as np
+import pandas as pd
+import pytest
+from tests.conftest import TOPO_PATH, TRAJ_PATH
+
+
+@pytest.fixture(scope="module")
+def plane():
+    # 5-dimensional data linearly embedded in 40 features
+    rng = np.random.default_rng(0)
+    return rng.normal(size=(3000, 5)) @ rng.normal(size=(5, 40))
+
+
+def test_gride(plane):
+    dists, _ = nearest_neighbors(plane, 8)
+    log_mu = np.log(dists[:, 1] / dists[:, 0])
+    assert gride_id(dists, 1) == pytest.approx(len(dists) / log_mu.sum())
+    assert gride_id(dists, 2) == pytest.approx(5, abs=0.5)
+    assert gride_id(dists, 2, 3) == pytest.approx(5, abs=0.5)
+    with pytest.raises(ValueError, match="Ranks must satisfy"):
+        gride_id(dists, 8)
+
+
+@pytest.mark.parametrize("method", ["gride", "decimation"])
+def test_curve(plane, method):
+    # every scale of the default curve is unbiased
+    curve = multiscale_id(plane, method=method, seed=0)
+    assert len(curve) == (6 if method == "gride" else 4)
+    assert curve["scale"].is_monotonic_increasing
+    assert np.allclose(curve["ID"], 5, atol=0.4)
+    parallel = multiscale_id(plane, method=method, seed=0, n_jobs=3)
+    pd.testing.assert_frame_equal(curve, parallel)
+    if method == "decimation":
+        assert list(curve["decimation"]) == [1, 2, 4, 8]
+        assert (curve["coverage"] > 0.99).all()
+
+
+def test_low_coverage(plane):
+    curve = multiscale_id(plane, method="decimation", ranks=[8, 32], seed=0)
+    assert curve["coverage"][1] < 0.9
+    assert np.isfinite(curve["ID"][0]) and np.isnan(curve["ID"][1])
+
+
+def test_precomputed(plane):
+    curve = multiscale_id(plane[:500], max_rank=16)
+    precomputed = multiscale_id(pdist(plane[:500]), max_rank=16, precomputed=True)
+    assert np.allclose(curve["ID"], precomputed["ID"])
+    with pytest.raises(ValueError, match="max_rank must be between"):
+        multiscale_id(plane[:10], max_rank=16)
+    with pytest.raises(ValueError, match="Invalid multiscale method"):
+        multiscale_id(plane, method="other")
+
+
+def test_intrinsic_dimension():
+    mol = Molecule(TOPO_PATH)
+    mol.read(TRAJ_PATH)
+    curve = intrinsic_dimension(mol=mol, projection_method="Dihedrals", id_method="multiscale", id_kwargs={"max_rank": 16})
+    assert list(curve["n1"]) == [1, 2, 4, 8]
+    assert curve["ID"].notna().all()
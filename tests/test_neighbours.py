@@ -0,0 +1,49 @@
+from md_intrinsic_dimension.compute_id import compute_local, nearest_neighbors
+from md_intrinsic_dimension.neighbours import blocked_knn, extend_knn, BLOCKED_KNN_FEATURES
+from skdim._commonfuncs import get_nn
+import numpy as np
+import pytest
+import skdim
+
+
+@pytest.fixture(scope="module")
+def wide():
+    rng = np.random.default_rng(0)
+    return rng.normal(size=(300, BLOCKED_KNN_FEATURES))
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2, -1])
+def test_blocked_knn(wide, n_jobs):
+    # tiles smaller than the data, not aligned with it
+    dists, inds = blocked_knn(wide, 20, row_block=64, col_block=70, n_jobs=n_jobs)
+    expected_dists, expected_inds = get_nn(wide, 20)
+    assert np.array_equal(inds, expected_inds)
+    assert np.allclose(dists, expected_dists)
+
+
+def test_blocked_knn_float32(wide):
+    dists, inds = blocked_knn(wide.astype(np.float32), 10, row_block=100)
+    expected_dists, _ = get_nn(wide.astype(np.float32), 10)
+    assert np.allclose(dists, expected_dists, rtol=1e-5)
+    with pytest.raises(ValueError, match="k must be between 1 and 299"):
+        blocked_knn(wide, 300)
+    with pytest.raises(ValueError, match="n_jobs must be -1 or >= 1"):
+        blocked_knn(wide, 10, n_jobs=0)
+
+
+def test_compute_local(wide):
+    assert np.array_equal(nearest_neighbors(wide, 5)[1], blocked_knn(wide, 5)[1])
+    _, _, lid = compute_local(wide, estimator="lPCA")
+    expected = skdim.id.lPCA().fit_transform_pw(wide, smooth=True)[1]
+    assert np.allclose(lid, expected)
+
+
+def test_extend_knn(wide):
+    dists, inds = extend_knn(wide[:50], 20)
+    dists, inds = extend_knn(wide[:180], 20, dists, inds, row_block=64, col_block=70)
+    dists, inds = extend_knn(wide, 20, dists, inds)
+    expected_dists, expected_inds = get_nn(wide, 20)
+    assert np.array_equal(inds, expected_inds)
+    assert np.allclose(dists, expected_dists)
+    with pytest.raises(ValueError, match="k must be between 1 and 19"):
+        extend_knn(wide[:20], 20)
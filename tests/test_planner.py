@@ -0,0 +1,77 @@
+from md_intrinsic_dimension import intrinsic_dimension, planner
+from moleculekit.molecule import Molecule
+from tests.conftest import TOPO_PATH, TRAJ_PATH
+import json
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    return tmp_path
+
+
+def test_calibration_is_cached(cache_dir, monkeypatch):
+    model = planner.calibrate(("TwoNN", "MLE"))
+    assert model["knn"] > 0 and model["twonn_kernel"] > 0
+    assert model["estimators"]["MLE"]["local"]
+    assert not model["estimators"]["TwoNN"]["local"]
+    with open(planner.cache_path()) as f:
+        assert planner._machine() in json.load(f)
+
+    # a second call must not time anything
+    monkeypatch.setattr(planner, "_timed", lambda *args, **kwargs: pytest.fail("recalibrated"))
+    assert planner.calibrate(("TwoNN",)) == model
+
+
+def test_cost_scaling(cache_dir):
+    small = planner.estimate_cost(1000, 50, "TwoNN", "local")
+    large = planner.estimate_cost(4000, 50, "TwoNN", "local")
+    assert large["time"] > small["time"]
+    assert large["memory"] > small["memory"]
+    double = planner.estimate_cost(1000, 50, "TwoNN", "local", dtype=np.float64)
+    assert double["memory"] - small["memory"] == 1000 * 50 * 4
+
+
+def test_plan_casts_to_float32(cache_dir):
+    cost = planner.estimate_cost(1000, 500, "TwoNN", "global", dtype=np.float32)
+    plan = planner.plan_estimation(1000, 500, "TwoNN", "global", dtype=np.float64, memory_budget=cost["memory"] + 1)
+    assert plan["dtype"] == np.float32
+    assert plan["within_budget"]
+
+
+def test_budget(cache_dir):
+    mol = Molecule(TOPO_PATH)
+    mol.read(TRAJ_PATH)
+    kwargs = dict(mol=mol, projection_method="Dihedrals", verbose=False)
+    reference = intrinsic_dimension(id_method="global", **kwargs)
+    assert intrinsic_dimension(id_method="global", budget="auto", **kwargs) == pytest.approx(reference)
+
+    with pytest.raises(RuntimeError, match="over the budget"):
+        intrinsic_dimension(budget={"memory": 1, "action": "raise"}, **kwargs)
+    with pytest.warns(UserWarning, match="over the budget"):
+        intrinsic_dimension(id_method="global", budget={"time": 0}, **kwargs)
+    with pytest.raises(ValueError, match="Invalid budget action"):
+        intrinsic_dimension(budget={"action": "abort"}, **kwargs)
+
+
+def test_downcast_releases(cache_dir):
+    from md_intrinsic_dimension.md_intrinsic_dimension import _apply_budget
+
+    X = np.random.default_rng(0).normal(size=(300, 7))
+    memory = planner.estimate_cost(*X.shape, "TwoNN", "global", dtype=np.float32)["memory"] + 1
+    cast, _ = _apply_budget(X, "global", "TwoNN", 100, {}, {"memory": memory})
+    assert cast.dtype == np.float32 and np.array_equal(cast, X.astype(np.float32))
+    assert cast.base is None and cast.nbytes == X.size * 4 #own buffer, no view into the float64 one
+
+    # the user's array is cast to a copy, and left untouched
+    mol = Molecule(TOPO_PATH)
+    mol.read(TRAJ_PATH)
+    X = np.random.default_rng(1).normal(size=(mol.numFrames, 20))
+    original = X.copy()
+    memory = planner.estimate_cost(*X.shape, "TwoNN", "global", dtype=np.float32)["memory"] + 1
+    kwargs = dict(mol=mol, id_method="global", verbose=False)
+    gid = intrinsic_dimension(projection_method=X, budget={"memory": memory}, **kwargs)
+    assert np.array_equal(X, original)
+    assert gid == pytest.approx(intrinsic_dimension(projection_method=original.astype(np.float32), **kwargs))
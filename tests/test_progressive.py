@@ -0,0 +1,49 @@
+from md_intrinsic_dimension import intrinsic_dimension
+from md_intrinsic_dimension.compute_projections import compute_projections
+import numpy as np
+import pandas as pd
+import pytest
+from tests.conftest import TOPO_PATH, TRAJ_PATH
+
+
+@pytest.mark.parametrize("estimator", ["TwoNN", "MLE", "lPCA"])
+def test_progressive_all_frames(load_mol, estimator):
+    # a zero tolerance never converges, so all frames are read and the last estimate is the usual global ID
+    id_kwargs = {"estimator": estimator}
+    gid, n_frames, trace = intrinsic_dimension(mol=load_mol, projection_method="Dihedrals", id_method="global", id_kwargs=id_kwargs,
+                                               progressive={"chunk_size": 150, "tolerance": 0.0}, verbose=False)
+    expected, _ = intrinsic_dimension(mol=load_mol, projection_method="Dihedrals", id_method="global", id_kwargs=id_kwargs, verbose=False)
+    assert n_frames == 500
+    assert gid == pytest.approx(expected, rel=1e-6)
+    assert trace["frames"].tolist() == [150, 300, 450, 500]
+    assert np.isnan(trace["change"].iloc[0])
+
+
+def test_progressive_early_stop(load_mol):
+    gid, n_frames, trace = intrinsic_dimension(TOPO_PATH, TRAJ_PATH, id_method="global", frames=slice(0, 400),
+                                               progressive={"chunk_size": 50, "tolerance": 0.5, "patience": 2}, verbose=False)
+    assert n_frames == 150
+    assert trace["frames"].tolist() == [50, 100, 150]
+    assert (trace["change"].iloc[1:] <= 0.5).all()
+    assert gid == trace["global ID"].iloc[-1]
+
+    # a projection array is consumed by rows
+    progressive = {"chunk_size": 100, "tolerance": 0.0}
+    projection = compute_projections(load_mol, "Dihedrals")
+    from_array = intrinsic_dimension(mol=load_mol, projection_method=projection, id_method="global", progressive=progressive, verbose=False)
+    from_mol = intrinsic_dimension(mol=load_mol, projection_method="Dihedrals", id_method="global", progressive=progressive, verbose=False)
+    assert from_array[:2] == from_mol[:2]
+    pd.testing.assert_frame_equal(from_array[2], from_mol[2])
+
+
+def test_progressive_errors(load_mol):
+    with pytest.raises(ValueError, match='requires id_method "global"'):
+        intrinsic_dimension(mol=load_mol, progressive={}, verbose=False)
+    with pytest.raises(ValueError, match="cannot be combined"):
+        intrinsic_dimension(mol=load_mol, id_method="global", progressive={}, duplicate_tolerance=0, verbose=False)
+    with pytest.raises(ValueError, match="contacts"):
+        intrinsic_dimension(mol=load_mol, id_method="global", projection_kwargs={"metric": "contacts"}, progressive={}, verbose=False)
+    with pytest.raises(ValueError, match="patience must be >= 1"):
+        intrinsic_dimension(mol=load_mol, id_method="global", progressive={"patience": 0}, verbose=False)
+    with pytest.raises(ValueError, match="At least 3 frames"):
+        intrinsic_dimension(mol=load_mol, id_method="global", frames=[0, 1], progressive={}, verbose=False)
@@ -0,0 +1,55 @@
+from md_intrinsic_dimension import intrinsic_dimension, reduce_projection
+from md_intrinsic_dimension.compute_projections import compute_projections
+from moleculekit.molecule import Molecule
+from sklearn.decomposition import PCA
+import numpy as np
+import pytest
+from tests.conftest import TOPO_PATH, TRAJ_PATH
+
+
+@pytest.fixture
+def load_projection():
+    mole = Molecule(TOPO_PATH)
+    mole.read(TRAJ_PATH)
+    return compute_projections(mole, "Dihedrals", sincos=True)
+
+
+class TestReduction:
+    def test_incremental_matches_pca(self, load_projection):
+        # with a single chunk incremental PCA is exact
+        reduced = reduce_projection(load_projection, n_components=5)
+        expected = PCA(5).fit_transform(load_projection)
+        assert np.allclose(np.abs(expected), np.abs(reduced), atol=1e-4)
+
+    def test_variance(self, load_projection):
+        few = reduce_projection(load_projection, method="randomized", variance=0.5, random_state=0)
+        many = reduce_projection(load_projection, method="randomized", variance=0.9, random_state=0)
+        assert 1 <= few.shape[1] < many.shape[1]
+
+    def test_tica(self, load_projection):
+        reduced = reduce_projection(load_projection, method="tica", lag=5, n_components=10, chunk_size=200)
+        assert reduced.shape == (len(load_projection), 10)
+        # TICA components are decorrelated with unit variance
+        assert np.allclose(np.cov(reduced.T, bias=True), np.eye(10), atol=0.05)
+
+    def test_wrong_method(self, load_projection):
+        with pytest.raises(ValueError, match="Invalid reduction method"):
+            reduce_projection(load_projection, method="umap")
+
+    def test_too_many_components(self, load_projection):
+        with pytest.raises(ValueError, match="exceeds chunk_size=50"):
+            reduce_projection(load_projection, n_components=60, chunk_size=50)
+        with pytest.raises(ValueError, match="exceeds the number of features"):
+            reduce_projection(load_projection, n_components=load_projection.shape[1] + 1)
+        reduced = reduce_projection(load_projection, method="randomized", n_components=60, chunk_size=50, random_state=0)
+        assert reduced.shape[1] == 60
+
+
+def test_intrinsic_dimension_reduction(load_projection):
+    gid, _ = intrinsic_dimension(
+        mol=Molecule(TOPO_PATH),
+        projection_method=load_projection,
+        id_method="global",
+        reduction_kwargs={"method": "pca", "n_components": 20, "chunk_size": 200},
+    )
+    assert 1 < gid < 20
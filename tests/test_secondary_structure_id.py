@@ -1,4 +1,4 @@
-from md_intrinsic_dimension import secondary_structure_id
+from md_intrinsic_dimension import secondary_structure_id, iter_secondary_structure_id, read_scan
 from moleculekit.molecule import Molecule
 import numpy as np
 import pandas as pd
@@ -6,13 +6,6 @@ import pytest
 from tests.conftest import TOPO_PATH, TRAJ_PATH, REF_PATH
 
 
-@pytest.fixture
-def load_mol():  # once established, avoid multiple loadings
-    mole = Molecule(TOPO_PATH)
-    mole.read(TRAJ_PATH)
-    return mole
-
-
 @pytest.fixture
 def load_mol_ref():  # once established, avoid multiple loadings
     mole = Molecule(TOPO_PATH)
@@ -123,3 +116,14 @@ class TestSecondaryStructure:
             secondary_structure_id(
                 mol=load_mol, mol_ref=load_mol, projection_method="Dihedrals"
             )
+
+    def test_iterator(self, load_mol, load_mol_ref, tmp_path):
+        kwargs = dict(mol=load_mol, mol_ref=load_mol_ref, projection_method="Dihedrals", id_method="global")
+        expected, _ = secondary_structure_id(**kwargs)
+        sink = tmp_path / "segments.jsonl"
+        rows = pd.DataFrame(list(iter_secondary_structure_id(n_jobs=2, sink=sink, **kwargs)))
+        rows = rows.sort_values("start", ignore_index=True)
+        pd.testing.assert_frame_equal(expected, rows)
+        stored = read_scan(sink).sort_values("start", ignore_index=True)
+        assert np.allclose(stored["entire simulation"], expected["entire simulation"])
+        assert all(np.array_equal(a, b) for a, b in zip(stored["window"], expected["window"]))
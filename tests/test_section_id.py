@@ -1,16 +1,17 @@
-from md_intrinsic_dimension import section_id
+from md_intrinsic_dimension import section_id, adaptive_section_id, iter_section_id, read_scan, WindowStore
 from moleculekit.molecule import Molecule
 import numpy as np
+import importlib
+import itertools
+import os
+import signal
+import threading
 import pandas as pd
 import pytest
 from tests.conftest import TOPO_PATH, TRAJ_PATH, REF_PATH
 
-
-@pytest.fixture
-def load_mol():
-    mole = Molecule(TOPO_PATH)
-    mole.read(TRAJ_PATH)
-    return mole
+# the package exports the function under the module's name
+section_id_module = importlib.import_module("md_intrinsic_dimension.section_id")
 
 
 @pytest.fixture
@@ -78,3 +79,183 @@ class TestSections:
     def test_wrong_method(self, load_mol):
         with pytest.raises(TypeError, match='id_method must be "local" or "global"'):
             section_id(mol=load_mol, projection_method="Dihedrals", id_method="Local")
+
+    def test_frames(self, load_mol):
+        expected = section_id(
+            mol=load_mol.copy(frames=np.arange(100, 500)),
+            projection_method="Dihedrals",
+            id_method="global",
+        )
+        sections = section_id(
+            topology=TOPO_PATH,
+            trajectory=TRAJ_PATH,
+            projection_method="Dihedrals",
+            id_method="global",
+            frames=slice(100, None),
+        )
+        pd.testing.assert_frame_equal(expected, sections)
+
+    def test_context_selection(self, load_mol):
+        # "protein" depends on the bonds of the molecule: it must be evaluated on all atoms
+        expected = section_id(mol=load_mol, projection_method="Distances", id_method="global", verbose=False)
+        sections = section_id(
+            mol=load_mol,
+            projection_method="Distances",
+            projection_kwargs={"sele": "protein and name CA"},
+            id_method="global",
+            verbose=False,
+        )
+        pd.testing.assert_frame_equal(expected, sections)
+
+
+class TestScanControl:
+    @pytest.fixture
+    def slow_window(self, monkeypatch):
+        # the third window hangs until the test ends, the others are computed as usual
+        window_id = section_id_module._window_id
+        started, release = threading.Event(), threading.Event()
+
+        def slow(window_mol, *args):
+            calls.append(None)
+            if len(calls) == 3:
+                started.set()
+                release.wait()
+            return window_id(window_mol, *args)
+
+        calls = []
+        monkeypatch.setattr(section_id_module, "_window_id", slow)
+        yield started
+        release.set()
+
+    def test_window_timeout(self, load_mol, load_section_ID, slow_window):
+        sections = section_id(
+            mol=load_mol,
+            projection_method="Dihedrals",
+            id_method="global",
+            window_timeout=1,
+        )
+        assert slow_window.is_set()
+        assert len(sections) == len(load_section_ID)
+        assert sections.attrs["timed out"] == [tuple(load_section_ID.loc[2, ["start", "end"]])]
+        assert np.isnan(sections.loc[2, "entire simulation"])
+        expected = load_section_ID.drop(index=2)
+        pd.testing.assert_frame_equal(expected, sections.drop(index=2), rtol=1e-5, atol=1e-8)
+
+    def test_cancel_from_thread(self, load_mol, load_section_ID, slow_window):
+        cancel = threading.Event()
+        threading.Thread(target=lambda: slow_window.wait() and cancel.set()).start()
+        sections = section_id(
+            mol=load_mol, projection_method="Dihedrals", id_method="global", cancel=cancel
+        )
+        assert sections.attrs["cancelled"]
+        assert len(sections) == 2
+        pd.testing.assert_frame_equal(load_section_ID.iloc[:2], sections, rtol=1e-5, atol=1e-8)
+
+    def test_cancel_signal(self, load_mol, slow_window):
+        threading.Thread(target=lambda: slow_window.wait() and os.kill(os.getpid(), signal.SIGUSR1)).start()
+        sections = section_id(
+            mol=load_mol,
+            projection_method="Dihedrals",
+            id_method="global",
+            cancel_signals=(signal.SIGUSR1,),
+        )
+        assert sections.attrs["cancelled"]
+        assert len(sections) == 2
+        assert signal.getsignal(signal.SIGUSR1) == signal.SIG_DFL
+
+    def test_abandoned_windows(self, monkeypatch):
+        # timed out windows go on in the background, a bounded number at a time
+        scan = importlib.import_module("md_intrinsic_dimension.scan")
+        monkeypatch.setattr(scan, "MAX_ABANDONED_WINDOWS", 2)
+        release = threading.Event()
+        running = []
+
+        def hang(window):
+            running.append(window)
+            release.wait()
+
+        results = scan.iter_windows(range(3), hang, window_timeout=0.05)
+        assert [status for _, status, _ in itertools.islice(results, 2)] == ["timed out"] * 2
+        blocked = threading.Thread(target=next, args=(results,))
+        blocked.start()
+        blocked.join(0.5)
+        assert blocked.is_alive() and running == [0, 1] #the third window waits for one of them to end
+        release.set()
+        blocked.join()
+        assert running == [0, 1, 2]
+
+
+class TestAdaptive:
+    def test_refined_windows(self, load_mol, load_section_ID):
+        kwargs = dict(projection_method="Dihedrals", id_method="global")
+        sections = adaptive_section_id(mol=load_mol, window_size=10, coarse_stride=5, **kwargs)
+        fine = sections[sections["resolution"] == "fine"].drop(columns="resolution")
+        coarse = sections[sections["resolution"] == "coarse"].drop(columns="resolution")
+        assert 0 < len(fine) < len(load_section_ID)
+        assert sections["start"].is_monotonic_increasing
+
+        # refined windows are computed as in a full scan
+        expected = load_section_ID.set_index("start").loc[fine["start"]].reset_index()
+        pd.testing.assert_frame_equal(expected, fine.reset_index(drop=True), rtol=1e-5, atol=1e-8)
+        # coarse ones on one frame every four, "last simulation" covering the last 100 frames
+        expected = section_id(mol=load_mol, frames=slice(None, None, 4), stride=5, id_kwargs={"last": 25}, **kwargs)
+        expected = expected.set_index("start").loc[coarse["start"]].reset_index()
+        pd.testing.assert_frame_equal(expected, coarse.reset_index(drop=True), rtol=1e-5, atol=1e-8)
+
+    def test_threshold(self, load_mol):
+        kwargs = dict(projection_method="Dihedrals", id_method="global", window_size=10, coarse_stride=5)
+        high = adaptive_section_id(mol=load_mol, threshold=1000, **kwargs)
+        assert (high["resolution"] == "coarse").all()
+        coarse = high["entire simulation"]
+        middle = adaptive_section_id(mol=load_mol, threshold=coarse.median(), **kwargs)
+        assert (middle["resolution"] == "fine").any()
+
+    def test_wrong_frame_step(self, load_mol):
+        with pytest.raises(ValueError, match="coarse_frame_step must be >= 1"):
+            adaptive_section_id(mol=load_mol, coarse_frame_step=0)
+
+
+class TestIterator:
+    def test_rows(self, load_mol, load_section_ID, tmp_path):
+        sink = tmp_path / "scan.jsonl"
+        rows = iter_section_id(mol=load_mol, projection_method="Dihedrals", id_method="global", n_jobs=2, sink=sink)
+        sections = pd.DataFrame(list(rows)).sort_values("start", ignore_index=True)
+        pd.testing.assert_frame_equal(load_section_ID, sections, rtol=1e-5, atol=1e-8)
+
+        stored = read_scan(sink).sort_values("start", ignore_index=True)
+        pd.testing.assert_frame_equal(load_section_ID.drop(columns="instantaneous"), stored.drop(columns="instantaneous"), rtol=1e-5, atol=1e-8)
+
+    def test_stop_early(self, load_mol, tmp_path):
+        sink = tmp_path / "scan.jsonl"
+        rows = iter_section_id(mol=load_mol, projection_method="Dihedrals", sink=sink)
+        first = next(rows)
+        rows.close()
+        stored = read_scan(sink)
+        assert len(stored) == 1
+        assert np.allclose(stored.loc[0, "instantaneous"], first["instantaneous"])
+
+
+class TestStore:
+    def test_incremental_scan(self, load_mol, load_section_ID, monkeypatch):
+        window_id = section_id_module._window_id
+        calls = []
+
+        def counted(window_mol, *args):
+            calls.append(None)
+            return window_id(window_mol, *args)
+
+        monkeypatch.setattr(section_id_module, "_window_id", counted)
+        store = WindowStore()
+        scan = dict(mol=load_mol, projection_method="Dihedrals", id_method="global", store=store, verbose=False)
+        coarse = section_id(stride=4, **scan)
+        assert len(calls) == len(coarse) == len(store)
+        sections = section_id(stride=2, **scan)
+        # only the windows not on the stride-4 grid are computed
+        assert len(calls) == len(sections)
+        pd.testing.assert_frame_equal(load_section_ID.iloc[::2].reset_index(drop=True), sections, rtol=1e-5, atol=1e-8)
+
+        section_id(stride=2, **dict(scan, id_kwargs={"estimator": "MLE"}))
+        assert len(calls) == 2 * len(sections)
+        assert store.invalidate(load_mol, windows=[tuple(sections.loc[0, ["start", "end"]])]) == 2
+        section_id(stride=2, **scan)
+        assert len(calls) == 2 * len(sections) + 1
@@ -0,0 +1,85 @@
+from md_intrinsic_dimension import IDSession, intrinsic_dimension
+from moleculekit.molecule import Molecule
+import numpy as np
+import pandas as pd
+import pytest
+from tests.conftest import TOPO_PATH, TRAJ_PATH, REF_PATH
+
+ATOL = 0.1
+
+
+@pytest.fixture(scope="module")
+def session():
+    with IDSession(topology=TOPO_PATH, trajectory=TRAJ_PATH, n_jobs=2) as s:
+        yield s
+
+
+def test_local(session):
+    _, _, local_id = session.intrinsic_dimension(projection_method="Dihedrals")
+    assert np.allclose(np.load(REF_PATH / "local.npy"), local_id, atol=ATOL)
+
+
+def test_global(session):
+    gid, gid_last = session.intrinsic_dimension(
+        projection_method="Dihedrals", id_method="global"
+    )
+    assert np.allclose(np.load(REF_PATH / "global_all.npy"), gid, atol=ATOL)
+    assert np.allclose(np.load(REF_PATH / "global_last.npy"), gid_last, atol=ATOL)
+
+
+def test_section_id(session):
+    sections = session.section_id(projection_method="Dihedrals", id_method="global")
+    pd.testing.assert_frame_equal(
+        pd.read_pickle(REF_PATH / "section_id.pkl"), sections, rtol=1e-5, atol=1e-8
+    )
+
+
+def test_secondary_structure_id(session):
+    structures, tables = session.secondary_structure_id(
+        mol_ref=Molecule(TOPO_PATH),
+        projection_method="Dihedrals",
+        id_method="global",
+    )
+    pd.testing.assert_frame_equal(
+        pd.read_pickle(REF_PATH / "secondary_structure_id.pkl"),
+        structures,
+        rtol=1e-5,
+        atol=1e-8,
+    )
+    pd.testing.assert_frame_equal(
+        pd.read_pickle(REF_PATH / "secondary_structure_id_table.pkl"), tables
+    )
+
+
+def test_shared_neighbours(session):
+    # MLE after TwoNN reuses the projection and slices the cached neighbour graph
+    mean_all, _, local_id = session.intrinsic_dimension(
+        projection_method="Dihedrals", id_kwargs={"estimator": "MLE"}
+    )
+    n_projections = len(session._projections)
+    session.intrinsic_dimension(projection_method="Dihedrals")
+    assert len(session._projections) == n_projections
+    ref_all, _, ref_local = intrinsic_dimension(
+        mol=session.mol,
+        projection_method="Dihedrals",
+        id_kwargs={"estimator": "MLE"},
+        verbose=False,
+    )
+    assert np.allclose(ref_local, local_id)
+    assert np.isclose(ref_all, mean_all)
+
+
+def test_neighbours_key(session):
+    # arrays without a key are told apart by content, not by object identity
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(50, 4))
+    for _ in range(2):
+        distances, _ = session.neighbours(X, 3)
+        expected = np.sort(np.linalg.norm(X[:, None] - X[None], axis=2), axis=1)[:, 1:4]
+        assert np.allclose(distances, expected)
+        X[:] = rng.normal(size=X.shape) #same object, new content
+
+
+def test_invalid_id_method(session):
+    with pytest.raises(TypeError):
+        session.intrinsic_dimension(projection_method="Dihedrals", id_method="wrong")
@@ -0,0 +1,70 @@
+from md_intrinsic_dimension import run_shard, merge_shards, intrinsic_dimension
+import multiprocessing
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from tests.conftest import TOPO_PATH, TRAJ_PATH
+
+ITEMS = [
+    {"topology": TOPO_PATH, "trajectory": TRAJ_PATH, "id_method": "global", "frames": slice(start, start + 200)}
+    for start in range(0, 300, 50)
+]
+
+
+def _node(directory, name):
+    # a worker process acting as one node of the cluster
+    run_shard(directory, ITEMS, kwargs={"verbose": False}, worker=name, poll=0.1, verbose=False)
+
+
+def test_processes(tmp_path):
+    directory = str(tmp_path / "shared")
+    context = multiprocessing.get_context("spawn")
+    nodes = [context.Process(target=_node, args=(directory, f"node{n}")) for n in range(3)]
+    for node in nodes:
+        node.start()
+    for node in nodes:
+        node.join(300)
+        assert node.exitcode == 0
+
+    results = merge_shards(directory)
+    assert list(results["item"]) == list(range(len(ITEMS)))
+    assert results.attrs["pending"] == [] and results.attrs["errors"] == {}
+    assert set(results["worker"]) <= {"node0", "node1", "node2"}
+    expected = intrinsic_dimension(**ITEMS[3], verbose=False)
+    assert np.allclose(results["result"][3], expected)
+    assert os.listdir(os.path.join(directory, "claims")) == []
+
+
+def _square(value):
+    return value * value
+
+
+def test_stale_claim(tmp_path):
+    directory = str(tmp_path / "shared")
+    items = [{"value": value} for value in range(3)]
+    os.makedirs(os.path.join(directory, "claims"))
+    with open(os.path.join(directory, "claims", "1.claim"), "w") as f:
+        f.write("dead-worker 0")
+    assert run_shard(directory, items, function=_square, wait=False, verbose=False) == [0, 2]
+    assert merge_shards(directory).attrs["pending"] == [1]
+    assert run_shard(directory, function=_square, stale_after=0.2, poll=0.05, verbose=False) == [1]
+    assert list(merge_shards(directory)["result"]) == [0, 1, 4]
+
+
+def test_errors_and_tables(tmp_path):
+    directory = str(tmp_path / "shared")
+    run_shard(directory, [{"value": 2}, {"value": "a"}], function=_square, verbose=False)
+    results = merge_shards(directory)
+    assert list(results["result"]) == [4, None]
+    assert list(results.attrs["errors"]) == [1] and "TypeError" in results.attrs["errors"][1]
+    with pytest.raises(ValueError, match="different list of items"):
+        run_shard(directory, [{"value": 3}], function=_square, verbose=False)
+
+    directory = str(tmp_path / "tables")
+    run_shard(directory, [{"value": 2}, {"value": 3}], function=lambda value: pd.DataFrame({"square": [_square(value)] * value}), verbose=False)
+    results = merge_shards(directory)
+    assert list(results.columns) == ["item", "square"]
+    assert list(results["square"]) == [4, 4, 9, 9, 9]
+    with pytest.raises(ValueError, match="no list of items"):
+        run_shard(str(tmp_path / "empty"), function=_square, verbose=False)
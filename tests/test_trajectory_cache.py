@@ -0,0 +1,88 @@
+from md_intrinsic_dimension import intrinsic_dimension, section_id, secondary_structure_id, cache_trajectory
+from md_intrinsic_dimension.load_trajectory import load_molecule, count_frames
+from md_intrinsic_dimension import trajectory_cache
+from md_intrinsic_dimension.pooled import project_replicas
+from moleculekit.molecule import Molecule
+import numpy as np
+import os
+import pandas as pd
+import pytest
+from tests.conftest import TOPO_PATH, TRAJ_PATH, REF_PATH
+
+
+@pytest.fixture(scope="module")
+def cache(tmp_path_factory):
+    # small chunks, so that the conversion runs over several of them
+    return cache_trajectory(str(tmp_path_factory.mktemp("cache") / "2hbaA00"), TOPO_PATH, TRAJ_PATH, chunk_size=128)
+
+
+def test_round_trip(load_mol, cache):
+    mol = load_molecule(trajectory=cache)
+    assert isinstance(mol.coords, np.memmap)
+    assert count_frames(cache) == load_mol.numFrames
+    for field in ("coords", "box", "step", "time"):
+        assert np.array_equal(getattr(mol, field), getattr(load_mol, field))
+    assert np.array_equal(mol.resid, load_mol.resid)
+    # stored frame by frame
+    assert np.load(os.path.join(cache, "coords.npy"), mmap_mode="r").shape == (load_mol.numFrames, load_mol.numAtoms, 3)
+
+
+def test_frames(load_mol, cache):
+    strided = load_molecule(trajectory=cache, frames=slice(100, None, 3))
+    assert isinstance(strided.coords, np.memmap)
+    assert np.array_equal(strided.coords, load_mol.coords[:, :, 100::3])
+    picked = load_molecule(trajectory=cache, frames=[5, 1, -1])
+    assert np.array_equal(picked.coords, load_mol.coords[:, :, [5, 1, 499]])
+
+
+def test_atoms(load_mol, cache):
+    ca = load_mol.atomselect("name CA")
+    mol = load_molecule(trajectory=cache, atoms="name CA")
+    assert mol.numAtoms == ca.sum()
+    assert np.array_equal(mol.coords, load_mol.coords[ca])
+    picked = load_molecule(trajectory=cache, frames=[5, 1, -1], atoms="name CA")
+    assert np.array_equal(picked.coords, load_mol.coords[ca][:, :, [5, 1, 499]])
+
+
+def test_from_mol(load_mol, tmp_path):
+    path = cache_trajectory(str(tmp_path / "mol"), mol=load_mol)
+    mol = load_molecule(trajectory=path)
+    assert np.array_equal(mol.coords, load_mol.coords)
+    assert np.array_equal(mol.name, load_mol.name)
+    with pytest.raises(FileExistsError):
+        cache_trajectory(path, mol=load_mol)
+
+
+def test_failed_conversion(load_mol, tmp_path, monkeypatch):
+    # a conversion failing halfway leaves no directory behind, so it can be run again
+    path = str(tmp_path / "failed")
+
+    def fail(*args):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(trajectory_cache, "_write_chunk", fail)
+        with pytest.raises(OSError, match="disk full"):
+            cache_trajectory(path, TOPO_PATH, TRAJ_PATH)
+    assert os.listdir(tmp_path) == []
+    cache_trajectory(path, TOPO_PATH, TRAJ_PATH)
+    assert np.array_equal(load_molecule(trajectory=path).coords, load_mol.coords)
+
+
+def test_analyses(cache):
+    kwargs = dict(projection_method="Dihedrals", id_method="global")
+    assert intrinsic_dimension(trajectory=cache, **kwargs) == pytest.approx(
+        intrinsic_dimension(topology=TOPO_PATH, trajectory=TRAJ_PATH, **kwargs)
+    )
+    pd.testing.assert_frame_equal(
+        pd.read_pickle(REF_PATH / "section_id.pkl"), section_id(trajectory=cache, **kwargs), rtol=1e-5, atol=1e-8
+    )
+    structures, _ = secondary_structure_id(trajectory=cache, mol_ref=Molecule(TOPO_PATH), **kwargs)
+    expected, _ = secondary_structure_id(topology=TOPO_PATH, trajectory=TRAJ_PATH, mol_ref=Molecule(TOPO_PATH), **kwargs)
+    pd.testing.assert_frame_equal(expected, structures)
+
+
+def test_pooled(load_mol, cache):
+    projection, bounds = project_replicas(lambda mol: mol.coords[0].T, trajectories=[cache, cache], frames=slice(0, 200))
+    assert bounds == [(0, 200), (200, 400)]
+    assert np.array_equal(projection[200:], load_mol.coords[0, :, :200].T)
@@ -0,0 +1,59 @@
+from md_intrinsic_dimension import WindowStore
+from md_intrinsic_dimension.window_store import trajectory_fingerprint, scan_parameters
+import numpy as np
+import pytest
+
+
+def test_keys(load_mol):
+    assert trajectory_fingerprint(load_mol) == trajectory_fingerprint(load_mol.copy())
+    assert trajectory_fingerprint(load_mol) != trajectory_fingerprint(load_mol.copy(frames=np.arange(100)))
+    # default estimator parameters are made explicit
+    assert scan_parameters("Dihedrals", "global", None, None) == scan_parameters("Dihedrals", "global", {}, {"estimator": "TwoNN"})
+    assert scan_parameters("Dihedrals", "global", None, None) != scan_parameters("Dihedrals", "global", None, {"estimator": "MLE"})
+    assert scan_parameters(lambda mol: mol, "global", None, None) is None
+    # a reference molecule is keyed by content, not by identity, and other unhashable objects are not keyed
+    coordinate = lambda refmol: scan_parameters("Coordinate", "global", {"atomsel": "name CA", "refmol": refmol}, None)
+    assert coordinate(load_mol) == coordinate(load_mol.copy())
+    assert coordinate(load_mol) != coordinate(load_mol.copy(frames=np.arange(100)))
+    assert scan_parameters("Distances", "global", {"groups": {"name CA"}}, None) is None
+
+
+def test_copies():
+    store = WindowStore()
+    value = (1.0, 1.0, np.zeros(10))
+    store.put(("a", 0, 9, ()), value)
+    value[2][:] = 1 #the caller's result
+    stored = store.get(("a", 0, 9, ()))
+    stored[2][:] = 2
+    assert np.array_equal(store.get(("a", 0, 9, ()))[2], np.zeros(10))
+
+
+def test_bounds():
+    store = WindowStore(max_entries=2)
+    for i in range(3):
+        store.put(("a", i, i + 9, ()), (float(i), float(i), np.zeros(10)))
+    assert len(store) == 2 and ("a", 0, 9, ()) not in store
+    assert store.get(("a", 1, 10, ())) is not None #now most recently used
+    store.put(("a", 3, 12, ()), (3.0, 3.0, np.zeros(10)))
+    assert ("a", 1, 10, ()) in store and ("a", 2, 11, ()) not in store
+    assert (store.hits, store.misses) == (1, 0)
+
+    store = WindowStore(max_bytes=150)
+    for i in range(3):
+        store.put(("a", i, i + 9, ()), (float(i), float(i), np.zeros(10)))
+    assert len(store) == 1 and store.nbytes <= 150
+    with pytest.raises(ValueError, match="max_entries must be >= 1"):
+        WindowStore(max_entries=0)
+
+
+def test_invalidate(load_mol):
+    store = WindowStore()
+    fingerprint = trajectory_fingerprint(load_mol)
+    for start in (1, 5):
+        store.put((fingerprint, start, start + 9, ()), (1.0, 1.0, []))
+    store.put(("other", 1, 10, ()), (1.0, 1.0, []))
+    assert store.invalidate(load_mol, windows=[(5, 14)]) == 1
+    assert store.invalidate(load_mol) == 1
+    assert len(store) == 1
+    store.clear()
+    assert len(store) == 0 and store.nbytes == 0